@@ -9,14 +9,481 @@ from tkinter import ttk, messagebox, filedialog
 import datetime
 import threading
 import time
-import pygame
-import json
 import os
 import math
-from typing import Dict, List, Optional
+import queue
+from collections import OrderedDict
+from typing import Callable, Dict, List
+
+import alarm_io
+from alarm_engine import (MAX_SNOOZES, MISSED_GRACE, SNOOZE_MINUTES, AlarmEngine, AlarmRecord, CountdownTimer,
+                          PygameSoundBackend, TimerRegistry, argument_parser, days_to_mask, headless_from_args,
+                          open_store)
+from alarm_metrics import metrics
+from alarm_time import get_zone, zone_names
+
+
+class UIDispatcher:
+    """Hands widget updates from worker threads to the Tk main thread.
+
+    Tk is not thread-safe, so background threads never touch widgets directly: they post
+    callbacks here and a `root.after` pump runs them on the main thread. Updates posted
+    with the same key are coalesced, so only the latest value per widget is applied per frame.
+    """
+
+    def __init__(self, root, interval_ms: int = 50, max_per_frame: int = 500):
+        self.root = root
+        self.interval_ms = interval_ms
+        self.max_per_frame = max_per_frame  # leftover work waits for the next frame
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._pending: Dict = {}  # key -> (callback, args), kept in posting order
+        self._unique = 0
+        self._after_id = None
+
+    def start(self):
+        if self._after_id is None:
+            self._pump()
+
+    def stop(self):
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+    def post(self, key, callback: Callable, *args):
+        """Queue a coalescing update: a later post with the same key replaces this one"""
+        self._queue.put((key, callback, args))
+
+    def call(self, callback: Callable, *args):
+        """Queue a one-off call (never coalesced), e.g. opening a dialog"""
+        self._queue.put((None, callback, args))
+
+    def config(self, widget, **options):
+        """Queue `widget.config(**options)`, coalesced per widget and option names"""
+        self.post((str(widget), tuple(sorted(options))), lambda: widget.config(**options))
+
+    def _pump(self):
+        while True:
+            try:
+                key, callback, args = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if key is None:
+                self._unique += 1
+                key = ('call', self._unique)
+            self._pending[key] = (callback, args)
+
+        # Arm the next frame first: a callback that opens a modal dialog runs a nested event
+        # loop, and the clock, timers and alarm popups must keep updating while it is open
+        self._after_id = self.root.after(self.interval_ms, self._pump)
+
+        batch = list(self._pending)[:self.max_per_frame]
+        started = time.perf_counter()
+        for key in batch:
+            entry = self._pending.pop(key, None)
+            if entry is None:
+                continue  # already run by a frame pumped inside a dialog
+            callback, args = entry
+            try:
+                callback(*args)
+            except Exception as e:
+                print(f"UI update failed: {str(e)}")
+        if batch:
+            metrics.observe('ui_refresh_seconds', time.perf_counter() - started, what='dispatch')
+
+
+class StartupTimer:
+    """Records how long each startup phase takes, up to the first painted frame"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: List[tuple] = []  # (phase name, seconds)
+        self._last = self.started
+
+    def mark(self, phase: str):
+        """Close the current phase under the given name"""
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    def total(self) -> float:
+        return self._last - self.started
+
+    def report(self) -> str:
+        lines = ["Startup phases:"]
+        for phase, seconds in self.phases:
+            lines.append(f"  {phase:<20} {seconds * 1000:8.1f} ms")
+        lines.append(f"  {'time to first paint':<20} {self.total() * 1000:8.1f} ms")
+        return "\n".join(lines)
+
+
+class ProgressRing:
+    """Circular progress indicator whose canvas items are created once and updated in place.
+
+    Each update only changes the arc's extent (and the centered text) through itemconfig,
+    and skips the Tcl call entirely when the value has not visibly changed.
+    """
+
+    def __init__(self, parent, size, colors, width=6, font=('Poppins', 11, 'bold')):
+        self.canvas = tk.Canvas(parent, width=size, height=size, 
+                                bg=colors['card'], highlightthickness=0)
+        
+        # Calculate center and radius
+        center = size // 2
+        radius = (size - 20) // 2
+        box = (center - radius, center - radius, center + radius, center + radius)
+        
+        # Background circle, progress arc (green like in the image) and centered text
+        self.canvas.create_oval(*box, outline=colors['bg_tertiary'], width=width, fill="")
+        # tkinter arcs start at 3 o'clock; start at 12 and use negative extents to go clockwise
+        self.arc = self.canvas.create_arc(*box, start=90, extent=0, state='hidden',
+                                          outline=colors['accent'], width=width, style='arc')
+        self.text = self.canvas.create_text(center, center, text="", font=font, fill=colors['text_primary'])
+        
+        self._extent = 0.0
+        self._text = ""
+
+    def set(self, progress, text=""):
+        # A tenth of a degree is below what a ring this size can show
+        extent = round(-359.9 * min(1.0, max(0.0, progress)), 1)
+        if extent != self._extent:
+            self.canvas.itemconfigure(self.arc, extent=extent, state='normal' if extent else 'hidden')
+            self._extent = extent
+        if text != self._text:
+            self.canvas.itemconfigure(self.text, text=text)
+            self._text = text
+
+
+class AlarmCard:
+    """A reusable alarm card widget for the virtualized Active Alarms list.
+
+    The widget tree is built once; `show()` points the card at a different alarm by
+    updating texts and colors in place, so scrolling and toggling never rebuild widgets.
+    """
+
+    def __init__(self, app, parent):
+        self.app = app
+        self.index = -1
+        self.alarm_id = None
+        colors = app.colors
+        
+        # Main card container with shadow effect
+        self.frame = tk.Frame(parent, bg=colors['bg_primary'])
+        
+        # Card with gradient-like effect using multiple frames
+        card_shadow = tk.Frame(self.frame, bg=colors['bg_secondary'], height=2)
+        card_shadow.pack(fill=tk.X, pady=(0, 0))
+        
+        card = tk.Frame(self.frame, bg=colors['card'], padx=25, pady=20, relief=tk.FLAT, bd=0)
+        card.pack(fill=tk.BOTH, expand=True)
+        
+        # Status indicator bar
+        self.status_bar = tk.Frame(card, height=3)
+        self.status_bar.pack(fill=tk.X, pady=(0, 15))
+        
+        # Main content frame
+        content_frame = tk.Frame(card, bg=colors['card'])
+        content_frame.pack(fill=tk.X)
+        
+        # Left side - Time and details
+        left_frame = tk.Frame(content_frame, bg=colors['card'])
+        left_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        
+        # Time display
+        time_frame = tk.Frame(left_frame, bg=colors['card'])
+        time_frame.pack(fill=tk.X)
+        
+        self.time_label = tk.Label(time_frame, font=('Poppins', 28, 'bold'), 
+                                   fg=colors['text_primary'], bg=colors['card'])
+        self.time_label.pack(side=tk.LEFT)
+        
+        # AM/PM indicator
+        self.am_pm_label = tk.Label(time_frame, font=('Poppins', 12, 'bold'), 
+                                    fg=colors['text_secondary'], bg=colors['card'])
+        self.am_pm_label.pack(side=tk.LEFT, anchor='n', padx=(5, 0), pady=(8, 0))
+        
+        # Details frame
+        details_frame = tk.Frame(left_frame, bg=colors['card'])
+        details_frame.pack(fill=tk.X, pady=(10, 0))
+        
+        # Alarm name with icon
+        name_frame = tk.Frame(details_frame, bg=colors['card'])
+        name_frame.pack(fill=tk.X)
+        
+        tk.Label(name_frame, text="⏰", 
+                font=('Poppins', 14), 
+                fg=colors['accent'], 
+                bg=colors['card']).pack(side=tk.LEFT)
+        
+        self.name_label = tk.Label(name_frame, font=('Poppins', 16, 'bold'), 
+                                   fg=colors['text_primary'], bg=colors['card'])
+        self.name_label.pack(side=tk.LEFT, padx=(8, 0))
+        
+        # Days and sound info
+        info_frame = tk.Frame(details_frame, bg=colors['card'])
+        info_frame.pack(fill=tk.X, pady=(8, 0))
+        
+        self.days_label = tk.Label(info_frame, font=('Poppins', 11), 
+                                   fg=colors['text_secondary'], bg=colors['card'])
+        self.days_label.pack(anchor='w')
+        
+        self.sound_label = tk.Label(info_frame, font=('Poppins', 11), 
+                                    fg=colors['text_secondary'], bg=colors['card'])
+        self.sound_label.pack(anchor='w', pady=(2, 0))
+        
+        # Right side - Controls
+        controls_frame = tk.Frame(content_frame, bg=colors['card'])
+        controls_frame.pack(side=tk.RIGHT, padx=(20, 0))
+        
+        # Status indicator
+        status_indicator = tk.Frame(controls_frame, bg=colors['card'])
+        status_indicator.pack(pady=(0, 15))
+        
+        self.status_label = tk.Label(status_indicator, font=('Poppins', 10, 'bold'), bg=colors['card'])
+        self.status_label.pack()
+        
+        # Control buttons container
+        buttons_frame = tk.Frame(controls_frame, bg=colors['card'])
+        buttons_frame.pack()
+        
+        # Toggle and delete act on whichever alarm the card currently shows
+        self.toggle_btn = tk.Button(buttons_frame,
+                                    command=lambda: app.toggle_alarm_by_id(self.alarm_id),
+                                    fg=colors['text_primary'],
+                                    font=('Poppins', 12, 'bold'), bd=0, 
+                                    padx=20, pady=8, relief=tk.FLAT)
+        self.toggle_btn.pack(pady=(0, 8))
+        
+        delete_btn = tk.Button(buttons_frame, text="🗑️ Delete",
+                              command=lambda: app.delete_alarm_by_id(self.alarm_id),
+                              bg=colors['danger'], 
+                              fg=colors['text_primary'],
+                              font=('Poppins', 10, 'bold'), bd=0, 
+                              padx=15, pady=6, relief=tk.FLAT,
+                              activebackground='#c0392b')
+        delete_btn.pack()
+        
+        # Hover effects for the entire card
+        hover_widgets = [card, content_frame, left_frame, time_frame, details_frame, 
+                         name_frame, info_frame, controls_frame, status_indicator, buttons_frame,
+                         self.time_label, self.am_pm_label, self.status_label]
+        
+        def on_card_enter(event):
+            for widget in hover_widgets:
+                widget.config(bg=colors['card_hover'])
+        
+        def on_card_leave(event):
+            for widget in hover_widgets:
+                widget.config(bg=colors['card'])
+        
+        # Bind hover events to main card elements
+        for widget in [card, content_frame, left_frame, time_frame, self.time_label]:
+            widget.bind("<Enter>", on_card_enter)
+            widget.bind("<Leave>", on_card_leave)
+
+    def show(self, alarm, index):
+        """Show `alarm` (at position `index` in the alarm list) on this card"""
+        colors = self.app.colors
+        self.index = index
+        self.alarm_id = alarm.id
+        
+        status_color = colors['accent'] if alarm.active else colors['text_secondary']
+        self.status_bar.config(bg=status_color)
+        
+        self.time_label.config(text=f"{alarm.hour:02d}:{alarm.minute:02d}")
+        self.am_pm_label.config(text="AM" if alarm.hour < 12 else "PM")
+        self.name_label.config(text=alarm.label)
+        
+        self.days_label.config(text=f"📅 {alarm.schedule_text()}")
+        
+        sound_icon = "🎤" if any(song["title"] in alarm.sound for song in self.app.black_sheriff_songs) else "🔔"
+        self.sound_label.config(text=f"{sound_icon} {alarm.sound}")
+        
+        self.status_label.config(text="ACTIVE" if alarm.active else "INACTIVE", fg=status_color)
+        self.toggle_btn.config(text="ON" if alarm.active else "OFF",
+                               bg=colors['accent'] if alarm.active else colors['bg_tertiary'],
+                               activebackground='#1ed760' if alarm.active else colors['hover'])
+
+
+class AlarmNotifier:
+    """The one alarm popup, reused for every firing.
+
+    Firings are queued and shown together ("5 alarms: ..."), so a minute in which many
+    alarms ring opens one window instead of a stack of modal windows fighting over the grab.
+    The window is built once and then only reconfigured, withdrawn and shown again; redraws
+    are rate-limited to one per `min_interval_ms`, however many firings arrive.
+    """
+
+    MAX_LABELS = 5  # labels listed by name; the rest are counted
+
+    def __init__(self, app, min_interval_ms: int = 250):
+        self.app = app
+        self.root = app.root
+        self.colors = app.colors
+        self.engine = app.engine
+        self.min_interval_ms = min_interval_ms
+        self.ringing: 'OrderedDict[int, object]' = OrderedDict()  # instance id -> AlarmFiring
+        self.window = None
+        self.visible = False
+        self._refresh_id = None
+        self._last_refresh = 0.0
+
+    def build(self):
+        """Create the (hidden) popup; called once, ahead of the first alarm"""
+        if self.window is not None:
+            return
+        colors = self.colors
+        self.window = tk.Toplevel(self.root)
+        self.window.withdraw()
+        self.window.title("ALARM!")
+        self.window.geometry("500x320")
+        self.window.configure(bg=colors['bg_primary'])
+        self.window.attributes('-topmost', True)
+        self.window.transient(self.root)
+        
+        # Alarm content
+        tk.Label(self.window, text="⏰", 
+                font=('Poppins', 60), 
+                fg=colors['accent'], 
+                bg=colors['bg_primary']).pack(pady=(20, 10))
+        
+        self.title_label = tk.Label(self.window, 
+                                    font=('Poppins', 24, 'bold'), 
+                                    fg=colors['text_primary'], 
+                                    bg=colors['bg_primary'])
+        self.title_label.pack()
+        
+        self.labels_label = tk.Label(self.window, 
+                                     font=('Poppins', 18), 
+                                     fg=colors['text_secondary'], 
+                                     bg=colors['bg_primary'], 
+                                     wraplength=460)
+        self.labels_label.pack(pady=10)
+        
+        self.time_label = tk.Label(self.window, 
+                                   font=('Poppins', 14), 
+                                   fg=colors['text_secondary'], 
+                                   bg=colors['bg_primary'])
+        self.time_label.pack()
+        
+        # Show sound name
+        self.sound_label = tk.Label(self.window, 
+                                    font=('Poppins', 12), 
+                                    fg=colors['accent'], 
+                                    bg=colors['bg_primary'])
+        self.sound_label.pack(pady=5)
+        
+        buttons = tk.Frame(self.window, bg=colors['bg_primary'])
+        buttons.pack(pady=20)
+        
+        # Snooze button, while some ringing alarm may still be snoozed
+        self.snooze_btn = tk.Button(buttons, 
+                                    command=self.snooze_all, 
+                                    bg=colors['bg_tertiary'], 
+                                    fg=colors['text_primary'], 
+                                    font=('Poppins', 16, 'bold'),
+                                    padx=30, pady=12, bd=0, relief=tk.FLAT,
+                                    activebackground=colors['hover'])
+        
+        # Stop button
+        self.stop_btn = tk.Button(buttons, 
+                                  command=self.stop_all, 
+                                  bg=colors['danger'], 
+                                  fg=colors['text_primary'], 
+                                  font=('Poppins', 16, 'bold'),
+                                  padx=30, pady=12, bd=0, relief=tk.FLAT,
+                                  activebackground='#c0392b')
+        self.stop_btn.pack(side=tk.RIGHT, padx=10)
+        
+        # Closing the window stops every ringing alarm
+        self.window.protocol("WM_DELETE_WINDOW", self.stop_all)
+
+    def add(self, firing):
+        """Queue a firing for display (main thread only)"""
+        self.ringing[firing.id] = firing
+        self._schedule_refresh()
+
+    def snooze_all(self):
+        # Snoozed instances come back through add() when they ring again
+        for firing in self.ringing.values():
+            if self.engine.can_snooze(firing):
+                self.engine.snooze(firing)
+            else:
+                self.engine.stop_alarm_sound(firing.alarm)
+        self.ringing.clear()
+        self._hide()
+
+    def stop_all(self):
+        for firing in self.ringing.values():
+            self.engine.stop_alarm_sound(firing.alarm)
+        self.ringing.clear()
+        self._hide()
+
+    def _schedule_refresh(self):
+        # Everything that arrives before the pending refresh is drawn by it
+        if self._refresh_id is not None:
+            return
+        elapsed_ms = (time.monotonic() - self._last_refresh) * 1000
+        self._refresh_id = self.root.after(max(0, int(self.min_interval_ms - elapsed_ms)), self._refresh)
+
+    def _refresh(self):
+        self._refresh_id = None
+        self._last_refresh = time.monotonic()
+        if not self.ringing:
+            self._hide()
+            return
+        started = time.perf_counter()
+        self.build()
+        
+        firings = list(self.ringing.values())
+        alarms = [firing.alarm for firing in firings]
+        if len(firings) == 1:
+            title = "ALARM!"
+            labels = alarms[0].label
+        else:
+            title = f"{len(firings)} ALARMS!"
+            names = [alarm.label for alarm in alarms[:self.MAX_LABELS]]
+            if len(alarms) > self.MAX_LABELS:
+                names.append(f"and {len(alarms) - self.MAX_LABELS} more")
+            labels = f"{len(firings)} alarms: " + ", ".join(names)
+        
+        times = list(dict.fromkeys(f"{alarm.hour:02d}:{alarm.minute:02d}" for alarm in alarms))
+        time_str = ", ".join(times[:self.MAX_LABELS]) + (" ..." if len(times) > self.MAX_LABELS else "")
+        if len(firings) == 1 and firings[0].snoozes:
+            time_str += f" (snoozed {firings[0].snoozes}x)"
+        sounds = list(dict.fromkeys(alarm.sound for alarm in alarms))
+        
+        self.window.title(title)
+        self.title_label.config(text=title)
+        self.labels_label.config(text=labels)
+        self.time_label.config(text=f"Time: {time_str}")
+        self.sound_label.config(text="♪ " + (sounds[0] if len(sounds) == 1 else f"{len(sounds)} sounds"))
+        self.stop_btn.config(text="Stop Alarm" if len(firings) == 1 else "Stop All")
+        if any(self.engine.can_snooze(firing) for firing in firings):
+            self.snooze_btn.config(text=f"Snooze {self.engine.snooze_minutes:g} min")
+            self.snooze_btn.pack(side=tk.LEFT, padx=10)
+        else:
+            self.snooze_btn.pack_forget()
+        
+        if not self.visible:
+            self.visible = True
+            self.window.deiconify()
+            self.window.lift()
+            self.window.grab_set()
+        metrics.observe('ui_refresh_seconds', time.perf_counter() - started, what='popup')
+
+    def _hide(self):
+        if self.visible:
+            self.visible = False
+            self.window.grab_release()
+            self.window.withdraw()
+
 
 class GhanaStyleAlarmClock:
-    def __init__(self, root):
+    def __init__(self, root, report_startup=False, alarm_file="alarms.json",
+                 snooze_minutes=SNOOZE_MINUTES, max_snoozes=MAX_SNOOZES, api_port=None, api_socket=None,
+                 grace=MISSED_GRACE, api_token_file=None, api_allow_actions=()):
+        self.startup = StartupTimer()
+        self.report_startup = report_startup
         self.root = root
         self.root.title("Multi-Alarm Clock - Ghana Style")
         self.root.geometry("1200x800")#"widthxheight+x_offset+y_offset"
@@ -39,23 +506,30 @@ class GhanaStyleAlarmClock:
             'border': '#404040'
         }
         
-        # Initialize pygame for sound
-        pygame.mixer.init()
+        # Alarm engine: alarm list, persistence, scheduling and sound (no GUI code)
+        self.alarm_file = alarm_file  # alarms.json, or an SQLite .db file for large alarm sets
+        self.engine = AlarmEngine(open_store(self.alarm_file), PygameSoundBackend(), grace,
+                                  snooze_minutes=snooze_minutes, max_snoozes=max_snoozes)
+        self.engine.actions.register('popup', self.trigger_alarm)
+        self.startup.mark("engine")
         
-        # Data storage
-        self.alarms: List[Dict] = []
-        self.alarm_file = "alarms.json"
         self.current_time = datetime.datetime.now()
         self.running = True
         
-        # Timer variables
-        self.countdown_time = 0
-        self.total_countdown_time = 0
-        self.timer_running = False
+        # Timer variables: any number of named countdowns, all driven by one scheduler thread
+        self.timers = TimerRegistry(on_finish=lambda timer: self.ui.call(self.finish_countdown, timer))
+        self.selected_timer = None  # name of the timer shown in the large display
+        self.timer_tiles = {}  # timer name -> widgets of its progress ring tile
+        self.timer_tile_size = 90
+        self.countdown_fps = 30  # frame rate of the progress rings while a timer runs
+        self.timer_display_text = None
+        self.countdown_after_id = None
         self.timer_sound_path = ""
         
         # Volume variable (needed for alarm sound)
         self.volume_var = tk.DoubleVar(value=0.7)
+        self.engine.sound.volume = self.volume_var.get()
+        self.volume_var.trace_add('write', lambda *args: setattr(self.engine.sound, 'volume', self.volume_var.get()))
         
         # Add some Black Sheriff songs (local paths - you'll need to add actual files)
         self.black_sheriff_songs = [
@@ -66,28 +540,88 @@ class GhanaStyleAlarmClock:
             {"title": "Soja", "path": "assets/sounds/soja.mp3"}
         ]
         
-        # Load saved alarms
-        self.load_alarms()
+        # Synthesized tone patterns (generated in memory, see alarm_tones.py)
+        self.tone_sounds = {"Escalating Beeps": "tone:escalating", "Chime": "tone:chime"}
+        
+        # Load saved alarms. pygame.mixer is initialized and their sounds decoded in a
+        # background thread, so audio setup stays off the path to the first frame
+        self.engine.load()
+        self.engine.sound.preload([song["path"] for song in self.black_sheriff_songs])
+        self.startup.mark("load alarms")
         
         # Create assets directory
         os.makedirs("assets/sounds", exist_ok=True)#we will make a directory to store our pre existing  sounds if that directory does not exist
         
-        # Apply custom styles
-        self.setup_styles()
+        # Custom ttk styles are applied when the first view that uses ttk widgets is built
+        self.styles_ready = False
         
-        # Create GUI
+        # Create GUI (only the home view; the others are built when first opened)
         self.create_widgets()
+        self.startup.mark("widgets")
+        
+        # Worker threads post widget updates here; they are applied on the main thread
+        self.ui = UIDispatcher(self.root)
+        self.ui.start()
+        
+        # Single reusable popup for ringing alarms (its window is built after the first paint)
+        self.notifier = AlarmNotifier(self)
         
         # Start time update thread
         self.time_thread = threading.Thread(target=self.update_time, daemon=True)
         self.time_thread.start()
         
-        # Start alarm checker thread
-        self.alarm_thread = threading.Thread(target=self.check_alarms, daemon=True)
-        self.alarm_thread.start()
+        # Start the alarm scheduler (sleeps until the next alarm is due)
+        self.engine.start()
+        
+        # Optional local control API; its changes reach the widgets through self.ui
+        self.api = None
+        if api_port is not None or api_socket:
+            self.start_api(api_port, api_socket, api_token_file, api_allow_actions)
         
         # Handle window close
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+        self.startup.mark("threads")
+        
+        # Idle callbacks run after Tk has drawn the pending widgets, i.e. after the first paint
+        self.root.after_idle(self.on_first_paint)
+
+    def start_api(self, port, socket_path, token_file=None, allow_actions=()):
+        from alarm_api import API_ACTIONS, AlarmApiServer
+        
+        # Changes made by this window refresh their own widgets; only react to other threads
+        def changed_elsewhere(callback):
+            def listener(*args):
+                if threading.current_thread() is not threading.main_thread():
+                    self.ui.post(callback, callback)
+            return listener
+        
+        self.engine.change_listeners.append(changed_elsewhere(self.on_alarms_changed))
+        self.timers.listeners.append(changed_elsewhere(self.sync_timer_tiles))
+        try:
+            self.api = AlarmApiServer(self.engine, self.timers, port=port, socket_path=socket_path,
+                                      token_file=token_file, allowed_actions=API_ACTIONS + tuple(allow_actions))
+            self.api.start()
+            print(f"Control API listening on {', '.join(self.api.addresses())} (token in {self.api.token_file})")
+        except OSError as e:
+            self.api = None
+            print(f"Could not start control API: {str(e)}")
+
+    def on_alarms_changed(self):
+        """Refresh alarm widgets after alarms were changed from another thread (e.g. the control API)"""
+        self.refresh_alarm_list()
+        active_count = self.engine.active_count()
+        self.alarm_count_label.config(text=f"{active_count} active alarm{'s' if active_count != 1 else ''}")
+
+    def on_first_paint(self):
+        self.startup.mark("first paint")
+        if self.report_startup:
+            print(self.startup.report(), flush=True)
+        self.root.after_idle(self.notifier.build)
+
+    def ensure_styles(self):
+        if not self.styles_ready:
+            self.setup_styles()
+            self.styles_ready = True
 
     def setup_styles(self):
         style = ttk.Style()
@@ -196,12 +730,14 @@ class GhanaStyleAlarmClock:
         self.main_content = tk.Frame(self.root, bg=self.colors['bg_primary'])#creating the main content but this time we don't specify width because it will take the remaining space
         self.main_content.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True)#fill the entire height and width of the remaining space in the window
         
-        # Create different views
+        # Views are built the first time switch_view selects them
         self.views = {}
-        self.create_home_view()
-        self.create_alarm_view()
-        self.create_active_alarms_view()
-        self.create_countdown_view()  # Changed from settings to countdown
+        self.view_builders = {
+            "home": self.create_home_view,
+            "alarm": self.create_alarm_view,
+            "active": self.create_active_alarms_view,
+            "countdown": self.create_countdown_view  # Changed from settings to countdown
+        }
         
         # Show home view by default
         self.switch_view("home")
@@ -458,7 +994,7 @@ class GhanaStyleAlarmClock:
             selection = textvariable.get()
             if "Kwaku" in selection or "Second" in selection or "Destiny" in selection or "Oil" in selection or "Soja" in selection:
                 icon_label.config(text="🎤", fg=self.colors['accent'])
-            elif "Default" in selection:
+            elif "Default" in selection or selection in self.tone_sounds:
                 icon_label.config(text="🔔", fg=self.colors['warning'])
             elif "Custom" in selection:
                 icon_label.config(text="📁", fg=self.colors['success'])
@@ -498,64 +1034,8 @@ class GhanaStyleAlarmClock:
         
         return container
 
-    def create_circular_timer(self, parent, size=200):
-        """Create a circular timer widget like in the image"""
-        container = tk.Frame(parent, bg=self.colors['card'])
-        
-        # Create canvas for circular timer
-        canvas = tk.Canvas(container, width=size, height=size, 
-                          bg=self.colors['card'], highlightthickness=0)
-        canvas.pack(pady=20)
-        
-        # Store canvas reference
-        self.timer_canvas = canvas
-        self.timer_size = size
-        
-        # Draw initial circle
-        self.draw_timer_circle()
-        
-        # Timer display
-        self.timer_display = tk.Label(container, text="00:00", 
-                                     font=('Poppins', 24, 'bold'), 
-                                     fg=self.colors['text_primary'], 
-                                     bg=self.colors['card'])
-        self.timer_display.pack(pady=10)
-        
-        return container
-
-    def draw_timer_circle(self):
-        """Draw the circular timer progress"""
-        if not hasattr(self, 'timer_canvas'):
-            return
-            
-        canvas = self.timer_canvas
-        size = self.timer_size
-        canvas.delete("all")
-        
-        # Calculate center and radius
-        center = size // 2
-        radius = (size - 20) // 2
-        
-        # Draw background circle
-        canvas.create_oval(center - radius, center - radius, 
-                          center + radius, center + radius,
-                          outline=self.colors['bg_tertiary'], width=6, fill="")
-        
-        # Calculate progress if timer is running
-        if self.total_countdown_time > 0:
-            progress = (self.total_countdown_time - self.countdown_time) / self.total_countdown_time
-            
-            # Draw progress arc (green color like in image)
-            if progress > 0:
-                # Convert to degrees (tkinter uses degrees, starting from 3 o'clock, going clockwise)
-                extent = 360 * progress
-                canvas.create_arc(center - radius, center - radius,
-                                center + radius, center + radius,
-                                start=90, extent=-extent, 
-                                outline=self.colors['accent'], width=6,
-                                style='arc')
-
     def create_alarm_view(self):
+        self.ensure_styles()  # the sound dropdown is a styled ttk.Combobox
         self.views["alarm"] = tk.Frame(self.main_content, bg=self.colors['bg_primary'])
         
         # Header
@@ -635,6 +1115,21 @@ class GhanaStyleAlarmClock:
         label_entry.bind("<FocusIn>", on_entry_focus_in)
         label_entry.bind("<FocusOut>", on_entry_focus_out)
         
+        # Time zone the alarm time is read in ("Local" follows the computer's zone)
+        zone_section = tk.Frame(left_panel, bg=self.colors['card'])
+        zone_section.pack(fill=tk.X, pady=(20, 0))
+        
+        tk.Label(zone_section, text="Time Zone", 
+                font=('Poppins', 14, 'bold'), 
+                fg=self.colors['text_primary'], 
+                bg=self.colors['card']).pack(anchor='w', pady=(0, 10))
+        
+        self.timezone_var = tk.StringVar(value="Local")
+        zone_combo = ttk.Combobox(zone_section, textvariable=self.timezone_var,
+                                  values=["Local"] + zone_names(), font=('Poppins', 12),
+                                  style='Professional.TCombobox')
+        zone_combo.pack(fill=tk.X, pady=5)
+        
         # Right side - Days and sound settings
         right_panel = tk.Frame(form_container, bg=self.colors['card'], padx=30, pady=30)
         right_panel.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True, padx=(15, 0))
@@ -665,7 +1160,8 @@ class GhanaStyleAlarmClock:
         
         # Professional sound selection dropdown
         self.sound_var = tk.StringVar(value="Default Beep")
-        sound_options = ["Default Beep"] + [song["title"] for song in self.black_sheriff_songs] + ["Custom Sound"]
+        sound_options = (["Default Beep"] + list(self.tone_sounds) + [song["title"] for song in self.black_sheriff_songs]
+                         + ["Custom Sound"])
         
         sound_dropdown = self.create_professional_dropdown(right_panel, self.sound_var, 
                                                          sound_options, "Alarm Sound")
@@ -706,6 +1202,7 @@ class GhanaStyleAlarmClock:
         create_btn.pack(anchor='center')
 
     def create_active_alarms_view(self):
+        self.ensure_styles()  # themed ttk scrollbar
         self.views["active"] = tk.Frame(self.main_content, bg=self.colors['bg_primary'])
         
         # Header
@@ -729,24 +1226,66 @@ class GhanaStyleAlarmClock:
                                relief=tk.FLAT, activebackground=self.colors['hover'])
         refresh_btn.pack(side=tk.RIGHT, padx=(10, 0))
         
+        export_btn = tk.Button(controls, text="⬆ Export",
+                              command=self.export_alarms,
+                              bg=self.colors['bg_tertiary'], 
+                              fg=self.colors['text_primary'],
+                              font=('Poppins', 12), bd=0, padx=15, pady=8,
+                              relief=tk.FLAT, activebackground=self.colors['hover'])
+        export_btn.pack(side=tk.RIGHT, padx=(10, 0))
+        
+        self.import_btn = tk.Button(controls, text="⬇ Import",
+                                    command=self.import_alarms,
+                                    bg=self.colors['bg_tertiary'], 
+                                    fg=self.colors['text_primary'],
+                                    font=('Poppins', 12), bd=0, padx=15, pady=8,
+                                    relief=tk.FLAT, activebackground=self.colors['hover'])
+        self.import_btn.pack(side=tk.RIGHT, padx=(10, 0))
+        
         # Alarms container
         alarms_container = tk.Frame(self.views["active"], bg=self.colors['bg_primary'])
         alarms_container.pack(fill=tk.BOTH, expand=True, padx=30, pady=20)
         
-        # Scrollable frame for alarm cards
-        canvas = tk.Canvas(alarms_container, bg=self.colors['bg_primary'], highlightthickness=0)
-        scrollbar = ttk.Scrollbar(alarms_container, orient="vertical", command=canvas.yview)
-        self.alarm_cards_frame = tk.Frame(canvas, bg=self.colors['bg_primary'])
+        # Virtualized list: only cards inside the visible part of the canvas exist, and they
+        # are recycled while scrolling (see update_visible_cards)
+        self.alarm_canvas = tk.Canvas(alarms_container, bg=self.colors['bg_primary'], highlightthickness=0)
+        scrollbar = ttk.Scrollbar(alarms_container, orient="vertical", command=self.alarm_canvas.yview)
         
-        self.alarm_cards_frame.bind(
-            "<Configure>",
-            lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
-        )
+        def on_scroll(first, last):
+            scrollbar.set(first, last)
+            self.update_visible_cards()
         
-        canvas.create_window((0, 0), window=self.alarm_cards_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
+        self.alarm_canvas.configure(yscrollcommand=on_scroll)
+        self.alarm_canvas.bind("<Configure>", lambda e: self.update_visible_cards())
         
-        canvas.pack(side="left", fill="both", expand=True)
+        self.alarm_card_height = 200  # fixed row height so any row's position is index * height
+        self.alarm_card_pool = []  # AlarmCard objects, each with its own canvas window item
+        self.visible_cards = {}  # alarm index -> (AlarmCard, canvas window item)
+        self.cards_by_alarm_id = {}  # alarm id -> AlarmCard, for the visible cards only
+        
+        # Empty state, shown instead of the cards when there are no alarms
+        self.alarm_cards_frame = tk.Frame(self.alarm_canvas, bg=self.colors['bg_primary'])
+        empty_frame = tk.Frame(self.alarm_cards_frame, bg=self.colors['bg_primary'])
+        empty_frame.pack(expand=True, fill=tk.BOTH, pady=100)
+        
+        tk.Label(empty_frame, text="⏰", 
+                font=('Poppins', 60), 
+                fg=self.colors['text_secondary'], 
+                bg=self.colors['bg_primary']).pack()
+        
+        tk.Label(empty_frame, text="No alarms set yet", 
+                font=('Poppins', 18, 'bold'), 
+                fg=self.colors['text_secondary'], 
+                bg=self.colors['bg_primary']).pack(pady=(10, 5))
+        
+        tk.Label(empty_frame, text="Create your first alarm to get started", 
+                font=('Poppins', 12), 
+                fg=self.colors['text_secondary'], 
+                bg=self.colors['bg_primary']).pack()
+        self.empty_state_item = self.alarm_canvas.create_window((0, 0), window=self.alarm_cards_frame,
+                                                                anchor="nw", state='hidden')
+        
+        self.alarm_canvas.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
 
     def create_countdown_view(self):
@@ -829,9 +1368,27 @@ class GhanaStyleAlarmClock:
                 bg=self.colors['card']).pack(pady=(0, 8))
         
         self.timer_seconds_var = tk.StringVar(value="00")
+        self.timer_sound_var = tk.StringVar(value="Default Beep")
         seconds_spinbox = self.create_professional_spinbox(seconds_container, self.timer_seconds_var, 0, 59, "")
         seconds_spinbox.pack()
         
+        # Timer name input (each name is a separate timer that runs in parallel)
+        name_container = tk.Frame(time_input_frame, bg=self.colors['card'])
+        name_container.pack(side=tk.LEFT, padx=(40, 0), anchor='n')
+        
+        tk.Label(name_container, text="Name", 
+                font=('Poppins', 12, 'bold'), 
+                fg=self.colors['text_secondary'], 
+                bg=self.colors['card']).pack(pady=(0, 8))
+        
+        self.timer_name_var = tk.StringVar(value="Timer 1")
+        name_frame = tk.Frame(name_container, bg=self.colors['border'], padx=1, pady=1)
+        name_frame.pack()
+        tk.Entry(name_frame, textvariable=self.timer_name_var, width=14,
+                font=('Poppins', 14), bg=self.colors['bg_tertiary'],
+                fg=self.colors['text_primary'], bd=0, relief=tk.FLAT,
+                highlightthickness=0, insertbackground=self.colors['text_primary']).pack(ipady=12, ipadx=8)
+        
         # Control buttons section - Replace "Ready to start" with Start and Stop buttons
         buttons_section = tk.Frame(controls_frame, bg=self.colors['card'])
         buttons_section.pack(fill=tk.X, pady=(20, 0))
@@ -866,6 +1423,19 @@ class GhanaStyleAlarmClock:
                                        padx=50, pady=20, relief=tk.FLAT,
                                        activebackground='#c0392b')
         self.stop_timer_btn.pack(side=tk.LEFT)
+        
+        # Running timers - one compact progress ring per timer
+        timers_section = tk.Frame(main_container, bg=self.colors['card'], padx=40, pady=15)
+        timers_section.pack(fill=tk.X, pady=(20, 0))
+        
+        self.timer_tiles_frame = tk.Frame(timers_section, bg=self.colors['card'])
+        self.timer_tiles_frame.pack(fill=tk.X)
+        
+        self.timer_tiles_placeholder = tk.Label(self.timer_tiles_frame, text="No timers running", 
+                                               font=('Poppins', 12), 
+                                               fg=self.colors['text_secondary'], 
+                                               bg=self.colors['card'])
+        self.timer_tiles_placeholder.pack(anchor='w')
 
     def browse_timer_sound(self):
         """Browse for custom timer sound"""
@@ -876,19 +1446,13 @@ class GhanaStyleAlarmClock:
         if file_path:
             self.timer_sound_path = file_path
             self.timer_sound_var.set("Custom Sound")
+            self.engine.sound.preload([file_path])
 
     def test_timer_sound(self):
         """Test the selected timer sound"""
         try:
-            pygame.mixer.music.set_volume(self.volume_var.get())
             sound_path = self.get_timer_sound_path(self.timer_sound_var.get())
-            
-            if sound_path and os.path.exists(sound_path):
-                pygame.mixer.music.load(sound_path)
-                pygame.mixer.music.play()
-            else:
-                self.create_beep_sound()
-                pygame.mixer.music.play()
+            self.engine.sound.play(sound_path or "", loop=False, owner='test')
             
             messagebox.showinfo("Test", f"Playing timer sound: {self.timer_sound_var.get()}")
         except Exception as e:
@@ -900,6 +1464,8 @@ class GhanaStyleAlarmClock:
             return None
         elif sound_name == "Custom Sound":
             return self.timer_sound_path if hasattr(self, 'timer_sound_path') and self.timer_sound_path else None
+        elif sound_name in self.tone_sounds:
+            return self.tone_sounds[sound_name]
         else:
             # Check if it's a Black Sheriff song
             for song in self.black_sheriff_songs:
@@ -908,7 +1474,7 @@ class GhanaStyleAlarmClock:
         return None
 
     def start_countdown_timer(self):
-        """Start the countdown timer"""
+        """Start a new named countdown timer (or restart the one with the same name)"""
         try:
             minutes = int(self.timer_minutes_var.get())
             seconds = int(self.timer_seconds_var.get())
@@ -918,112 +1484,166 @@ class GhanaStyleAlarmClock:
                 messagebox.showerror("Error", "Please set a valid duration")
                 return
             
-            self.countdown_time = total_seconds
-            self.total_countdown_time = total_seconds
-            self.timer_running = True
-            
-            # Update button states
-            self.start_timer_btn.config(state='disabled', text="⏳ RUNNING...")
-            self.pause_timer_btn.config(state='normal')
-            self.timer_status_label.config(text="Timer Running", fg=self.colors['accent'])
+            name = self.timer_name_var.get().strip() or self.next_timer_name()
             
-            # Start countdown thread
-            def countdown():
-                while self.countdown_time > 0 and self.timer_running and self.running:
-                    mins, secs = divmod(self.countdown_time, 60)
-                    
-                    # Update timer display
-                    time_str = f"{mins:02d}:{secs:02d}"
-                    self.timer_display.config(text=time_str)
-                    
-                    # Update circular progress
-                    self.draw_timer_circle()
-                    
-                    time.sleep(1)
-                    self.countdown_time -= 1
-                
-                # Timer finished
-                if self.countdown_time <= 0 and self.timer_running and self.running:
-                    self.timer_display.config(text="00:00")
-                    self.timer_status_label.config(text="Time's Up!", fg=self.colors['danger'])
-                    self.draw_timer_circle()
-                    
-                    # Play selected timer sound
-                    sound_path = self.get_timer_sound_path(self.timer_sound_var.get())
-                    self.play_alarm_sound(self.timer_sound_var.get(), sound_path or "")
-                    
-                    messagebox.showinfo("Timer", "Countdown timer finished!")
-                    self.reset_timer()
+            # The registry owns the deadline; finishing is reported back on the main thread
+            self.timers.start(name, total_seconds)
+            if name not in self.timer_tiles:
+                self.create_timer_tile(name)
+            self.select_timer(name)
             
-            timer_thread = threading.Thread(target=countdown, daemon=True)
-            timer_thread.start()
+            # Suggest a fresh name for the next timer
+            self.timer_name_var.set(self.next_timer_name())
             
         except ValueError:
             messagebox.showerror("Error", "Please enter valid numbers")
 
+    def next_timer_name(self):
+        number = 1
+        while f"Timer {number}" in self.timers.timers:
+            number += 1
+        return f"Timer {number}"
+
+    def create_timer_tile(self, name):
+        """Add a compact progress ring for a timer to the running timers list"""
+        tile = tk.Frame(self.timer_tiles_frame, bg=self.colors['card'], padx=8, pady=5)
+        tile.pack(side=tk.LEFT, padx=(0, 10))
+        
+        ring = ProgressRing(tile, self.timer_tile_size, self.colors, width=4)
+        ring.canvas.pack()
+        
+        name_label = tk.Label(tile, text=name, font=('Poppins', 10, 'bold'),
+                              fg=self.colors['text_secondary'], bg=self.colors['card'])
+        name_label.pack()
+        
+        # Clicking anywhere on the tile shows that timer in the large display
+        for widget in [tile, ring.canvas, name_label]:
+            widget.bind("<Button-1>", lambda e, n=name: self.select_timer(n))
+        
+        self.timer_tiles[name] = {'frame': tile, 'ring': ring, 'name_label': name_label}
+        self.timer_tiles_placeholder.pack_forget()
+
+    def remove_timer(self, name):
+        """Stop a timer and drop its tile; the large display moves to another timer"""
+        self.timers.remove(name)
+        tile = self.timer_tiles.pop(name, None)
+        if tile is not None:
+            tile['frame'].destroy()
+        if not self.timer_tiles:
+            self.timer_tiles_placeholder.pack(anchor='w')
+        
+        if self.selected_timer == name:
+            remaining = list(self.timer_tiles)
+            self.select_timer(remaining[-1] if remaining else None)
+
+    def select_timer(self, name):
+        """Show the given timer in the large display and bind the pause/stop buttons to it"""
+        self.selected_timer = name
+        for tile_name, tile in self.timer_tiles.items():
+            fg = self.colors['text_primary'] if tile_name == name else self.colors['text_secondary']
+            tile['name_label'].config(fg=fg)
+        self.update_timer_controls()
+        self.refresh_countdown_display()
+
+    def update_timer_controls(self):
+        """Sync the status label and pause button with the selected timer's state"""
+        timer = self.timers.get(self.selected_timer) if self.selected_timer else None
+        
+        if timer is None:
+            self.timer_status_label.config(text="Ready to start", fg=self.colors['text_secondary'])
+            self.pause_timer_btn.config(state='disabled', text="⏸️ Pause")
+        elif timer.state == CountdownTimer.PAUSED:
+            self.timer_status_label.config(text=f"{timer.name} Paused", fg=self.colors['warning'])
+            self.pause_timer_btn.config(state='normal', text="▶️ Resume")
+        elif timer.state == CountdownTimer.FINISHED:
+            self.timer_status_label.config(text=f"{timer.name}: Time's Up!", fg=self.colors['danger'])
+            self.pause_timer_btn.config(state='disabled', text="⏸️ Pause")
+        else:
+            self.timer_status_label.config(text=f"{timer.name} Running", fg=self.colors['accent'])
+            self.pause_timer_btn.config(state='normal', text="⏸️ Pause")
+
+    def refresh_countdown_display(self):
+        """Animate every timer from its deadline while any runs (one root.after loop for all timers)"""
+        if self.countdown_after_id is not None:
+            self.root.after_cancel(self.countdown_after_id)
+            self.countdown_after_id = None
+        
+        selected = self.timers.get(self.selected_timer) if self.selected_timer else None
+        remaining = selected.remaining() if selected else 0
+        
+        # Round up so the display shows 00:01 until the last second has fully elapsed
+        mins, secs = divmod(math.ceil(remaining), 60)
+        time_str = f"{mins:02d}:{secs:02d}"
+        if time_str != self.timer_display_text:  # the label only changes once a second
+            self.timer_display.config(text=time_str)
+            self.timer_display_text = time_str
+        
+        # Rings skip the update themselves when nothing visibly changed
+        for name, tile in self.timer_tiles.items():
+            timer = self.timers.get(name)
+            if timer is not None:
+                mins, secs = divmod(math.ceil(timer.remaining()), 60)
+                tile['ring'].set(timer.progress(), f"{mins:02d}:{secs:02d}")
+        
+        if self.timers.running():
+            self.countdown_after_id = self.root.after(max(1, 1000 // self.countdown_fps),
+                                                      self.refresh_countdown_display)
+
     def pause_timer(self):
-        """Pause/Resume the timer"""
-        if self.timer_running:
-            self.timer_running = False
-            self.pause_timer_btn.config(text="▶️ Resume")
-            self.timer_status_label.config(text="Timer Paused", fg=self.colors['warning'])
+        """Pause/Resume the selected timer"""
+        timer = self.timers.get(self.selected_timer) if self.selected_timer else None
+        if timer is None:
+            return
+        
+        if timer.state == CountdownTimer.RUNNING:
+            timer.pause()
+        elif timer.state == CountdownTimer.PAUSED:
+            # Resume from the stored remaining time without resetting the timer
+            timer.resume()
+        self.update_timer_controls()
+        self.refresh_countdown_display()
+
+    def finish_countdown(self, timer):
+        """Show that a countdown finished and play its sound (main thread only)"""
+        if timer.name not in self.timer_tiles:
+            return  # stopped before the notification reached the main thread
+        
+        self.select_timer(timer.name)
+        
+        # Play selected timer sound
+        sound_path = self.get_timer_sound_path(self.timer_sound_var.get())
+        self.play_alarm_sound(self.timer_sound_var.get(), sound_path or "", owner=('timer', timer.name))
+        
+        messagebox.showinfo("Timer", f"Countdown timer '{timer.name}' finished!")
+        self.engine.sound.stop(('timer', timer.name))
+        self.remove_timer(timer.name)
+
+    def sync_timer_tiles(self):
+        """Match the timer tiles to the registry after timers were changed from another thread"""
+        if "countdown" not in self.views:
+            self.create_countdown_view()  # built hidden, so finished timers can be shown
+        for name in list(self.timers.timers):
+            if name not in self.timer_tiles:
+                self.create_timer_tile(name)
+        for name in [name for name in self.timer_tiles if name not in self.timers.timers]:
+            self.remove_timer(name)
+        if self.selected_timer not in self.timer_tiles:
+            names = list(self.timer_tiles)
+            self.select_timer(names[-1] if names else None)
         else:
-            self.timer_running = True
-            self.pause_timer_btn.config(text="⏸️ Pause")
-            self.timer_status_label.config(text="Timer Running", fg=self.colors['accent'])
-            # Resume the countdown thread without resetting the timer
-            self.resume_countdown_timer()
+            self.update_timer_controls()
+            self.refresh_countdown_display()
 
     def reset_timer(self):
-        """Reset the timer"""
-        self.timer_running = False
-        self.countdown_time = 0
-        self.total_countdown_time = 0
-        
-        # Reset display
-        self.timer_display.config(text="00:00")
-        self.timer_status_label.config(text="Ready to start", fg=self.colors['text_secondary'])
-        
-        # Reset button states
-        self.start_timer_btn.config(state='normal', text="🚀 START TIMER")
-        self.pause_timer_btn.config(state='disabled', text="⏸️ Pause")
-        
-        # Clear circular timer
-        self.draw_timer_circle()
-
-    def resume_countdown_timer(self):
-        """Resume the countdown timer from where it was paused."""
-        def countdown():
-            while self.countdown_time > 0 and self.timer_running and self.running:
-                mins, secs = divmod(self.countdown_time, 60)
-                
-                # Update timer display
-                time_str = f"{mins:02d}:{secs:02d}"
-                self.timer_display.config(text=time_str)
-                
-                # Update circular progress
-                self.draw_timer_circle()
-                
-                time.sleep(1)
-                self.countdown_time -= 1
-            
-            # Timer finished
-            if self.countdown_time <= 0 and self.timer_running and self.running:
-                self.timer_display.config(text="00:00")
-                self.timer_status_label.config(text="Time's Up!", fg=self.colors['danger'])
-                self.draw_timer_circle()
-                
-                # Play selected timer sound
-                sound_path = self.get_timer_sound_path(self.timer_sound_var.get())
-                self.play_alarm_sound(self.timer_sound_var.get(), sound_path or "")
-                
-                messagebox.showinfo("Timer", "Countdown timer finished!")
-                self.reset_timer()
-        
-        timer_thread = threading.Thread(target=countdown, daemon=True)
-        timer_thread.start()
+        """Stop the selected timer"""
+        if self.selected_timer is not None:
+            self.remove_timer(self.selected_timer)
 
     def switch_view(self, view_name):
+        # Build the view on first use
+        if view_name not in self.views and view_name in self.view_builders:
+            self.view_builders[view_name]()
+        
         # Hide all views
         for view in self.views.values():
             view.pack_forget()
@@ -1045,162 +1665,23 @@ class GhanaStyleAlarmClock:
         
         # Update alarm count on home view
         if view_name == "home":
-            active_count = len([alarm for alarm in self.alarms if alarm['active']])
+            active_count = self.engine.active_count()
             self.alarm_count_label.config(text=f"{active_count} active alarm{'s' if active_count != 1 else ''}")
 
-    def create_alarm_card(self, parent, alarm, index):
-        """Create a professional alarm card with enhanced styling"""
-        # Main card container with shadow effect
-        card_container = tk.Frame(parent, bg=self.colors['bg_primary'])
-        card_container.pack(fill=tk.X, pady=8, padx=5)
-        
-        # Card with gradient-like effect using multiple frames
-        card_shadow = tk.Frame(card_container, bg=self.colors['bg_secondary'], height=2)
-        card_shadow.pack(fill=tk.X, pady=(0, 0))
-        
-        card = tk.Frame(card_container, bg=self.colors['card'], padx=25, pady=20, relief=tk.FLAT, bd=0)
-        card.pack(fill=tk.X)
-        
-        # Status indicator bar
-        status_color = self.colors['accent'] if alarm['active'] else self.colors['text_secondary']
-        status_bar = tk.Frame(card, bg=status_color, height=3)
-        status_bar.pack(fill=tk.X, pady=(0, 15))
-        
-        # Main content frame
-        content_frame = tk.Frame(card, bg=self.colors['card'])
-        content_frame.pack(fill=tk.X)
-        
-        # Left side - Time and details
-        left_frame = tk.Frame(content_frame, bg=self.colors['card'])
-        left_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        
-        # Time display
-        time_frame = tk.Frame(left_frame, bg=self.colors['card'])
-        time_frame.pack(fill=tk.X)
-        
-        time_str = f"{alarm['hour']:02d}:{alarm['minute']:02d}"
-        time_label = tk.Label(time_frame, text=time_str, 
-                            font=('Poppins', 28, 'bold'), 
-                            fg=self.colors['text_primary'], 
-                            bg=self.colors['card'])
-        time_label.pack(side=tk.LEFT)
-        
-        # AM/PM indicator (if needed)
-        hour_24 = alarm['hour']
-        am_pm = "AM" if hour_24 < 12 else "PM"
-        am_pm_label = tk.Label(time_frame, text=am_pm, 
-                             font=('Poppins', 12, 'bold'), 
-                             fg=self.colors['text_secondary'], 
-                             bg=self.colors['card'])
-        am_pm_label.pack(side=tk.LEFT, anchor='n', padx=(5, 0), pady=(8, 0))
-        
-        # Details frame
-        details_frame = tk.Frame(left_frame, bg=self.colors['card'])
-        details_frame.pack(fill=tk.X, pady=(10, 0))
-        
-        # Alarm name with icon
-        name_frame = tk.Frame(details_frame, bg=self.colors['card'])
-        name_frame.pack(fill=tk.X)
-        
-        tk.Label(name_frame, text="⏰", 
-                font=('Poppins', 14), 
-                fg=self.colors['accent'], 
-                bg=self.colors['card']).pack(side=tk.LEFT)
-        
-        tk.Label(name_frame, text=alarm['label'], 
-                font=('Poppins', 16, 'bold'), 
-                fg=self.colors['text_primary'], 
-                bg=self.colors['card']).pack(side=tk.LEFT, padx=(8, 0))
-        
-        # Days and sound info
-        info_frame = tk.Frame(details_frame, bg=self.colors['card'])
-        info_frame.pack(fill=tk.X, pady=(8, 0))
-        
-        # Days
-        days_str = ", ".join([day[:3] for day in alarm['days']])
-        tk.Label(info_frame, text=f"📅 {days_str}", 
-                font=('Poppins', 11), 
-                fg=self.colors['text_secondary'], 
-                bg=self.colors['card']).pack(anchor='w')
-        
-        # Sound info
-        sound_icon = "🎤" if any(song["title"] in alarm['sound'] for song in self.black_sheriff_songs) else "🔔"
-        tk.Label(info_frame, text=f"{sound_icon} {alarm['sound']}", 
-                font=('Poppins', 11), 
-                fg=self.colors['text_secondary'], 
-                bg=self.colors['card']).pack(anchor='w', pady=(2, 0))
-        
-        # Right side - Controls
-        controls_frame = tk.Frame(content_frame, bg=self.colors['card'])
-        controls_frame.pack(side=tk.RIGHT, padx=(20, 0))
-        
-        # Status indicator
-        status_indicator = tk.Frame(controls_frame, bg=self.colors['card'])
-        status_indicator.pack(pady=(0, 15))
-        
-        status_text = "ACTIVE" if alarm['active'] else "INACTIVE"
-        status_label = tk.Label(status_indicator, text=status_text, 
-                              font=('Poppins', 10, 'bold'), 
-                              fg=status_color, 
-                              bg=self.colors['card'])
-        status_label.pack()
-        
-        # Control buttons container
-        buttons_frame = tk.Frame(controls_frame, bg=self.colors['card'])
-        buttons_frame.pack()
-        
-        # Toggle button
-        toggle_bg = self.colors['accent'] if alarm['active'] else self.colors['bg_tertiary']
-        toggle_text = "ON" if alarm['active'] else "OFF"
-        
-        toggle_btn = tk.Button(buttons_frame, text=toggle_text,
-                              command=lambda: self.toggle_alarm_by_index(index),
-                              bg=toggle_bg,
-                              fg=self.colors['text_primary'],
-                              font=('Poppins', 12, 'bold'), bd=0, 
-                              padx=20, pady=8, relief=tk.FLAT,
-                              activebackground='#1ed760' if alarm['active'] else self.colors['hover'])
-        toggle_btn.pack(pady=(0, 8))
-        
-        # Delete button
-        delete_btn = tk.Button(buttons_frame, text="🗑️ Delete",
-                              command=lambda: self.delete_alarm_by_index(index),
-                              bg=self.colors['danger'], 
-                              fg=self.colors['text_primary'],
-                              font=('Poppins', 10, 'bold'), bd=0, 
-                              padx=15, pady=6, relief=tk.FLAT,
-                              activebackground='#c0392b')
-        delete_btn.pack()
-        
-        # Hover effects for the entire card
-        def on_card_enter(event):
-            card.config(bg=self.colors['card_hover'])
-            for widget in [content_frame, left_frame, time_frame, details_frame, 
-                          name_frame, info_frame, controls_frame, status_indicator, buttons_frame]:
-                widget.config(bg=self.colors['card_hover'])
-            # Keep text labels background updated
-            for label in [time_label, am_pm_label, status_label]:
-                label.config(bg=self.colors['card_hover'])
-        
-        def on_card_leave(event):
-            card.config(bg=self.colors['card'])
-            for widget in [content_frame, left_frame, time_frame, details_frame, 
-                          name_frame, info_frame, controls_frame, status_indicator, buttons_frame]:
-                widget.config(bg=self.colors['card'])
-            # Keep text labels background updated
-            for label in [time_label, am_pm_label, status_label]:
-                label.config(bg=self.colors['card'])
-        
-        # Bind hover events to main card elements
-        for widget in [card, content_frame, left_frame, time_frame, time_label]:
-            widget.bind("<Enter>", on_card_enter)
-            widget.bind("<Leave>", on_card_leave)
+    def create_alarm_card(self, parent, alarm=None, index=-1):
+        """Create a professional alarm card with enhanced styling (reused via AlarmCard.show)"""
+        card = AlarmCard(self, parent)
+        if alarm is not None:
+            card.show(alarm, index)
+        return card
 
     def get_sound_path(self, sound_name):
         if sound_name == "Default Beep":
             return None
         elif sound_name == "Custom Sound":
             return self.sound_path if self.sound_path else None
+        elif sound_name in self.tone_sounds:
+            return self.tone_sounds[sound_name]
         else:
             # Check if it's a Black Sheriff song
             for song in self.black_sheriff_songs:
@@ -1216,49 +1697,17 @@ class GhanaStyleAlarmClock:
         if file_path:
             self.sound_path = file_path
             self.sound_var.set("Custom Sound")
+            self.engine.sound.preload([file_path])
 
     def test_sound(self):
         try:
-            pygame.mixer.music.set_volume(self.volume_var.get())
             sound_path = self.get_sound_path(self.sound_var.get())
-            
-            if sound_path and os.path.exists(sound_path):
-                pygame.mixer.music.load(sound_path)
-                pygame.mixer.music.play()
-            else:
-                self.create_beep_sound()
-                pygame.mixer.music.play()
+            self.engine.sound.play(sound_path or "", loop=False, owner='test')
             
             messagebox.showinfo("Test", f"Playing: {self.sound_var.get()}")
         except Exception as e:
             messagebox.showerror("Error", f"Could not play sound: {str(e)}")
 
-    def create_beep_sound(self):
-        # Create a simple beep sound if it doesn't exist
-        if not os.path.exists("beep.wav"):
-            try:
-                import numpy as np
-                import wave
-                
-                sample_rate = 44100
-                duration = 2.0
-                frequency = 440.0
-                
-                t = np.linspace(0, duration, int(sample_rate * duration))
-                audio_data = np.sin(2 * np.pi * frequency * t)
-                audio_data = (audio_data * 32767).astype(np.int16)
-                
-                with wave.open("beep.wav", 'w') as wav_file:
-                    wav_file.setnchannels(1)
-                    wav_file.setsampwidth(2)
-                    wav_file.setframerate(sample_rate)
-                    wav_file.writeframes(audio_data.tobytes())
-            except ImportError:
-                print("numpy not available, using pygame beep")
-        
-        if os.path.exists("beep.wav"):
-            pygame.mixer.music.load("beep.wav")
-
     def create_alarm(self):
         try:
             hour = int(self.hour_var.get())
@@ -1275,21 +1724,29 @@ class GhanaStyleAlarmClock:
                 messagebox.showerror("Error", "Please select at least one day")
                 return
             
+            timezone = self.timezone_var.get().strip()
+            timezone = None if timezone in ("", "Local") else timezone
+            try:
+                get_zone(timezone)
+            except ValueError as e:
+                messagebox.showerror("Error", str(e))
+                return
+            
             sound_path = self.get_sound_path(self.sound_var.get())
             
-            alarm = {
-                'id': len(self.alarms) + 1,
-                'hour': hour,
-                'minute': minute,
-                'label': label,
-                'days': selected_days,
-                'active': True,
-                'sound': self.sound_var.get(),
-                'sound_path': sound_path or ""
-            }
+            alarm = AlarmRecord(
+                id=0,  # the engine assigns the next free id
+                hour=hour,
+                minute=minute,
+                label=label,
+                days_mask=days_to_mask(selected_days),
+                active=True,
+                sound=self.sound_var.get(),
+                sound_path=sound_path or "",
+                timezone=timezone
+            )
             
-            self.alarms.append(alarm)
-            self.save_alarms()
+            self.engine.add_alarm(alarm)
             
             messagebox.showinfo("Success", f"Alarm '{label}' created successfully!")
             
@@ -1304,46 +1761,126 @@ class GhanaStyleAlarmClock:
         except ValueError:
             messagebox.showerror("Error", "Please enter valid time values")
 
-    def toggle_alarm_by_index(self, index):
-        if 0 <= index < len(self.alarms):
-            self.alarms[index]['active'] = not self.alarms[index]['active']
-            self.save_alarms()
-            self.refresh_alarm_list()
+    def toggle_alarm_by_id(self, alarm_id):
+        if self.engine.toggle_alarm(alarm_id) is not None:
+            self.refresh_alarm_card(alarm_id)
 
-    def delete_alarm_by_index(self, index):
-        if 0 <= index < len(self.alarms):
+    def delete_alarm_by_id(self, alarm_id):
+        if self.engine.get_alarm(alarm_id) is not None:
             if messagebox.askyesno("Confirm", "Are you sure you want to delete this alarm?"):
-                del self.alarms[index]
-                self.save_alarms()
+                self.engine.delete_alarm(alarm_id)
                 self.refresh_alarm_list()
 
-    def refresh_alarm_list(self):
-        # Clear existing cards
-        for widget in self.alarm_cards_frame.winfo_children():
-            widget.destroy()
-        
-        if not self.alarms:
-            # Enhanced empty state
-            empty_frame = tk.Frame(self.alarm_cards_frame, bg=self.colors['bg_primary'])
-            empty_frame.pack(expand=True, fill=tk.BOTH, pady=100)
-            
-            tk.Label(empty_frame, text="⏰", 
-                    font=('Poppins', 60), 
-                    fg=self.colors['text_secondary'], 
-                    bg=self.colors['bg_primary']).pack()
-            
-            tk.Label(empty_frame, text="No alarms set yet", 
-                    font=('Poppins', 18, 'bold'), 
-                    fg=self.colors['text_secondary'], 
-                    bg=self.colors['bg_primary']).pack(pady=(10, 5))
+    ALARM_FILE_TYPES = [("Alarm files", "*.csv *.jsonl *.ics"), ("CSV", "*.csv"),
+                        ("JSON Lines", "*.jsonl"), ("iCalendar", "*.ics"), ("All Files", "*.*")]
+
+    def import_alarms(self):
+        """Import alarms from a CSV, JSON Lines or iCalendar file"""
+        file_path = filedialog.askopenfilename(title="Import Alarms", filetypes=self.ALARM_FILE_TYPES)
+        if not file_path:
+            return
+        self.import_btn.config(state=tk.DISABLED, text="⏳ Importing...")
+        
+        # Parse, validate, schedule and save off the UI thread (the engine locks itself); one store
+        # write for the whole file, and the UI thread only refreshes the list afterwards
+        def worker():
+            records = []
+            try:
+                _, errors = alarm_io.import_alarms(self.engine, file_path, add_batch=records.extend)
+                if records:
+                    self.engine.add_many(records)
+            except Exception as e:
+                records, errors = [], [f"Could not import alarms: {str(e)}"]
+            self.ui.call(finish, records, errors)
+        
+        def finish(records, errors):
+            self.refresh_alarm_list()
+            self.import_btn.config(state=tk.NORMAL, text="⬇ Import")
             
-            tk.Label(empty_frame, text="Create your first alarm to get started", 
-                    font=('Poppins', 12), 
-                    fg=self.colors['text_secondary'], 
-                    bg=self.colors['bg_primary']).pack()
-        else:
-            for index, alarm in enumerate(self.alarms):
-                self.create_alarm_card(self.alarm_cards_frame, alarm, index)
+            message = f"Imported {len(records)} alarm{'s' if len(records) != 1 else ''}."
+            if errors:
+                message += f"\n\nSkipped {len(errors)} invalid entr{'ies' if len(errors) != 1 else 'y'}:\n"
+                message += "\n".join(errors[:10]) + ("\n..." if len(errors) > 10 else "")
+                messagebox.showwarning("Import", message)
+            else:
+                messagebox.showinfo("Import", message)
+        
+        threading.Thread(target=worker, daemon=True).start()
+
+    def export_alarms(self):
+        """Export all alarms to a CSV, JSON Lines or iCalendar file (chosen by extension)"""
+        file_path = filedialog.asksaveasfilename(title="Export Alarms", defaultextension=".csv",
+                                                 filetypes=self.ALARM_FILE_TYPES)
+        if not file_path:
+            return
+        try:
+            with self.engine.lock:
+                alarms = list(self.engine.alarms)
+            count = alarm_io.export_alarms(alarms, file_path)
+            messagebox.showinfo("Export", f"Exported {count} alarm{'s' if count != 1 else ''} to {os.path.basename(file_path)}")
+        except Exception as e:
+            messagebox.showerror("Error", f"Could not export alarms: {str(e)}")
+
+    def refresh_alarm_list(self):
+        """Re-layout the alarm list after alarms were added, removed or reloaded"""
+        if not hasattr(self, 'alarm_canvas'):
+            return
+        
+        with self.engine.lock:
+            count = len(self.engine.alarms)
+        self.alarm_canvas.configure(scrollregion=(0, 0, 0, count * self.alarm_card_height))
+        self.alarm_canvas.itemconfigure(self.empty_state_item, state='hidden' if count else 'normal')
+        
+        # Positions may have shifted, so rebind every visible card
+        self.update_visible_cards(rebind=True)
+
+    def refresh_alarm_card(self, alarm_id):
+        """Patch the card of a single alarm in place (no-op if it is scrolled out of view)"""
+        card = getattr(self, 'cards_by_alarm_id', {}).get(alarm_id)
+        alarm = self.engine.get_alarm(alarm_id)
+        if card is not None and alarm is not None:
+            card.show(alarm, card.index)
+
+    def update_visible_cards(self, rebind=False):
+        """Show cards only for rows inside the viewport, recycling cards that scrolled away"""
+        started = time.perf_counter()
+        canvas = self.alarm_canvas
+        row_height = self.alarm_card_height
+        top = canvas.canvasy(0)
+        bottom = top + canvas.winfo_height()
+        first = max(0, int(top // row_height) - 1)  # one row of overscan above and below
+        width = max(1, canvas.winfo_width() - 10)
+        
+        # API threads change the list meanwhile; take the visible rows in one consistent slice
+        with self.engine.lock:
+            rows = self.engine.alarms[first:int(bottom // row_height) + 2]
+        last = first + len(rows)
+        
+        # Release cards whose rows are no longer visible
+        for index in list(self.visible_cards):
+            if not first <= index < last or rebind:
+                card, item = self.visible_cards.pop(index)
+                self.cards_by_alarm_id.pop(card.alarm_id, None)
+                canvas.itemconfigure(item, state='hidden')
+                self.alarm_card_pool.append((card, item))
+        
+        # Bind a (recycled) card to every visible row that does not have one yet
+        for index in range(first, last):
+            if index in self.visible_cards:
+                continue
+            if self.alarm_card_pool:
+                card, item = self.alarm_card_pool.pop()
+            else:
+                card = self.create_alarm_card(canvas)
+                item = canvas.create_window((5, 0), window=card.frame, anchor="nw")
+            card.show(rows[index - first], index)
+            canvas.coords(item, 5, index * row_height)
+            canvas.itemconfigure(item, state='normal', width=width, height=row_height - 16)
+            self.visible_cards[index] = (card, item)
+            self.cards_by_alarm_id[card.alarm_id] = card
+        
+        canvas.itemconfigure(self.empty_state_item, width=width)
+        metrics.observe('ui_refresh_seconds', time.perf_counter() - started, what='alarm_list')
 
     def update_time(self):
         while self.running:
@@ -1352,126 +1889,43 @@ class GhanaStyleAlarmClock:
             date_str = self.current_time.strftime("%A, %B %d, %Y")
             
             if hasattr(self, 'current_time_label'):
-                self.current_time_label.config(text=time_str)
+                self.ui.config(self.current_time_label, text=time_str)
             if hasattr(self, 'current_date_label'):
-                self.current_date_label.config(text=date_str)
-            
-            time.sleep(1)
-
-    def check_alarms(self):
-        while self.running:
-            current_time = datetime.datetime.now()
-            current_day = current_time.strftime("%A")
-            current_hour = current_time.hour
-            current_minute = current_time.minute
-            
-            for alarm in self.alarms:
-                if (alarm['active'] and 
-                    current_day in alarm['days'] and 
-                    current_hour == alarm['hour'] and 
-                    current_minute == alarm['minute'] and
-                    current_time.second == 0):  # Only trigger once per minute
-                    self.trigger_alarm(alarm)
+                self.ui.config(self.current_date_label, text=date_str)
             
             time.sleep(1)
 
-    def trigger_alarm(self, alarm):
-        def show_alarm():
-            self.play_alarm_sound(alarm['sound'], alarm['sound_path'])
-            
-            alarm_window = tk.Toplevel(self.root)
-            alarm_window.title("ALARM!")
-            alarm_window.geometry("500x300")
-            alarm_window.configure(bg=self.colors['bg_primary'])
-            alarm_window.attributes('-topmost', True)
-            
-            # Center the window
-            alarm_window.transient(self.root)
-            alarm_window.grab_set()
-            
-            # Alarm content
-            tk.Label(alarm_window, text="⏰", 
-                    font=('Poppins', 60), 
-                    fg=self.colors['accent'], 
-                    bg=self.colors['bg_primary']).pack(pady=20)
-            
-            tk.Label(alarm_window, text="ALARM!", 
-                    font=('Poppins', 24, 'bold'), 
-                    fg=self.colors['text_primary'], 
-                    bg=self.colors['bg_primary']).pack()
-            
-            tk.Label(alarm_window, text=alarm['label'], 
-                    font=('Poppins', 18), 
-                    fg=self.colors['text_secondary'], 
-                    bg=self.colors['bg_primary']).pack(pady=10)
-            
-            time_str = f"{alarm['hour']:02d}:{alarm['minute']:02d}"
-            tk.Label(alarm_window, text=f"Time: {time_str}", 
-                    font=('Poppins', 14), 
-                    fg=self.colors['text_secondary'], 
-                    bg=self.colors['bg_primary']).pack()
-            
-            # Show sound name
-            tk.Label(alarm_window, text=f"♪ {alarm['sound']}", 
-                    font=('Poppins', 12), 
-                    fg=self.colors['accent'], 
-                    bg=self.colors['bg_primary']).pack(pady=5)
-            
-            def stop_alarm():
-                pygame.mixer.music.stop()
-                alarm_window.destroy()
-            
-            # Stop button
-            stop_btn = tk.Button(alarm_window, text="Stop Alarm", 
-                           command=stop_alarm, 
-                           bg=self.colors['danger'], 
-                           fg=self.colors['text_primary'], 
-                           font=('Poppins', 16, 'bold'),
-                           padx=30, pady=12, bd=0, relief=tk.FLAT,
-                           activebackground='#c0392b')
-            stop_btn.pack(pady=30)
-            
-            # Bind the close event to stop the alarm
-            alarm_window.protocol("WM_DELETE_WINDOW", stop_alarm)
-    
-        # Run in main thread
-        self.root.after(0, show_alarm)
+    def trigger_alarm(self, firing, action=None):
+        # The 'popup' action, called from the scheduler thread; the shared popup is updated on the main thread
+        self.ui.call(self.notifier.add, firing)
 
-    def play_alarm_sound(self, sound_type, sound_path):
+    def play_alarm_sound(self, sound_type, sound_path, owner=None):
         try:
-            pygame.mixer.music.set_volume(self.volume_var.get())
-            
-            if sound_path and os.path.exists(sound_path):
-                pygame.mixer.music.load(sound_path)
-            else:
-                self.create_beep_sound()
-            
-            pygame.mixer.music.play(-1)  # Loop indefinitely
+            # Loops until stopped; each owner gets its own mixer channel
+            self.engine.sound.play(sound_path, owner=owner, priority=AlarmEngine.TIMER_PRIORITY)
         except Exception as e:
             print(f"Could not play alarm sound: {str(e)}")
 
-    def save_alarms(self):
-        try:
-            with open(self.alarm_file, 'w') as f:
-                json.dump(self.alarms, f, indent=2)
-        except Exception as e:
-            print(f"Could not save alarms: {str(e)}")
-
-    def load_alarms(self):
-        try:#We will load the saved alarms from a JSON file
-            if os.path.exists(self.alarm_file):#check if the file exists (thus if the is a saved alarm schedule)
-                with open(self.alarm_file, 'r') as f:
-                    self.alarms = json.load(f)
-        except Exception as e:
-            print(f"Could not load alarms: {str(e)}")
-            self.alarms = []
-
     def on_closing(self):
         self.running = False
-        pygame.mixer.quit()
+        if self.api is not None:
+            self.api.stop()
+        self.ui.stop()
+        self.timers.close()
+        self.engine.stop()
+        metrics.stop_dump()
         self.root.destroy()
 
 def main():
+    parser = argument_parser("Multi-alarm clock (Tk), or the alarm daemon with --headless")
+    parser.add_argument("--headless", action="store_true", help="run the alarms without opening a window")
+    parser.add_argument("--startup-report", action="store_true", help="print how long each startup phase took")
+    args = parser.parse_args()
+    if args.headless:
+        # No display needed; the daemon takes the same options
+        headless_from_args(args)
+        return
+
     # Check for required dependencies
     try:
         import pygame
@@ -1480,6 +1934,11 @@ def main():
         print("Install it with: pip install pygame")
         return
     
+    # Record metrics with --metrics, and also write them to --metrics-file periodically
+    if args.metrics_file:
+        metrics.start_dump(args.metrics_file, args.metrics_interval)
+    elif args.metrics:
+        metrics.enable()
     root = tk.Tk()
     
     # Set minimum window size
@@ -1491,7 +1950,10 @@ def main():
     except:
         pass
     
-    app = GhanaStyleAlarmClock(root)
+    app = GhanaStyleAlarmClock(root, report_startup=args.startup_report, alarm_file=args.alarm_file,
+                               snooze_minutes=args.snooze_minutes, max_snoozes=args.max_snoozes,
+                               api_port=args.api_port, api_socket=args.api_socket, grace=args.grace,
+                               api_token_file=args.api_token_file, api_allow_actions=args.api_allow_actions)
     root.mainloop()
 
 if __name__ == "__main__":
@@ -0,0 +1,279 @@
+# coding: utf-8
+"""Per-alarm action pipelines: what happens when an alarm rings.
+
+Each alarm may carry a list of actions (`AlarmRecord.actions`, stored with the alarm);
+alarms without one use DEFAULT_ACTIONS, i.e. play the sound and show the popup. An action
+is a dict with a 'type' and that type's options:
+
+    {"type": "sound"}                                    play the alarm's sound
+    {"type": "popup"}                                    the alarm window (printed when headless)
+    {"type": "notify"}                                   desktop notification via notify-send
+    {"type": "shell", "command": "..."}                  run a shell command; ALARM_* variables describe the alarm
+    {"type": "webhook", "url": "http://127.0.0.1:..."}   POST the firing as JSON to a local endpoint
+    {"type": "python", "callable": "module:function"}    call function(firing)
+
+Any action may set "timeout" (seconds). Sound and popup only hand work to other threads,
+so they run right away; everything else runs on a bounded thread pool, so a slow command
+or an unreachable endpoint never holds up other alarms ringing in the same minute. A shell
+command runs in its own process group, and the whole group is killed at the timeout. The
+queueing delay, run time and failures of every action type are recorded (see `stats()`).
+"""
+
+import importlib
+import json
+import os
+import shutil
+import signal
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+ACTION_TYPES = ('sound', 'popup', 'notify', 'shell', 'webhook', 'python')
+DEFAULT_ACTIONS = [{'type': 'sound'}, {'type': 'popup'}]
+
+# Actions that only post work elsewhere and never block: run on the firing thread
+INLINE_TYPES = ('sound', 'popup')
+
+DEFAULT_TIMEOUT = 10.0
+MAX_WORKERS = 8
+MAX_PENDING = 1000  # queued pool actions beyond this are dropped (and counted)
+
+# Webhooks may only go to this machine
+LOCAL_HOSTS = ('127.0.0.1', 'localhost', '::1')
+
+
+class _RefuseRedirects(urllib.request.HTTPRedirectHandler):
+    """A redirect could send a local webhook anywhere; the 3xx is reported as an error instead"""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+# No redirects and no proxies, so a webhook request never leaves LOCAL_HOSTS
+_webhook_opener = urllib.request.build_opener(urllib.request.ProxyHandler({}), _RefuseRedirects)
+
+
+def validate_actions(actions) -> Optional[List[Dict]]:
+    """Check an action list (or its JSON text), raising ValueError; None/empty means the defaults"""
+    if isinstance(actions, str):
+        if not actions.strip():
+            return None
+        try:
+            actions = json.loads(actions)
+        except ValueError:
+            raise ValueError("actions must be a JSON list")
+    if not actions:
+        return None
+    if not isinstance(actions, list):
+        raise ValueError("actions must be a list")
+    checked = []
+    for action in actions:
+        if isinstance(action, str):
+            action = {'type': action}  # shorthand: "sound"
+        if not isinstance(action, dict) or action.get('type') not in ACTION_TYPES:
+            raise ValueError(f"unknown action {action!r} (use one of {', '.join(ACTION_TYPES)})")
+        kind = action['type']
+        if kind == 'shell' and not str(action.get('command') or "").strip():
+            raise ValueError("shell action needs a 'command'")
+        if kind == 'webhook':
+            url = urllib.parse.urlparse(str(action.get('url') or ""))
+            if url.scheme not in ('http', 'https') or url.hostname not in LOCAL_HOSTS:
+                raise ValueError(f"webhook url must be http(s) on {', '.join(LOCAL_HOSTS)}")
+        if kind == 'python' and ':' not in str(action.get('callable') or ""):
+            raise ValueError("python action needs a 'callable' like 'module:function'")
+        if 'timeout' in action:
+            try:
+                if float(action['timeout']) <= 0:
+                    raise ValueError
+            except (TypeError, ValueError):
+                raise ValueError("action timeout must be a positive number of seconds")
+        checked.append(dict(action))
+    return checked
+
+
+class ActionStats:
+    """Counters and timings of one action type"""
+
+    __slots__ = ('runs', 'failures', 'timeouts', 'dropped', 'total_seconds', 'max_seconds',
+                 'total_delay', 'max_delay', 'last_error')
+
+    def __init__(self):
+        self.runs = 0
+        self.failures = 0  # includes timeouts
+        self.timeouts = 0
+        self.dropped = 0  # never run because the queue was full
+        self.total_seconds = 0.0  # run time
+        self.max_seconds = 0.0
+        self.total_delay = 0.0  # time from the firing to the action starting
+        self.max_delay = 0.0
+        self.last_error = ""
+
+    def to_dict(self) -> Dict:
+        return {'runs': self.runs, 'failures': self.failures, 'timeouts': self.timeouts, 'dropped': self.dropped,
+                'avg_seconds': self.total_seconds / self.runs if self.runs else 0.0,
+                'max_seconds': self.max_seconds,
+                'avg_delay': self.total_delay / self.runs if self.runs else 0.0,
+                'max_delay': self.max_delay, 'last_error': self.last_error}
+
+
+class ActionRunner:
+    """Runs the action pipeline of every firing.
+
+    Handlers are `handler(firing, action)` callables keyed by action type; notify, shell,
+    webhook and python are built in, and the engine and front ends register sound and popup.
+    """
+
+    def __init__(self, max_workers: int = MAX_WORKERS, max_pending: int = MAX_PENDING,
+                 timeout: float = DEFAULT_TIMEOUT):
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.handlers: Dict[str, Callable[[object, Dict], None]] = {
+            'notify': self._notify,
+            'shell': self._shell,
+            'webhook': self._webhook,
+            'python': self._python,
+        }
+        # Called with (action type, run seconds, error or None) after every action, e.g. for metrics
+        self.listeners: List[Callable[[str, float, Optional[Exception]], None]] = []
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="alarm-action")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._stats: Dict[str, ActionStats] = {}
+        self._callables: Dict[str, Callable] = {}
+
+    def register(self, kind: str, handler: Callable[[object, Dict], None]):
+        self.handlers[kind] = handler
+
+    def run(self, firing, actions: Optional[List[Dict]] = None):
+        """Start every action of `firing` (default: its alarm's list); returns without waiting"""
+        actions = actions if actions is not None else (firing.alarm.actions or DEFAULT_ACTIONS)
+        fired_at = time.monotonic()
+        for action in actions:
+            kind = action.get('type')
+            if kind in INLINE_TYPES:
+                self._run_one(firing, action, fired_at, pooled=False)
+                continue
+            with self._lock:
+                if self._pending >= self.max_pending:
+                    self._stat(kind).dropped += 1
+                    print(f"Alarm action queue full, dropped {kind} action of {firing.alarm.label!r}")
+                    continue
+                self._pending += 1
+            self._executor.submit(self._run_one, firing, action, fired_at)
+
+    def stats(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {kind: stats.to_dict() for kind, stats in self._stats.items()}
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _stat(self, kind: str) -> ActionStats:
+        # Callers hold self._lock
+        stats = self._stats.get(kind)
+        if stats is None:
+            stats = self._stats[kind] = ActionStats()
+        return stats
+
+    def _run_one(self, firing, action: Dict, fired_at: float, pooled: bool = True):
+        kind = action.get('type')
+        started = time.monotonic()
+        error = None
+        try:
+            handler = self.handlers.get(kind)
+            if handler is None:
+                raise RuntimeError(f"no handler for {kind!r} actions here")
+            handler(firing, action)
+        except Exception as e:
+            error = e
+            print(f"Alarm action {kind} failed for {firing.alarm.label!r}: {str(e)}")
+        seconds = time.monotonic() - started
+        timed_out = isinstance(error, (subprocess.TimeoutExpired, TimeoutError)) or (
+            isinstance(error, urllib.error.URLError) and isinstance(error.reason, TimeoutError))
+        if error is None and seconds > self._timeout(action):
+            # Python callables cannot be interrupted; count them as timed out all the same
+            error, timed_out = TimeoutError(f"took {seconds:.1f}s"), True
+
+        with self._lock:
+            if pooled:
+                self._pending -= 1
+            stats = self._stat(kind)
+            stats.runs += 1
+            stats.total_seconds += seconds
+            stats.max_seconds = max(stats.max_seconds, seconds)
+            delay = started - fired_at
+            stats.total_delay += delay
+            stats.max_delay = max(stats.max_delay, delay)
+            if error is not None:
+                stats.failures += 1
+                stats.timeouts += timed_out
+                stats.last_error = str(error)
+        for listener in self.listeners:
+            try:
+                listener(kind, seconds, error)
+            except Exception as e:
+                print(f"Action listener failed: {str(e)}")
+
+    def _timeout(self, action: Dict) -> float:
+        return float(action.get('timeout') or self.timeout)
+
+    # --- Built-in actions ----------------------------------------------------------------
+
+    def _notify(self, firing, action: Dict):
+        if shutil.which('notify-send') is None:
+            raise RuntimeError("notify-send is not installed")
+        alarm = firing.alarm
+        subprocess.run(['notify-send', '--app-name=Multi-Alarm Clock', 'Alarm',
+                        f"{alarm.hour:02d}:{alarm.minute:02d}  {alarm.label}"],
+                       timeout=self._timeout(action), check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def _shell(self, firing, action: Dict):
+        # The alarm is passed in the environment, never pasted into the command text
+        alarm = firing.alarm
+        env = dict(os.environ, ALARM_ID=str(alarm.id), ALARM_LABEL=alarm.label,
+                   ALARM_TIME=f"{alarm.hour:02d}:{alarm.minute:02d}", ALARM_INSTANCE=str(firing.id),
+                   ALARM_SNOOZES=str(firing.snoozes))
+        # A session of its own, so a timeout kills whatever the command started, not just the shell
+        process = subprocess.Popen(action['command'], shell=True, env=env, stdout=subprocess.DEVNULL,
+                                   stderr=subprocess.PIPE, start_new_session=True)
+        try:
+            _, stderr = process.communicate(timeout=self._timeout(action))
+        except subprocess.TimeoutExpired:
+            _kill_group(process)
+            raise
+        if process.returncode != 0:
+            message = stderr.decode('utf-8', 'replace').strip().splitlines()[-1:] or [""]
+            raise RuntimeError(f"exit status {process.returncode} {message[0]}".strip())
+
+    def _webhook(self, firing, action: Dict):
+        body = json.dumps({'instance': firing.id, 'snoozes': firing.snoozes, 'due': firing.due,
+                           'alarm': firing.alarm.to_dict()}).encode('utf-8')
+        request = urllib.request.Request(action['url'], data=body, method='POST',
+                                         headers={'Content-Type': 'application/json'})
+        with _webhook_opener.open(request, timeout=self._timeout(action)) as response:
+            response.read()
+
+    def _python(self, firing, action: Dict):
+        path = action['callable']
+        function = self._callables.get(path)
+        if function is None:
+            module_name, _, name = path.partition(':')
+            function = self._callables[path] = getattr(importlib.import_module(module_name), name)
+        function(firing)
+
+
+def _kill_group(process: subprocess.Popen):
+    try:
+        if hasattr(os, 'killpg'):
+            os.killpg(process.pid, signal.SIGKILL)  # the shell's pid is its process group id
+        else:
+            process.kill()
+    except ProcessLookupError:
+        pass
+    process.wait()
+    process.stderr.close()  # a child that left the group may still hold the pipe; stop reading it
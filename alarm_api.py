@@ -0,0 +1,560 @@
+# coding: utf-8
+"""Local control API: manage alarms and timers over HTTP, on localhost or a Unix socket.
+
+`AlarmApiServer` runs an asyncio server in a background thread and works on the running
+`AlarmEngine` (and so on its store and scheduler), whether that belongs to the Tk window
+or to the headless daemon. Requests are parsed on the event loop; engine calls run one at
+a time on a single worker thread, so writes keep their order, the event loop never waits
+for the disk and the Tk main loop is not involved at all. Connections are kept alive, so a
+client can send many requests over one socket.
+
+Endpoints (JSON bodies and responses; alarms use the alarms.json schema):
+
+    GET    /alarms                    all alarms
+    POST   /alarms                    create an alarm (validated like imports, see alarm_io.validate)
+    GET    /alarms/<id>
+    PATCH  /alarms/<id>               change some fields
+    DELETE /alarms/<id>
+    POST   /alarms/<id>/toggle
+    POST   /alarms/bulk               {"add": [...], "update": [{"id": 1, ...}], "delete": [ids]}
+    GET    /timers
+    POST   /timers/<name>/start       {"seconds": 90}
+    POST   /timers/<name>/pause       (also resume, reset)
+    DELETE /timers/<name>
+    GET    /actions                   run counts, latency and failures per action type
+    GET    /metrics                   latency histograms and counters as Prometheus text (with --metrics)
+    GET    /events                    Server-Sent Events: fired, missed, changed, timer
+
+A bulk request is validated as a whole first: if any entry is invalid nothing is applied.
+The server only listens on 127.0.0.1 and on a Unix socket readable by its owner alone.
+
+Every request must carry the API token as `Authorization: Bearer <token>`; the token is
+created on first start in a file only its owner can read (DEFAULT_TOKEN_FILE, or
+--api-token-file). Requests must be addressed to localhost, may not come from another
+web origin and send their bodies as `Content-Type: application/json`, so a web page in
+the user's browser cannot reach the API by cross-site requests or DNS rebinding.
+
+Alarms created or changed over the API may only use the actions in API_ACTIONS: `shell`
+and `python` actions run arbitrary code, so they come from the local alarm file or an
+import unless the server is started with them allowed (--api-allow-actions shell,python).
+"""
+
+import asyncio
+import concurrent.futures
+import hmac
+import json
+import os
+import re
+import secrets
+import threading
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import unquote, urlsplit
+
+import alarm_io
+from alarm_actions import ACTION_TYPES, validate_actions
+from alarm_engine import AlarmEngine, AlarmFiring, AlarmRecord, CountdownTimer, TimerRegistry
+from alarm_metrics import metrics
+
+DEFAULT_PORT = 8765
+DEFAULT_TOKEN_FILE = os.path.join(os.path.expanduser("~"), ".alarm_api_token")
+
+# Host and Origin names that refer to this machine
+LOCAL_NAMES = ('localhost', '127.0.0.1', '::1')
+
+MAX_HEADER_BYTES = 64 * 1024
+MAX_BODY_BYTES = 64 * 1024 * 1024  # room for bulk requests with ~100k alarms
+
+EVENT_QUEUE_SIZE = 1000  # events buffered per /events client; a slower client misses the rest
+KEEPALIVE_SECONDS = 15
+
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 401: "Unauthorized", 403: "Forbidden",
+           404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large", 415: "Unsupported Media Type",
+           500: "Internal Server Error"}
+
+# Fields of an alarm that PATCH and bulk updates may change
+ALARM_FIELDS = ('hour', 'minute', 'label', 'days_mask', 'active', 'sound', 'sound_path', 'rule', 'timezone',
+                'actions')
+
+# Action types requests may set unless the server allows more; shell and python run arbitrary code
+API_ACTIONS = tuple(kind for kind in ACTION_TYPES if kind not in ('shell', 'python'))
+
+# Keys a request may use for an alarm (the alarms.json schema); anything else is rejected
+REQUEST_FIELDS = ('id', 'hour', 'minute', 'label', 'days', 'active', 'sound', 'sound_path', 'rule', 'timezone',
+                  'actions')
+
+
+def load_token(path: str = DEFAULT_TOKEN_FILE) -> str:
+    """The API token stored in `path`, created (readable by its owner only) if there is none yet"""
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        if os.stat(path).st_mode & 0o077:
+            os.chmod(path, 0o600)
+        with open(path, 'r') as f:
+            token = f.read().strip()
+        if token:
+            return token
+        fd = os.open(path, os.O_WRONLY | os.O_TRUNC)
+    token = secrets.token_urlsafe(32)
+    with os.fdopen(fd, 'w') as f:
+        f.write(token + "\n")
+    return token
+
+
+class ApiError(Exception):
+    """Turned into an error response with this HTTP status"""
+
+    def __init__(self, status: int, message: str, **details):
+        super().__init__(message)
+        self.status = status
+        self.details = details
+
+
+class AlarmApiServer:
+    """Serves the control API for one engine (and optionally a TimerRegistry)"""
+
+    # (method, path pattern, handler name); path groups are passed to the handler
+    ROUTES = [
+        ('GET', r'/alarms', '_list_alarms'),
+        ('POST', r'/alarms', '_create_alarm'),
+        ('POST', r'/alarms/bulk', '_bulk'),
+        ('GET', r'/alarms/(\d+)', '_get_alarm'),
+        ('PATCH', r'/alarms/(\d+)', '_update_alarm'),
+        ('DELETE', r'/alarms/(\d+)', '_delete_alarm'),
+        ('POST', r'/alarms/(\d+)/toggle', '_toggle_alarm'),
+        ('GET', r'/timers', '_list_timers'),
+        ('POST', r'/timers/([^/]+)/(start|pause|resume|reset)', '_control_timer'),
+        ('DELETE', r'/timers/([^/]+)', '_delete_timer'),
+        ('GET', r'/actions', '_action_stats'),
+        ('GET', r'/metrics', '_metrics'),
+    ]
+
+    def __init__(self, engine: AlarmEngine, timers: Optional[TimerRegistry] = None,
+                 host: str = "127.0.0.1", port: Optional[int] = DEFAULT_PORT, socket_path: Optional[str] = None,
+                 token_file: Optional[str] = None, allowed_actions=API_ACTIONS):
+        self.engine = engine
+        self.timers = timers
+        self.host = host
+        self.port = port  # None: no TCP listener; 0: any free port (the chosen one is stored here)
+        self.socket_path = socket_path
+        self.token_file = token_file or DEFAULT_TOKEN_FILE
+        self.token: Optional[str] = None  # read from token_file by start()
+        self.allowed_actions = tuple(allowed_actions)
+        self._routes = [(method, re.compile(pattern + r'/?$'), name) for method, pattern, name in self.ROUTES]
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="alarm-api")
+        self._subscribers: List[asyncio.Queue] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self._error: Optional[Exception] = None
+
+    def start(self):
+        """Start listening in a background thread; raises OSError if the address is taken"""
+        self.token = load_token(self.token_file)
+        self._thread = threading.Thread(target=self._run, name="alarm-api", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._error is not None:
+            raise self._error
+        self.engine.listeners.append(self._on_fire)
+        self.engine.missed_listeners.append(self._on_missed)
+        self.engine.change_listeners.append(self._on_change)
+        if self.timers is not None:
+            self.timers.listeners.append(self._on_timer)
+
+    def stop(self):
+        for listeners, listener in ((self.engine.listeners, self._on_fire),
+                                    (self.engine.missed_listeners, self._on_missed),
+                                    (self.engine.change_listeners, self._on_change),
+                                    (self.timers.listeners if self.timers is not None else [], self._on_timer)):
+            if listener in listeners:
+                listeners.remove(listener)
+        if self._loop is not None and self._stopping is not None:
+            self._loop.call_soon_threadsafe(self._stopping.set)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._executor.shutdown(wait=False)
+
+    def addresses(self) -> List[str]:
+        """Where the server listens, for startup messages"""
+        addresses = []
+        if self.port is not None:
+            addresses.append(f"http://{self.host}:{self.port}")
+        if self.socket_path:
+            addresses.append(f"unix:{self.socket_path}")
+        return addresses
+
+    def publish(self, event: Dict):
+        """Send an event to every /events client; safe to call from any thread"""
+        if self._subscribers and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._broadcast, json.dumps(event))
+
+    # --- Server thread -------------------------------------------------------------------
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        try:
+            self._loop.run_until_complete(self._serve())
+        except Exception as e:
+            self._error = e
+            self._ready.set()
+        finally:
+            self._loop.close()
+
+    async def _serve(self):
+        self._stopping = asyncio.Event()
+        servers = []
+        try:
+            if self.port is not None:
+                server = await asyncio.start_server(self._handle, self.host, self.port, limit=MAX_HEADER_BYTES)
+                self.port = server.sockets[0].getsockname()[1]
+                servers.append(server)
+            if self.socket_path:
+                if os.path.exists(self.socket_path):
+                    os.remove(self.socket_path)  # left over from a previous run
+                server = await asyncio.start_unix_server(self._handle, self.socket_path, limit=MAX_HEADER_BYTES)
+                os.chmod(self.socket_path, 0o600)
+                servers.append(server)
+        except Exception:
+            for server in servers:
+                server.close()
+            raise
+        self._ready.set()
+        await self._stopping.wait()
+        for server in servers:
+            server.close()
+        # Drop open connections (idle keep-alive clients, event streams) before waiting
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for server in servers:
+            await server.wait_closed()
+        if self.socket_path and os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                if method == 'GET' and path == '/events':
+                    await self._stream_events(writer)
+                    break
+                status, payload = await self._dispatch(method, path, body)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                self._write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ApiError as e:
+            # The request itself could not be read; answer and drop the connection
+            self._write_response(writer, e.status, {'error': str(e)}, False)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            pass  # server shutting down
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError:
+            return None  # client closed the connection between requests
+        except asyncio.LimitOverrunError:
+            raise ApiError(413, "request headers too large")
+        lines = head.decode('latin-1').split("\r\n")
+        try:
+            method, target, _ = lines[0].split(" ", 2)
+        except ValueError:
+            raise ApiError(400, "malformed request line")
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        if 'transfer-encoding' in headers:
+            raise ApiError(400, "chunked request bodies are not supported; send Content-Length")
+        try:
+            length = int(headers.get('content-length') or 0)
+        except ValueError:
+            raise ApiError(400, "invalid Content-Length")
+        if length < 0:
+            raise ApiError(400, "invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise ApiError(413, "request body too large")
+        # Checked before the body is read, so unauthorized clients cannot make us buffer it
+        self._check_access(headers, length)
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), unquote(target.split("?", 1)[0]), headers, body
+
+    def _check_access(self, headers: Dict[str, str], length: int):
+        """Raise ApiError unless the request is local, same-origin, authorized and JSON"""
+        if _hostname(headers.get('host', '')) not in LOCAL_NAMES:
+            raise ApiError(403, "requests must be addressed to localhost")
+        origin = headers.get('origin')
+        if origin is not None and _hostname(origin) not in LOCAL_NAMES:
+            raise ApiError(403, "cross-origin requests are not allowed")
+        scheme, _, token = headers.get('authorization', '').partition(' ')
+        if scheme.lower() != 'bearer' or not hmac.compare_digest(token.strip().encode('utf-8'),
+                                                                 self.token.encode('utf-8')):
+            raise ApiError(401, f"missing or wrong API token (send 'Authorization: Bearer <token>' "
+                                f"with the token from {self.token_file})")
+        if length and headers.get('content-type', '').split(';')[0].strip().lower() != 'application/json':
+            raise ApiError(415, "request bodies must be sent as application/json")
+
+    @staticmethod
+    def _write_response(writer: asyncio.StreamWriter, status: int, payload, keep_alive: bool):
+        # Text payloads (the Prometheus exposition) are sent as they are, everything else as JSON
+        if isinstance(payload, str):
+            body, content_type = payload.encode('utf-8'), "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            body, content_type = json.dumps(payload).encode('utf-8'), "application/json"
+        writer.write(f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                     f"Content-Type: {content_type}\r\n"
+                     f"Content-Length: {len(body)}\r\n"
+                     f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + body)
+
+    async def _dispatch(self, method: str, path: str, body: bytes) -> Tuple[int, object]:
+        try:
+            allowed = False
+            for route_method, pattern, name in self._routes:
+                match = pattern.match(path)
+                if match is None:
+                    continue
+                if route_method != method:
+                    allowed = True
+                    continue
+                data = None
+                if body:
+                    try:
+                        data = json.loads(body)
+                    except ValueError:
+                        raise ApiError(400, "body is not valid JSON")
+                handler = getattr(self, name)
+                # Engine calls may touch the disk: run them on the worker thread, in arrival order
+                return await self._loop.run_in_executor(self._executor, handler, data, *match.groups())
+            if allowed:
+                raise ApiError(405, f"{method} not allowed on {path}")
+            raise ApiError(404, f"no such endpoint: {path}")
+        except ApiError as e:
+            return e.status, dict({'error': str(e)}, **e.details)
+        except Exception as e:
+            print(f"Control API request failed: {str(e)}")
+            return 500, {'error': str(e)}
+
+    async def _stream_events(self, writer: asyncio.StreamWriter):
+        events: asyncio.Queue = asyncio.Queue(maxsize=EVENT_QUEUE_SIZE)
+        self._subscribers.append(events)
+        try:
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                         b"Cache-Control: no-cache\r\nConnection: close\r\n\r\n")
+            await writer.drain()
+            while not self._stopping.is_set():
+                try:
+                    event = await asyncio.wait_for(events.get(), timeout=KEEPALIVE_SECONDS)
+                    writer.write(f"data: {event}\n\n".encode('utf-8'))
+                except asyncio.TimeoutError:
+                    writer.write(b": keep-alive\n\n")  # also notices clients that went away
+                await writer.drain()
+        finally:
+            self._subscribers.remove(events)
+
+    def _broadcast(self, event: str):
+        for events in self._subscribers:
+            if not events.full():
+                events.put_nowait(event)
+
+    # --- Engine events (called on engine threads) -----------------------------------------
+
+    def _on_fire(self, firing: AlarmFiring):
+        self.publish({'type': 'fired', 'instance': firing.id, 'snoozes': firing.snoozes, 'due': firing.due,
+                      'alarm': firing.alarm.to_dict()})
+
+    def _on_missed(self, alarm: AlarmRecord, when: float):
+        self.publish({'type': 'missed', 'due': when, 'alarm': alarm.to_dict()})
+
+    def _on_change(self, kind: str, alarms: List[AlarmRecord]):
+        self.publish({'type': 'changed', 'op': kind, 'ids': [alarm.id for alarm in alarms]})
+
+    def _on_timer(self, timer: CountdownTimer):
+        self.publish({'type': 'timer', 'timer': self._timer_dict(timer)})
+
+    # --- Handlers (run on the worker thread; return (status, payload)) -------------------
+
+    def _list_alarms(self, data):
+        with self.engine.lock:
+            return 200, [alarm.to_dict() for alarm in self.engine.alarms]
+
+    def _get_alarm(self, data, alarm_id):
+        return 200, self._alarm(alarm_id).to_dict()
+
+    def _create_alarm(self, data):
+        alarm = self._validate(data)
+        self._check_actions(data)
+        alarm.id = 0  # the engine assigns ids
+        return 201, self.engine.add_alarm(alarm).to_dict()
+
+    def _update_alarm(self, data, alarm_id):
+        alarm = self._alarm(alarm_id)
+        fields = self._changes(alarm, data)
+        updated = self.engine.update_alarm(alarm.id, **fields)
+        if updated is None:
+            raise ApiError(404, f"no alarm with id {alarm_id}")  # deleted meanwhile
+        return 200, updated.to_dict()
+
+    def _delete_alarm(self, data, alarm_id):
+        alarm = self.engine.delete_alarm(int(alarm_id))
+        if alarm is None:
+            raise ApiError(404, f"no alarm with id {alarm_id}")
+        return 200, alarm.to_dict()
+
+    def _toggle_alarm(self, data, alarm_id):
+        alarm = self.engine.toggle_alarm(int(alarm_id))
+        if alarm is None:
+            raise ApiError(404, f"no alarm with id {alarm_id}")
+        return 200, alarm.to_dict()
+
+    def _bulk(self, data):
+        if not isinstance(data, dict):
+            raise ApiError(400, "expected an object with 'add', 'update' and/or 'delete'")
+        errors = []
+        added = []
+        for number, entry in enumerate(data.get('add') or []):
+            try:
+                alarm = self._validate(entry)
+                self._check_actions(entry)
+                alarm.id = 0
+                added.append(alarm)
+            except ApiError as e:
+                errors.append(f"add[{number}]: {str(e)}")
+
+        changes, missing = {}, []
+        with self.engine.lock:
+            for number, entry in enumerate(data.get('update') or []):
+                try:
+                    if not isinstance(entry, dict) or 'id' not in entry:
+                        raise ValueError("missing field 'id'")
+                    alarm = self.engine.get_alarm(int(entry['id']))
+                    if alarm is None:
+                        missing.append(entry['id'])
+                        continue
+                    changes[alarm.id] = self._changes(alarm, entry)
+                except (ValueError, TypeError, ApiError) as e:
+                    errors.append(f"update[{number}]: {str(e)}")
+            try:
+                deleted_ids = [int(alarm_id) for alarm_id in data.get('delete') or []]
+            except (ValueError, TypeError):
+                errors.append("delete: expected a list of alarm ids")
+                deleted_ids = []
+            if errors:
+                raise ApiError(400, "invalid bulk request; nothing was changed", errors=errors)
+
+            missing += [alarm_id for alarm_id in deleted_ids if self.engine.get_alarm(alarm_id) is None]
+            added = self.engine.add_many(added) if added else []
+            updated = self.engine.update_many(changes) if changes else []
+            deleted = self.engine.delete_many(deleted_ids) if deleted_ids else []
+        return 200, {'added': [alarm.id for alarm in added], 'updated': [alarm.id for alarm in updated],
+                     'deleted': [alarm.id for alarm in deleted], 'missing': missing}
+
+    def _list_timers(self, data):
+        return 200, [self._timer_dict(timer) for timer in list(self._timer_registry().timers.values())]
+
+    def _control_timer(self, data, name, action):
+        timers = self._timer_registry()
+        if action == 'start':
+            try:
+                seconds = float((data or {})['seconds'])
+            except (KeyError, TypeError, ValueError):
+                raise ApiError(400, "expected {\"seconds\": <number>}")
+            if seconds <= 0:
+                raise ApiError(400, "seconds must be positive")
+            return 200, self._timer_dict(timers.start(name, seconds))
+        timer = timers.get(name)
+        if timer is None:
+            raise ApiError(404, f"no timer named {name!r}")
+        getattr(timer, action)()
+        return 200, self._timer_dict(timer)
+
+    def _delete_timer(self, data, name):
+        timers = self._timer_registry()
+        timer = timers.get(name)
+        if timer is None:
+            raise ApiError(404, f"no timer named {name!r}")
+        timers.remove(name)
+        return 200, self._timer_dict(timer)
+
+    def _action_stats(self, data):
+        return 200, self.engine.actions.stats()
+
+    def _metrics(self, data):
+        if not metrics.enabled:
+            raise ApiError(404, "metrics are disabled (start with --metrics)")
+        return 200, metrics.prometheus()
+
+    # --- Helpers -------------------------------------------------------------------------
+
+    def _alarm(self, alarm_id) -> AlarmRecord:
+        alarm = self.engine.get_alarm(int(alarm_id))
+        if alarm is None:
+            raise ApiError(404, f"no alarm with id {alarm_id}")
+        return alarm
+
+    def _validate(self, data) -> AlarmRecord:
+        self._check_fields(data)
+        try:
+            return alarm_io.validate(data)
+        except ValueError as e:
+            raise ApiError(400, str(e))
+
+    @staticmethod
+    def _check_fields(data):
+        if not isinstance(data, dict):
+            raise ApiError(400, "expected an object")
+        unknown = sorted(str(key) for key in data if key not in REQUEST_FIELDS)
+        if unknown:
+            raise ApiError(400, f"unknown field(s): {', '.join(unknown)}", unknown=unknown)
+
+    def _check_actions(self, data):
+        # Only the actions a request sets itself; ones the alarm already had came from a trusted source
+        try:
+            actions = validate_actions(data.get('actions')) or []
+        except ValueError as e:
+            raise ApiError(400, str(e))
+        refused = sorted({action['type'] for action in actions} - set(self.allowed_actions))
+        if refused:
+            raise ApiError(403, f"{', '.join(refused)} actions cannot be set over the API "
+                                f"(start with --api-allow-actions {','.join(refused)} to allow them)")
+
+    def _changes(self, alarm: AlarmRecord, data) -> Dict:
+        """The validated fields to set when `data` is applied on top of `alarm`"""
+        self._check_fields(data)
+        self._check_actions(data)
+        if 'rule' in data and data['rule'] and 'hour' not in data:
+            data = dict(data, hour=0, minute=0)  # the time comes from the new rule
+        entry = dict(alarm.to_dict(), **data)
+        entry['id'] = alarm.id
+        merged = self._validate(entry)
+        return {name: getattr(merged, name) for name in ALARM_FIELDS}
+
+    def _timer_registry(self) -> TimerRegistry:
+        if self.timers is None:
+            raise ApiError(404, "timers are not available in this process")
+        return self.timers
+
+    @staticmethod
+    def _timer_dict(timer: CountdownTimer) -> Dict:
+        return {'name': timer.name, 'state': timer.state, 'duration': timer.duration,
+                'remaining': round(timer.remaining(), 3)}
+
+
+def _hostname(address: str) -> Optional[str]:
+    # "localhost:8765", "[::1]:8765" or "http://127.0.0.1:8765" -> the bare host name
+    try:
+        return urlsplit(address if "//" in address else f"//{address}").hostname
+    except ValueError:
+        return None
@@ -0,0 +1,427 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""Benchmark suite: scheduler, stores, alarm list UI and countdown drift.
+
+    python alarm_bench.py --output baseline.json            # record a baseline
+    python alarm_bench.py --baseline baseline.json          # compare; exit status 1 on a regression
+
+Every result is a duration in seconds (lower is better), keyed like
+"store.sqlite.save[n=10000]", and is the fastest of --repeat runs. Results are written as
+JSON with --output. With --baseline each result is compared to the stored one and counts
+as a regression when it is more than --tolerance slower (and by more than --min-delta
+seconds, so microsecond jitter is ignored). Baselines are only comparable on the same machine,
+so none is shipped: record one with --output before changing anything, then compare against
+it. A missing or unreadable baseline file stops the run before any benchmark starts.
+
+Groups (--only):
+
+    scheduler   reschedule_all: next occurrence of every alarm plus heap rebuild (what a full
+                scan used to cost); add_x1000: 1000 single adds into a heap of n alarms;
+                fire_burst: up to 1000 alarms due at once, until all were handed to on_fire
+    store       save / load of n alarms, and update_x10 (ten single-alarm changes), for the
+                json, journal and sqlite stores
+    ui          time to first paint, opening the alarm list, refreshing and scrolling it, and
+                building one alarm card; needs a display, or Xvfb to start a virtual one
+    drift       how late --timers countdowns finish, spread over --drift-seconds (use 3600
+                or more for a long run)
+"""
+
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from alarm_engine import AlarmRecord, AlarmScheduler, JournalAlarmStore, JsonAlarmStore, TimerRegistry
+from alarm_recurrence import parse_rule
+from alarm_time import get_zone
+
+DEFAULT_SIZES = (10, 100, 1000, 10000, 100000)
+GROUPS = ('scheduler', 'store', 'ui', 'drift')
+
+# Zones given to every tenth generated alarm (skipped when the zone database is missing)
+ZONES = ('Africa/Accra', 'Europe/London', 'America/New_York', 'Asia/Tokyo')
+
+BURST = 1000  # alarms due at once in fire_burst
+UPDATES = 10  # single-alarm changes in update_x10
+
+# Sizes above this run once per measurement instead of --repeat times
+LARGE = 10000
+
+
+class Skipped(Exception):
+    """A benchmark group cannot run here; the message says why"""
+
+
+def make_alarms(count: int, seed: int = 1, first_id: int = 1) -> List[AlarmRecord]:
+    """A reproducible mix of weekday alarms, zoned alarms and recurrence rules"""
+    rng = random.Random(seed)
+    try:
+        zones = [name for name in ZONES if get_zone(name)]
+    except ValueError:
+        zones = []
+    rules = [parse_rule(f"DTSTART:20260101T{hour:02d}{minute:02d}00\nRRULE:FREQ=DAILY;INTERVAL=2")
+             for hour, minute in ((6, 30), (7, 0), (21, 45))]
+    alarms = []
+    for i in range(count):
+        alarm_id = first_id + i
+        rule = rules[i % len(rules)] if i % 20 == 19 else None
+        timezone = zones[i % len(zones)] if zones and i % 10 == 9 else None
+        alarms.append(AlarmRecord(alarm_id, rng.randrange(24), rng.randrange(60), f"Alarm {alarm_id}",
+                                  rng.randint(1, 127), active=rng.random() < 0.9, rule=rule, timezone=timezone))
+    return alarms
+
+
+def measure(run: Callable[[object], None], setup: Optional[Callable[[], object]] = None, repeat: int = 5) -> float:
+    """Fastest of `repeat` timed calls of run(setup()); setup itself is not timed"""
+    best = float('inf')
+    for _ in range(max(1, repeat)):
+        state = setup() if setup is not None else None
+        started = time.perf_counter()
+        run(state)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def repeats(count: int, repeat: int) -> int:
+    return repeat if count <= LARGE else 1
+
+
+# --- Scheduler ---------------------------------------------------------------------------
+
+def bench_scheduler(sizes: List[int], repeat: int, record: Callable[[str, float], None]):
+    for count in sizes:
+        alarms = make_alarms(count)
+        times = repeats(count, repeat)
+
+        def fresh():
+            for alarm in alarms:
+                alarm.next_cache = None  # make every repeat compute occurrences from scratch
+            return AlarmScheduler(on_fire=lambda firing: None)
+
+        record(f"scheduler.reschedule_all[n={count}]",
+               measure(lambda scheduler: scheduler.reschedule_all(alarms), fresh, times))
+
+        def filled():
+            scheduler = AlarmScheduler(on_fire=lambda firing: None)
+            scheduler.reschedule_all(alarms)
+            return scheduler, make_alarms(1000, seed=2, first_id=count + 1)
+
+        def add_each(state):
+            scheduler, added = state
+            for alarm in added:
+                scheduler.schedule(alarm)
+
+        record(f"scheduler.add_x1000[n={count}]", measure(add_each, filled, times))
+        record(f"scheduler.fire_burst[n={count}]",
+               measure(_fire_burst, lambda: _due_scheduler(alarms), times))
+
+
+def _due_scheduler(alarms: List[AlarmRecord]):
+    # A scheduler holding every alarm, with the first BURST active ones due a second ago
+    due = [alarm for alarm in alarms if alarm.active][:BURST]
+    fired = []
+    done = threading.Event()
+
+    def on_fire(firing):
+        fired.append(firing)
+        if len(fired) == len(due):
+            done.set()
+
+    scheduler = AlarmScheduler(on_fire=on_fire)
+    scheduler.reschedule_all(alarms)
+    now = time.time()
+    with scheduler._condition:
+        for alarm in due:
+            scheduler._cancel(alarm)
+            scheduler._push(alarm, now - 1)
+    return scheduler, done
+
+
+def _fire_burst(state):
+    scheduler, done = state
+    scheduler.start()
+    done.wait(timeout=60)
+    scheduler.stop()
+
+
+# --- Stores ------------------------------------------------------------------------------
+
+def open_bench_store(kind: str, directory: str):
+    if kind == 'sqlite':
+        from alarm_db import SqliteAlarmStore
+        return SqliteAlarmStore(os.path.join(directory, "alarms.db"))
+    store_class = JournalAlarmStore if kind == 'journal' else JsonAlarmStore
+    return store_class(os.path.join(directory, "alarms.json"))
+
+
+def bench_store(sizes: List[int], repeat: int, record: Callable[[str, float], None]):
+    for kind in ('json', 'journal', 'sqlite'):
+        for count in sizes:
+            alarms = make_alarms(count)
+            times = repeats(count, repeat)
+            with tempfile.TemporaryDirectory() as directory:
+                store = open_bench_store(kind, directory)
+                record(f"store.{kind}.save[n={count}]", measure(lambda _: store.save(alarms), repeat=times))
+                record(f"store.{kind}.load[n={count}]", measure(lambda _: store.load(), repeat=times))
+
+                def update_each(_):
+                    for alarm in alarms[:UPDATES]:
+                        alarm.update(active=not alarm.active)
+                        store.record_update(alarms, alarm)
+
+                record(f"store.{kind}.update_x{UPDATES}[n={count}]", measure(update_each, repeat=times))
+                store.close()
+
+
+# --- UI ----------------------------------------------------------------------------------
+
+@contextlib.contextmanager
+def virtual_display():
+    """Use $DISPLAY when set, otherwise run Xvfb for the duration of the block"""
+    if os.environ.get('DISPLAY'):
+        yield
+        return
+    if shutil.which('Xvfb') is None:
+        raise Skipped("no display and Xvfb is not installed")
+    display = f":{os.getpid() % 1000 + 100}"
+    server = subprocess.Popen(['Xvfb', display, '-screen', '0', '1280x1024x24', '-nolisten', 'tcp'],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    os.environ['DISPLAY'] = display
+    try:
+        deadline = time.monotonic() + 10
+        while not os.path.exists(f"/tmp/.X11-unix/X{display[1:]}"):
+            if server.poll() is not None or time.monotonic() > deadline:
+                raise Skipped("Xvfb did not start")
+            time.sleep(0.05)
+        yield
+    finally:
+        del os.environ['DISPLAY']
+        server.terminate()
+        server.wait()
+
+
+def bench_ui(sizes: List[int], repeat: int, record: Callable[[str, float], None]):
+    try:
+        import tkinter as tk
+    except ImportError:
+        raise Skipped("tkinter is not available")
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')  # the app initializes pygame for its sounds
+
+    with virtual_display():
+        from GHANA_STYLE_ALARM import GhanaStyleAlarmClock
+
+        cwd = os.getcwd()
+        for count in sizes:
+            with tempfile.TemporaryDirectory() as directory:
+                os.chdir(directory)  # the app creates assets/ next to where it runs
+                try:
+                    path = os.path.join(directory, "alarms.json")
+                    JournalAlarmStore(path).save(make_alarms(count))
+                    root = tk.Tk()
+                    app = None
+                    try:
+                        app = GhanaStyleAlarmClock(root, alarm_file=path)
+                        root.update()
+                        record(f"ui.first_paint[n={count}]", app.startup.total())
+
+                        started = time.perf_counter()
+                        app.switch_view("active")
+                        root.update()
+                        record(f"ui.open_alarm_list[n={count}]", time.perf_counter() - started)
+
+                        def refresh(_):
+                            app.refresh_alarm_list()
+                            root.update_idletasks()
+
+                        record(f"ui.refresh_alarm_list[n={count}]", measure(refresh, repeat=repeat))
+
+                        positions = iter([0.5, 0.0] * repeat)
+
+                        def scroll(_):
+                            app.alarm_canvas.yview_moveto(next(positions))
+                            app.update_visible_cards()
+                            root.update_idletasks()
+
+                        record(f"ui.scroll_alarm_list[n={count}]", measure(scroll, repeat=repeat))
+
+                        if count == sizes[0]:
+                            alarm = app.engine.alarms[0]
+
+                            def build_card(_):
+                                card = app.create_alarm_card(app.alarm_canvas, alarm, 0)
+                                root.update_idletasks()
+                                card.frame.destroy()
+
+                            record("ui.create_alarm_card", measure(build_card, repeat=repeat))
+                    finally:
+                        if app is not None:
+                            app.on_closing()
+                        else:
+                            root.destroy()
+                finally:
+                    os.chdir(cwd)
+
+
+# --- Countdown drift ---------------------------------------------------------------------
+
+def bench_drift(seconds: float, timer_count: int, record: Callable[[str, float], None]):
+    """Start timers ending evenly over `seconds` and record how late each one finishes"""
+    lateness: List[float] = []
+    expected: Dict[str, float] = {}
+    done = threading.Event()
+
+    def on_finish(timer):
+        lateness.append(time.monotonic() - expected[timer.name])
+        if len(lateness) == timer_count:
+            done.set()
+
+    registry = TimerRegistry(on_finish=on_finish)
+    for i in range(timer_count):
+        duration = seconds * (i + 1) / timer_count
+        expected[f"t{i}"] = time.monotonic() + duration
+        registry.start(f"t{i}", duration)
+    done.wait(timeout=seconds + 30)
+    registry.close()
+    if len(lateness) < timer_count:
+        print(f"Only {len(lateness)} of {timer_count} timers finished", flush=True)
+        return
+
+    lateness.sort()
+    record("drift.finish_lateness_mean", sum(lateness) / len(lateness))
+    record("drift.finish_lateness_p95", lateness[min(len(lateness) - 1, int(len(lateness) * 0.95))])
+    record("drift.finish_lateness_max", lateness[-1])
+
+
+# --- Baseline comparison -----------------------------------------------------------------
+
+def compare(results: Dict[str, float], baseline: Dict[str, float],
+            tolerance: float, min_delta: float) -> List[str]:
+    """Print each result against the baseline; returns the names that regressed"""
+    regressions = []
+    print(f"\n{'benchmark':<44} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, value in results.items():
+        old = baseline.get(name)
+        if old is None:
+            print(f"{name:<44} {'-':>12} {format_seconds(value):>12}     new")
+            continue
+        change = (value - old) / old if old > 0 else 0.0
+        regressed = value > old * (1 + tolerance) and value - old > min_delta
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<44} {format_seconds(old):>12} {format_seconds(value):>12} {change:+8.0%}"
+              f"{'  REGRESSION' if regressed else ''}")
+    for name in baseline:
+        if name not in results:
+            print(f"{name:<44} {format_seconds(baseline[name]):>12} {'-':>12}  not run")
+    return regressions
+
+
+def load_baseline(path: str) -> Dict[str, float]:
+    """The results stored in a file written with --output; raises ValueError saying what is wrong"""
+    hint = f"record one on this machine first with: python alarm_bench.py --output {path}"
+    try:
+        with open(path, 'r') as f:
+            report = json.load(f)
+    except FileNotFoundError:
+        raise ValueError(f"no baseline file {path}; {hint}")
+    except (OSError, ValueError) as e:
+        raise ValueError(f"could not read baseline {path}: {str(e)}; {hint}")
+    results = report.get('results') if isinstance(report, dict) else None
+    if not isinstance(results, dict) or not all(isinstance(value, (int, float)) for value in results.values()):
+        raise ValueError(f"{path} is not a benchmark report (no 'results'); {hint}")
+    return results
+
+
+def format_seconds(value: float) -> str:
+    if value < 0.001:
+        return f"{value * 1e6:.1f} µs"
+    if value < 1:
+        return f"{value * 1000:.2f} ms"
+    return f"{value:.3f} s"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the alarm clock and compare against a baseline")
+    parser.add_argument("--only", default=",".join(GROUPS), help="comma-separated groups (default: %(default)s)")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="alarm counts to run at (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measurement, fastest counts (default: %(default)s)")
+    parser.add_argument("--drift-seconds", type=float, default=5.0,
+                        help="how long the countdown drift run lasts (default: %(default)s)")
+    parser.add_argument("--timers", type=int, default=50, help="countdowns in the drift run (default: %(default)s)")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against results written earlier with --output")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="fraction slower than the baseline that counts as a regression (default: %(default)s)")
+    parser.add_argument("--min-delta", type=float, default=0.0001,
+                        help="ignore slowdowns smaller than this many seconds (default: %(default)s)")
+    args = parser.parse_args()
+
+    groups = [group.strip() for group in args.only.split(",") if group.strip()]
+    unknown = set(groups) - set(GROUPS)
+    if unknown:
+        parser.error(f"unknown group(s): {', '.join(sorted(unknown))} (use {', '.join(GROUPS)})")
+    sizes = sorted(int(size) for size in args.sizes.split(","))
+    baseline = None
+    if args.baseline:
+        try:
+            baseline = load_baseline(args.baseline)  # before the benchmarks, which may take minutes
+        except ValueError as e:
+            parser.error(str(e))
+
+    results: Dict[str, float] = {}
+    skipped: Dict[str, str] = {}
+
+    def record(name: str, seconds: float):
+        results[name] = seconds
+        print(f"{name:<44} {format_seconds(seconds):>12}", flush=True)
+
+    runners = {
+        'scheduler': lambda: bench_scheduler(sizes, args.repeat, record),
+        'store': lambda: bench_store(sizes, args.repeat, record),
+        'ui': lambda: bench_ui(sizes, args.repeat, record),
+        'drift': lambda: bench_drift(args.drift_seconds, args.timers, record),
+    }
+    for group in groups:
+        try:
+            runners[group]()
+        except Skipped as e:
+            skipped[group] = str(e)
+            print(f"Skipped {group} benchmarks: {str(e)}", flush=True)
+
+    report = {
+        'meta': {'time': datetime.datetime.now().isoformat(timespec='seconds'), 'python': platform.python_version(),
+                 'platform': platform.platform(), 'machine': platform.machine(), 'sizes': sizes,
+                 'repeat': args.repeat, 'drift_seconds': args.drift_seconds, 'timers': args.timers},
+        'results': results,
+        'skipped': skipped,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if baseline is not None:
+        # Only the groups that were run; the rest of the baseline stays out of the comparison
+        baseline = {name: value for name, value in baseline.items() if name.split(".")[0] in groups}
+        if not baseline:
+            print(f"\n{args.baseline} has no results for {', '.join(groups)}; nothing to compare")
+            sys.exit(2)
+        regressions = compare(results, baseline, args.tolerance, args.min_delta)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print("\nNo regressions")
+
+
+if __name__ == "__main__":
+    main()
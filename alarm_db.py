@@ -0,0 +1,222 @@
+# coding: utf-8
+"""SQLite alarm store for large alarm sets.
+
+`SqliteAlarmStore` has the same load/save/record_* surface as the JSON stores in
+alarm_engine.py, so `AlarmEngine` works with either. Each alarm is one row, written
+individually (or in one transaction per `batch()`), instead of rewriting a whole file.
+The next fire time of every active alarm is kept in an indexed column, so queries such
+as "alarms due in the next minute" are index range scans (see `due_between`).
+
+The largest alarm id ever stored is kept in the meta table (`next_id`), so ids of deleted
+alarms are never handed out again. The database runs in WAL mode so readers never block the writer. When it is created next
+to an existing alarms.json, that file (plus its journal) is imported once.
+"""
+
+import contextlib
+import datetime
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Optional
+
+from alarm_engine import AlarmRecord, JournalAlarmStore, next_fire_instant
+from alarm_metrics import metrics
+from alarm_time import ZoneClock
+from alarm_recurrence import parse_rule
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS alarms (
+    id INTEGER PRIMARY KEY,
+    hour INTEGER NOT NULL,
+    minute INTEGER NOT NULL,
+    label TEXT NOT NULL,
+    days_mask INTEGER NOT NULL,
+    active INTEGER NOT NULL,
+    sound TEXT NOT NULL,
+    sound_path TEXT NOT NULL,
+    rule TEXT,  -- recurrence rule text for rule-based alarms (see alarm_recurrence.py)
+    timezone TEXT,  -- IANA zone of the alarm's wall-clock times, NULL for the system zone
+    actions TEXT,  -- JSON action list (see alarm_actions.py), NULL for the defaults
+    next_fire REAL  -- epoch seconds (UTC) of the next occurrence, NULL when inactive
+);
+CREATE INDEX IF NOT EXISTS alarms_next_fire ON alarms (next_fire);
+DROP INDEX IF EXISTS alarms_active;  -- created by earlier versions; no query used it
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+COLUMNS = "id, hour, minute, label, days_mask, active, sound, sound_path, rule, timezone, actions"
+
+
+class SqliteAlarmStore:
+    """Keeps alarms in an SQLite database, one row per alarm"""
+
+    def __init__(self, path: str = "alarms.db", migrate_from: Optional[str] = None):
+        self.path = path
+        # JSON file imported the first time the database is opened (default: same name, .json)
+        self.migrate_from = migrate_from or f"{os.path.splitext(path)[0]}.json"
+        self._lock = threading.RLock()
+        self._batch_depth = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        self.next_id = 1  # one more than the largest id ever stored; read from the meta table
+
+    def _connect(self) -> sqlite3.Connection:
+        # Opened lazily; one connection shared by every thread, serialized by self._lock
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")  # WAL stays consistent; only the last commits may roll back
+            conn.executescript(SCHEMA)
+            # Columns added after the first release of this store
+            existing = [row[1] for row in conn.execute("PRAGMA table_info(alarms)")]
+            for column in ('rule', 'timezone', 'actions'):
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE alarms ADD COLUMN {column} TEXT")
+            self._conn = conn
+            self._migrate()
+            stored = conn.execute("SELECT value FROM meta WHERE key = 'next_id'").fetchone()
+            largest = conn.execute("SELECT MAX(id) FROM alarms").fetchone()[0]
+            self.next_id = max(self.next_id, int(stored[0]) if stored else 1, (largest or 0) + 1)
+        return self._conn
+
+    def _migrate(self):
+        """Import the JSON alarm file once, the first time this database is used"""
+        conn = self._conn
+        if conn.execute("SELECT value FROM meta WHERE key = 'migrated_from'").fetchone() is not None:
+            return
+        alarms = []
+        if os.path.exists(self.migrate_from):
+            source = JournalAlarmStore(self.migrate_from)
+            alarms = source.load()
+            self.next_id = max(self.next_id, source.next_id)  # ids retired there stay retired here
+            print(f"Importing {len(alarms)} alarm(s) from {self.migrate_from} into {self.path}")
+        with self.batch():
+            self._insert(alarms)
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('next_id', ?)", (str(self.next_id),))
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated_from', ?)",
+                         (self.migrate_from,))
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Group every write made inside the `with` block into a single transaction"""
+        with self._lock:
+            conn = self._connect()
+            if self._batch_depth == 0:
+                conn.execute("BEGIN IMMEDIATE")
+            self._batch_depth += 1
+            try:
+                yield conn
+            except BaseException:
+                self._batch_depth -= 1
+                if self._batch_depth == 0:
+                    conn.execute("ROLLBACK")
+                raise
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                conn.execute("COMMIT")
+
+    def load(self) -> List[AlarmRecord]:
+        try:
+            with self._lock:
+                rows = self._connect().execute(f"SELECT {COLUMNS} FROM alarms ORDER BY id").fetchall()
+            return [self._record(row) for row in rows]
+        except Exception as e:
+            print(f"Could not load alarms: {str(e)}")
+            return []
+
+    def save(self, alarms: List[AlarmRecord]):
+        """Replace the stored alarms with `alarms` in one transaction"""
+        try:
+            started = time.perf_counter()
+            with self.batch() as conn:
+                conn.execute("DELETE FROM alarms")
+                self._insert(alarms)
+            metrics.observe('store_write_seconds', time.perf_counter() - started, store='sqlite')
+        except Exception as e:
+            print(f"Could not save alarms: {str(e)}")
+
+    def record_add(self, alarms: List[AlarmRecord], alarm: AlarmRecord):
+        self._write(lambda: self._insert([alarm]))
+
+    def record_add_many(self, alarms: List[AlarmRecord], added: List[AlarmRecord]):
+        self._write(lambda: self._insert(added))
+
+    def record_update(self, alarms: List[AlarmRecord], alarm: AlarmRecord):
+        self._write(lambda: self._insert([alarm]))
+
+    def record_update_many(self, alarms: List[AlarmRecord], updated: List[AlarmRecord]):
+        self._write(lambda: self._insert(updated))
+
+    def record_delete(self, alarms: List[AlarmRecord], alarm: AlarmRecord):
+        self._write(lambda: self._conn.execute("DELETE FROM alarms WHERE id = ?", (alarm.id,)))
+
+    def record_delete_many(self, alarms: List[AlarmRecord], deleted: List[AlarmRecord]):
+        self._write(lambda: self._conn.executemany("DELETE FROM alarms WHERE id = ?",
+                                                   [(alarm.id,) for alarm in deleted]))
+
+    def due_between(self, start: datetime.datetime, end: datetime.datetime) -> List[AlarmRecord]:
+        """Active alarms whose next occurrence is in [start, end), soonest first.
+
+        `start` and `end` may be naive (system time zone) or aware; rows are compared as instants.
+        Only when some stored occurrence has passed is the write lock taken, to move those rows on.
+        """
+        with self._lock:
+            conn = self._connect()
+            if conn.execute("SELECT 1 FROM alarms WHERE next_fire < ? LIMIT 1", (start.timestamp(),)).fetchone():
+                with self.batch():
+                    self._advance(start)
+            rows = conn.execute(f"SELECT {COLUMNS} FROM alarms WHERE next_fire >= ? AND next_fire < ? "
+                                f"ORDER BY next_fire", (start.timestamp(), end.timestamp())).fetchall()
+        return [self._record(row) for row in rows]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _write(self, operation):
+        try:
+            started = time.perf_counter()
+            with self.batch():
+                operation()
+            metrics.observe('store_write_seconds', time.perf_counter() - started, store='sqlite')
+        except Exception as e:
+            print(f"Could not save alarms: {str(e)}")
+
+    def _insert(self, alarms: List[AlarmRecord]):
+        clock = ZoneClock(time.time())
+        self._conn.executemany(
+            f"INSERT OR REPLACE INTO alarms ({COLUMNS}, next_fire) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(alarm.id, alarm.hour, alarm.minute, alarm.label, alarm.days_mask, int(alarm.active),
+              alarm.sound, alarm.sound_path, alarm.rule.text if alarm.rule is not None else None,
+              alarm.timezone, json.dumps(alarm.actions) if alarm.actions else None,
+              self._next_fire(alarm, clock)) for alarm in alarms])
+        next_id = max([self.next_id] + [alarm.id + 1 for alarm in alarms])
+        if next_id > self.next_id:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('next_id', ?)", (str(next_id),))
+            self.next_id = next_id
+
+    def _advance(self, start: datetime.datetime):
+        # Rows whose stored occurrence has passed move on to their next one; only those rows are read
+        rows = self._conn.execute(f"SELECT {COLUMNS} FROM alarms WHERE next_fire < ?",
+                                  (start.timestamp(),)).fetchall()
+        clock = ZoneClock(start.timestamp() - 1e-6)  # an occurrence exactly at `start` still counts
+        self._conn.executemany("UPDATE alarms SET next_fire = ? WHERE id = ?",
+                               [(self._next_fire(self._record(row), clock), row[0]) for row in rows])
+
+    @staticmethod
+    def _next_fire(alarm: AlarmRecord, clock: ZoneClock) -> Optional[float]:
+        if not alarm.active:
+            return None
+        return next_fire_instant(alarm, clock.instant, clock)
+
+    @staticmethod
+    def _record(row) -> AlarmRecord:
+        alarm_id, hour, minute, label, days_mask, active, sound, sound_path, rule, timezone, actions = row
+        return AlarmRecord(alarm_id, hour, minute, label, days_mask, bool(active), sound, sound_path,
+                           parse_rule(rule) if rule else None, timezone, json.loads(actions) if actions else None)
@@ -0,0 +1,1605 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""GUI-free alarm engine: alarm model, scheduler, persistence and sound backends.
+
+Nothing in here imports tkinter, and pygame is only imported when a sound actually has
+to be played, so the engine can run headless on a server (see `main()` below).
+"""
+
+import argparse
+import bisect
+import datetime
+import heapq
+import itertools
+import json
+import os
+import signal
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+from alarm_actions import ACTION_TYPES, ActionRunner, validate_actions
+from alarm_metrics import metrics
+from alarm_recurrence import Recurrence, parse_rule
+from alarm_time import ZoneClock, get_zone, next_instant
+
+# Weekday names in datetime.weekday() order, as stored in each alarm's 'days' list
+DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+# An alarm found overdue (after a suspend or a clock step) still rings if it is at most this
+# many seconds late; older ones are reported as missed instead
+MISSED_GRACE = 300
+
+# The scheduler wakes at least this often to notice suspends and clock steps
+MAX_WAIT = 60
+
+# Wall and monotonic clocks drifting apart by more than this (seconds) between two wakes
+# means the machine slept or the system time was changed
+CLOCK_JUMP = 2.0
+
+# Snooze defaults: minutes until a snoozed alarm rings again, and how often one ringing may be snoozed
+SNOOZE_MINUTES = 5
+MAX_SNOOZES = 3
+
+
+class AlarmRecord:
+    """One alarm, with its schedule precomputed for fast matching.
+
+    `days_mask` holds the repeat days as a 7-bit mask (bit 0 = Monday, as in
+    datetime.weekday()) and `week_minutes` the sorted minute-of-week of every occurrence,
+    so finding the next occurrence is a bisect instead of string matching on day names.
+    Alarms with a `rule` (see alarm_recurrence.py) follow that instead of the weekday list;
+    their hour, minute and days are taken from the rule. Times are wall-clock times in the
+    IANA zone `timezone`, or in the system zone when it is None (see alarm_time.py).
+    `actions` lists what happens when it rings; None means the defaults (see alarm_actions.py).
+
+    The last computed occurrence is cached in `next_cache`, so asking again for a time inside
+    the same gap (as the scheduler does after every firing) does not recompute anything.
+    Change schedule fields through `update()` so the precomputed values stay in sync.
+    See `from_dict()` / `to_dict()` for the alarms.json schema.
+    """
+
+    __slots__ = ('id', 'hour', 'minute', 'label', 'days_mask', 'active', 'sound', 'sound_path', 'rule',
+                 'timezone', 'actions', 'minute_of_day', 'week_minutes', 'next_cache')
+
+    def __init__(self, id: int, hour: int, minute: int, label: str, days_mask: int,
+                 active: bool = True, sound: str = "Default Beep", sound_path: str = "",
+                 rule: Optional[Recurrence] = None, timezone: Optional[str] = None,
+                 actions: Optional[List[Dict]] = None):
+        self.id = id
+        self.hour = hour
+        self.minute = minute
+        self.label = label
+        self.days_mask = days_mask
+        self.active = active
+        self.sound = sound
+        self.sound_path = sound_path
+        self.rule = rule
+        self.timezone = timezone or None
+        self.actions = actions or None
+        self._precompute()
+
+    def _precompute(self):
+        if self.rule is not None:
+            self.hour, self.minute, self.days_mask = self.rule.hour, self.rule.minute, self.rule.days_mask
+        self.next_cache = None  # (after, next occurrence after it); dropped on every edit
+        self.minute_of_day = self.hour * 60 + self.minute
+        self.week_minutes = tuple(day * MINUTES_PER_DAY + self.minute_of_day
+                                  for day in range(7) if self.days_mask >> day & 1)
+
+    def update(self, **fields):
+        """Change one or more fields (e.g. hour=7, days=['Monday'], rule="DTSTART:...")"""
+        if 'days' in fields:
+            fields['days_mask'] = days_to_mask(fields.pop('days'))
+        if isinstance(fields.get('rule'), str):
+            fields['rule'] = parse_rule(fields['rule']) if fields['rule'] else None
+        if 'actions' in fields:
+            fields['actions'] = validate_actions(fields['actions'])
+        for name, value in fields.items():
+            setattr(self, name, value)
+        self._precompute()
+
+    @property
+    def days(self) -> List[str]:
+        return [DAY_NAMES[day] for day in range(7) if self.days_mask >> day & 1]
+
+    def runs_on(self, weekday: int) -> bool:
+        return bool(self.days_mask >> weekday & 1)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'AlarmRecord':
+        """Build a record from an alarms.json entry"""
+        rule = parse_rule(data['rule']) if data.get('rule') else None
+        return cls(data.get('id', 0), int(data.get('hour', 0)), int(data.get('minute', 0)), data.get('label', ""),
+                   days_to_mask(data.get('days', [])), bool(data.get('active', True)),
+                   data.get('sound', "Default Beep"), data.get('sound_path') or "", rule, data.get('timezone'),
+                   data.get('actions'))
+
+    def to_dict(self) -> Dict:
+        """Convert back to the alarms.json schema ('rule', 'timezone' and 'actions' only appear when set)"""
+        data = {
+            'id': self.id,
+            'hour': self.hour,
+            'minute': self.minute,
+            'label': self.label,
+            'days': self.days,
+            'active': self.active,
+            'sound': self.sound,
+            'sound_path': self.sound_path
+        }
+        if self.rule is not None:
+            data['rule'] = self.rule.text
+        if self.timezone:
+            data['timezone'] = self.timezone
+        if self.actions:
+            data['actions'] = self.actions
+        return data
+
+    def schedule_text(self) -> str:
+        """When the alarm repeats, for display"""
+        text = self.rule.describe() if self.rule is not None else ", ".join(day[:3] for day in self.days)
+        return f"{text} ({self.timezone})" if self.timezone else text
+
+    def __repr__(self):
+        return f"AlarmRecord(id={self.id}, {self.hour:02d}:{self.minute:02d}, {self.label!r})"
+
+
+def days_to_mask(days: List[str]) -> int:
+    """Turn weekday names into a 7-bit mask (unknown names are ignored)"""
+    mask = 0
+    for day in days:
+        if day in DAY_NAMES:
+            mask |= 1 << DAY_NAMES.index(day)
+    return mask
+
+
+def next_fire_time(alarm: AlarmRecord, after: datetime.datetime) -> Optional[datetime.datetime]:
+    """Return the first time strictly after `after` at which the alarm should ring"""
+    cached = alarm.next_cache
+    if cached is not None and cached[0] <= after < cached[1]:
+        return cached[1]  # nothing happens between the cached query time and its answer
+    when = alarm.rule.next_after(after) if alarm.rule is not None else _next_weekly(alarm, after)
+    alarm.next_cache = (after, when) if when is not None else None
+    return when
+
+
+def next_fire_instant(alarm: AlarmRecord, after: float, clock: Optional[ZoneClock] = None) -> Optional[float]:
+    """Return the first instant (epoch seconds) strictly after `after` at which the alarm rings.
+
+    The alarm's wall-clock times are read in its time zone, with the DST policies of
+    alarm_time.py. Pass a ZoneClock for `after` when computing many alarms at once.
+    """
+    try:
+        if clock is not None and clock.instant == after:
+            zone, after_wall = clock.wall(alarm.timezone)
+            wall = next_fire_time(alarm, after_wall)
+            instant = clock.to_instant(alarm.timezone, wall) if wall is not None else None
+            if instant is not None:
+                return instant  # the common case: before the zone's next DST change
+        else:
+            zone, after_wall = get_zone(alarm.timezone), None
+    except ValueError as e:
+        print(f"Could not schedule alarm '{alarm.label}': {str(e)}")
+        return None
+    return next_instant(lambda wall: next_fire_time(alarm, wall), zone, after, after_wall=after_wall)
+
+
+def _next_weekly(alarm: AlarmRecord, after: datetime.datetime) -> Optional[datetime.datetime]:
+    week_minutes = alarm.week_minutes
+    if not week_minutes:
+        return None
+
+    # Occurrences fall on whole minutes, so one in the current minute is never "after"
+    now_minute = after.weekday() * MINUTES_PER_DAY + after.hour * 60 + after.minute
+    position = bisect.bisect_right(week_minutes, now_minute)
+    if position < len(week_minutes):
+        delta = week_minutes[position] - now_minute
+    else:
+        delta = week_minutes[0] + MINUTES_PER_WEEK - now_minute  # wrap into next week
+    return after.replace(second=0, microsecond=0) + datetime.timedelta(minutes=delta)
+
+
+class AlarmFiring:
+    """One ringing of an alarm, identified by an instance id.
+
+    Every occurrence that fires gets a fresh id; snoozing re-arms the same instance (same id,
+    `snoozes` + 1) as a one-shot deadline, so the recurring alarm itself is never modified.
+    `due` is the instant the instance was scheduled for.
+    """
+
+    __slots__ = ('id', 'alarm', 'due', 'snoozes')
+
+    def __init__(self, id: int, alarm: AlarmRecord, due: float, snoozes: int = 0):
+        self.id = id
+        self.alarm = alarm
+        self.due = due
+        self.snoozes = snoozes
+
+    def __repr__(self):
+        return f"AlarmFiring({self.id}, alarm={self.alarm.id}, snoozes={self.snoozes})"
+
+
+class AlarmScheduler:
+    """Keeps the next fire time of every active alarm in a heap and sleeps until the earliest one.
+
+    Instead of waking every second and scanning all alarms, the worker thread waits on a
+    condition until the nearest deadline (or until an alarm is added, toggled or removed),
+    so each firing costs O(log n).
+
+    Waits are capped at `max_wait` seconds, and every wake compares how far the wall clock
+    and the monotonic clock moved. A suspend or a forward clock step leaves deadlines in the
+    past: each overdue alarm rings once if an occurrence is at most `grace` seconds old,
+    otherwise it is passed to `on_missed` (logged by default), then moves to its next
+    occurrence. A backward clock step rebuilds the whole heap from the new time in one go.
+
+    Snoozes are one-shot entries in the same heap, keyed by instance id, so any number of
+    snoozed alarms costs nothing until one of them is due.
+    """
+
+    def __init__(self, on_fire: Callable[[AlarmFiring], None],
+                 on_missed: Optional[Callable[[AlarmRecord, float], None]] = None,
+                 grace: float = MISSED_GRACE, max_wait: float = MAX_WAIT):
+        self.on_fire = on_fire
+        self.on_missed = on_missed or self._log_missed
+        self.grace = grace
+        self.max_wait = max_wait
+        # Entries are [fire instant, sequence, alarm, snoozed instance or None]; alarm is None once cancelled
+        self._heap: List[list] = []
+        self._entries: Dict[int, list] = {}  # alarm id -> live heap entry
+        self._snoozed: Dict[int, list] = {}  # instance id -> live snooze entry
+        self._instance_ids = itertools.count(1)
+        self._sequence = itertools.count()  # tie-breaker so alarms themselves are never compared
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+
+    def schedule(self, alarm: AlarmRecord):
+        """Add an alarm or refresh its deadline after it was edited or toggled"""
+        with self._condition:
+            self._cancel(alarm)
+            if alarm.active:
+                when = next_fire_instant(alarm, time.time())
+                if when is not None:
+                    self._push(alarm, when)
+            else:
+                self._cancel_snoozes(alarm)
+            self._condition.notify()
+
+    def schedule_many(self, alarms: List[AlarmRecord]):
+        """Add or refresh many alarms under one lock, e.g. after a bulk import"""
+        with self._condition:
+            for alarm in alarms:
+                self._cancel(alarm)
+                if not alarm.active and self._snoozed:
+                    self._cancel_snoozes(alarm)
+            self._fill(alarms, time.time())
+            self._condition.notify()
+
+    def unschedule(self, alarm: AlarmRecord):
+        with self._condition:
+            self._cancel(alarm)
+            self._cancel_snoozes(alarm)
+            self._condition.notify()
+
+    def snooze(self, firing: AlarmFiring, when: float) -> AlarmFiring:
+        """Ring this instance again at instant `when`; the alarm's own schedule is untouched"""
+        with self._condition:
+            self.cancel_snooze(firing.id)
+            snoozed = AlarmFiring(firing.id, firing.alarm, when, firing.snoozes + 1)
+            entry = [when, next(self._sequence), firing.alarm, snoozed]
+            self._snoozed[snoozed.id] = entry
+            heapq.heappush(self._heap, entry)
+            self._condition.notify()
+            return snoozed
+
+    def cancel_snooze(self, instance_id: int) -> bool:
+        with self._condition:
+            entry = self._snoozed.pop(instance_id, None)
+            if entry is None:
+                return False
+            entry[2] = None
+            self._condition.notify()
+            return True
+
+    def snoozed(self) -> List[AlarmFiring]:
+        """Pending snoozes, soonest first"""
+        with self._condition:
+            return sorted((entry[3] for entry in self._snoozed.values()), key=lambda firing: firing.due)
+
+    def reschedule_all(self, alarms: List[AlarmRecord]):
+        """Rebuild the heap from scratch, e.g. after loading alarms from disk or a time zone change"""
+        with self._condition:
+            self._heap = list(self._snoozed.values())  # snoozes are instants; they stay as they are
+            self._entries = {}
+            self._fill(alarms, time.time())
+            self._condition.notify()
+
+    def next_deadline(self) -> Optional[float]:
+        with self._condition:
+            self._discard_cancelled()
+            return self._heap[0][0] if self._heap else None
+
+    def _fill(self, alarms: List[AlarmRecord], now: float):
+        # Bulk insert: one ZoneClock computes each zone's local time once, not once per alarm
+        clock = ZoneClock(now)
+        for alarm in alarms:
+            if alarm.active:
+                when = next_fire_instant(alarm, now, clock)
+                if when is not None:
+                    entry = [when, next(self._sequence), alarm, None]
+                    self._entries[alarm.id] = entry
+                    self._heap.append(entry)
+        heapq.heapify(self._heap)
+
+    def _push(self, alarm: AlarmRecord, when: float):
+        entry = [when, next(self._sequence), alarm, None]
+        self._entries[alarm.id] = entry
+        heapq.heappush(self._heap, entry)
+
+    def _cancel(self, alarm: AlarmRecord):
+        # Lazy deletion: the entry stays in the heap but is skipped when it reaches the top
+        entry = self._entries.pop(alarm.id, None)
+        if entry is not None:
+            entry[2] = None
+
+    def _cancel_snoozes(self, alarm: AlarmRecord):
+        # A deleted or switched-off alarm stops snoozing too (a scan of the snoozes only)
+        for instance_id in [key for key, entry in self._snoozed.items() if entry[2] is alarm]:
+            self._snoozed.pop(instance_id)[2] = None
+
+    def _discard_cancelled(self):
+        while self._heap and self._heap[0][2] is None:
+            heapq.heappop(self._heap)
+
+    def _check_clock(self, wall: float, mono: float):
+        """Notice a suspend or a clock step since the last wake and react to it"""
+        jump = (wall - self._last_wall) - (mono - self._last_mono)
+        self._last_wall, self._last_mono = wall, mono
+        if abs(jump) <= CLOCK_JUMP:
+            return
+        print(f"Clock jumped {jump:+.0f}s (suspend or time change), catching up on alarms", flush=True)
+        if jump < 0:
+            # Every deadline is now too far away; recompute them all from the new wall time
+            alarms = [entry[2] for entry in self._entries.values()]
+            self._heap = list(self._snoozed.values())
+            self._entries = {}
+            self._fill(alarms, wall)
+        # After a forward jump the overdue deadlines are simply at the top of the heap
+
+    def _run(self):
+        self._last_wall, self._last_mono = time.time(), time.monotonic()
+        while True:
+            with self._condition:
+                due, missed = [], []
+                while self._running and not due and not missed:
+                    now = time.time()
+                    self._check_clock(now, time.monotonic())
+                    self._discard_cancelled()
+                    if not self._heap:
+                        self._condition.wait(timeout=self.max_wait)
+                        continue
+
+                    wait = self._heap[0][0] - now
+                    if wait > 0:
+                        self._condition.wait(timeout=min(wait, self.max_wait))
+                        continue
+
+                    # Pop everything that is due; each alarm rings at most once, then moves past `now`
+                    started = time.perf_counter()
+                    while self._heap and (self._heap[0][2] is None or self._heap[0][0] <= now):
+                        when, _, alarm, snoozed = heapq.heappop(self._heap)
+                        if alarm is None:
+                            continue
+                        if snoozed is not None:
+                            # One-shot: rings (or is missed) and is gone
+                            del self._snoozed[snoozed.id]
+                            if now - when <= self.grace:
+                                due.append(snoozed)
+                            else:
+                                missed.append((alarm, when))
+                            continue
+
+                        del self._entries[alarm.id]
+                        if now - when <= self.grace:
+                            due.append(AlarmFiring(next(self._instance_ids), alarm, when))
+                        else:
+                            # Several occurrences may have passed; ring if the latest is recent enough
+                            recent = next_fire_instant(alarm, now - self.grace)
+                            if recent is not None and recent <= now:
+                                due.append(AlarmFiring(next(self._instance_ids), alarm, recent))
+                            else:
+                                missed.append((alarm, when))
+                        when = next_fire_instant(alarm, now)
+                        if when is not None:
+                            self._push(alarm, when)
+                    metrics.observe('scheduler_loop_seconds', time.perf_counter() - started)
+
+                if not self._running:
+                    return
+
+            for alarm, when in missed:
+                metrics.inc('alarms_missed_total')
+                try:
+                    self.on_missed(alarm, when)
+                except Exception as e:
+                    print(f"Could not report missed alarm: {str(e)}")
+            for firing in due:
+                metrics.inc('alarms_fired_total')
+                metrics.observe('alarm_fire_lateness_seconds', max(0.0, time.time() - firing.due))
+                try:
+                    self.on_fire(firing)
+                except Exception as e:
+                    print(f"Could not fire alarm: {str(e)}")
+
+    @staticmethod
+    def _log_missed(alarm: AlarmRecord, when: float):
+        print(f"Missed alarm {alarm.label!r} due at {datetime.datetime.fromtimestamp(when):%Y-%m-%d %H:%M}",
+              flush=True)
+
+
+class CountdownTimer:
+    """Countdown measured against a time.monotonic() deadline.
+
+    The remaining time is always derived from the deadline, so it does not drift no
+    matter how late the display is refreshed. Pausing stores the remaining duration and
+    resuming sets a new deadline. Timers have no thread of their own: the TimerRegistry
+    that created them waits for every deadline from a single thread.
+    """
+
+    IDLE = 'idle'
+    RUNNING = 'running'
+    PAUSED = 'paused'
+    FINISHED = 'finished'
+
+    def __init__(self, name: str, registry: 'TimerRegistry'):
+        self.name = name
+        self.state = self.IDLE
+        self.duration = 0.0
+        self._registry = registry
+        self._deadline = 0.0  # monotonic time at which a running timer finishes
+        self._remaining = 0.0  # seconds left while paused
+        self._version = 0  # bumped on every change so stale heap entries can be skipped
+
+    def start(self, duration: float):
+        with self._registry._condition:
+            self.duration = float(duration)
+            self._deadline = time.monotonic() + self.duration
+            self.state = self.RUNNING
+            self._registry._changed(self)
+
+    def pause(self):
+        with self._registry._condition:
+            if self.state == self.RUNNING:
+                self._remaining = max(0.0, self._deadline - time.monotonic())
+                self.state = self.PAUSED
+                self._registry._changed(self)
+
+    def resume(self):
+        with self._registry._condition:
+            if self.state == self.PAUSED:
+                self._deadline = time.monotonic() + self._remaining
+                self.state = self.RUNNING
+                self._registry._changed(self)
+
+    def reset(self):
+        with self._registry._condition:
+            self.state = self.IDLE
+            self.duration = 0.0
+            self._remaining = 0.0
+            self._registry._changed(self)
+
+    def remaining(self) -> float:
+        """Seconds left, with sub-second resolution"""
+        if self.state == self.RUNNING:
+            return max(0.0, self._deadline - time.monotonic())
+        if self.state == self.PAUSED:
+            return self._remaining
+        return 0.0
+
+    def progress(self) -> float:
+        """Fraction of the duration that has elapsed, from 0.0 to 1.0"""
+        if self.state == self.FINISHED:
+            return 1.0
+        if self.duration <= 0:
+            return 0.0
+        return min(1.0, (self.duration - self.remaining()) / self.duration)
+
+
+class TimerRegistry:
+    """Runs any number of named countdown timers from one scheduler thread.
+
+    Running timers' deadlines sit in a heap and the thread sleeps until the earliest one,
+    so adding timers costs no extra threads and no per-tick work.
+    """
+
+    def __init__(self, on_finish: Optional[Callable[[CountdownTimer], None]] = None):
+        self.on_finish = on_finish
+        # Told about every start, pause, resume, reset and finish; called with the registry lock
+        # held (except for finishes), so they must be quick and not call back into the registry
+        self.listeners: List[Callable[[CountdownTimer], None]] = []
+        self.timers: Dict[str, CountdownTimer] = {}  # in creation order
+        self._heap: List[tuple] = []  # (deadline, sequence, timer, version)
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+    def add(self, name: str) -> CountdownTimer:
+        """Return the timer with this name, creating it if needed"""
+        with self._condition:
+            timer = self.timers.get(name)
+            if timer is None:
+                timer = CountdownTimer(name, self)
+                self.timers[name] = timer
+            return timer
+
+    def start(self, name: str, duration: float) -> CountdownTimer:
+        timer = self.add(name)
+        timer.start(duration)
+        return timer
+
+    def get(self, name: str) -> Optional[CountdownTimer]:
+        return self.timers.get(name)
+
+    def remove(self, name: str):
+        with self._condition:
+            timer = self.timers.pop(name, None)
+            if timer is not None:
+                timer.reset()
+
+    def running(self) -> List[CountdownTimer]:
+        return [timer for timer in list(self.timers.values()) if timer.state == CountdownTimer.RUNNING]
+
+    def close(self):
+        """Stop the scheduler thread"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+
+    def _changed(self, timer: CountdownTimer):
+        # Called with the condition held whenever a timer's state or deadline changes
+        timer._version += 1
+        if timer.state == CountdownTimer.RUNNING:
+            heapq.heappush(self._heap, (timer._deadline, next(self._sequence), timer, timer._version))
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        self._condition.notify()
+        self._notify(timer)
+
+    def _notify(self, timer: CountdownTimer):
+        for listener in self.listeners:
+            try:
+                listener(timer)
+            except Exception as e:
+                print(f"Timer listener failed: {str(e)}")
+
+    def _run(self):
+        while True:
+            with self._condition:
+                finished = []
+                while not self._closed and not finished:
+                    # Drop entries for timers that were paused, reset or restarted since
+                    while self._heap and (self._heap[0][2].state != CountdownTimer.RUNNING
+                                          or self._heap[0][3] != self._heap[0][2]._version):
+                        heapq.heappop(self._heap)
+                    if not self._heap:
+                        self._condition.wait()
+                        continue
+
+                    now = time.monotonic()
+                    wait = self._heap[0][0] - now
+                    if wait > 0:
+                        self._condition.wait(timeout=wait)
+                        continue
+
+                    while self._heap and self._heap[0][0] <= now:
+                        _, _, timer, version = heapq.heappop(self._heap)
+                        if timer.state == CountdownTimer.RUNNING and version == timer._version:
+                            timer.state = CountdownTimer.FINISHED
+                            timer._version += 1
+                            finished.append(timer)
+                if self._closed:
+                    return
+
+            for timer in finished:
+                if self.on_finish is not None:
+                    try:
+                        self.on_finish(timer)
+                    except Exception as e:
+                        print(f"Countdown finish handler failed: {str(e)}")
+                self._notify(timer)
+
+
+class JsonAlarmStore:
+    """Loads and saves the alarm list as a JSON file, rewriting the whole file on every change.
+
+    `next_id` is one more than the largest alarm id ever stored, saved with the alarms, so an
+    id stays retired after its alarm was deleted, also across restarts.
+    """
+
+    def __init__(self, path: str = "alarms.json"):
+        self.path = path
+        self.next_id = 1
+
+    def load(self) -> List[AlarmRecord]:
+        try:#We will load the saved alarms from a JSON file
+            if os.path.exists(self.path):#check if the file exists (thus if the is a saved alarm schedule)
+                with open(self.path, 'r') as f:
+                    data = json.load(f)
+                # Saved lists are wrapped as {"next_id": ..., "alarms": [...]} (journal snapshots add "seq")
+                entries = data['alarms'] if isinstance(data, dict) else data
+                alarms = [AlarmRecord.from_dict(entry) for entry in entries]
+                self.next_id = max(self.next_id, data.get('next_id', 1) if isinstance(data, dict) else 1)
+                self._note_ids(alarms)
+                return alarms
+        except Exception as e:
+            print(f"Could not load alarms: {str(e)}")
+        return []
+
+    def save(self, alarms: List[AlarmRecord]):
+        try:
+            self._note_ids(alarms)
+            self._write_atomic(self.path, {'next_id': self.next_id, 'alarms': [alarm.to_dict() for alarm in alarms]})
+        except Exception as e:
+            print(f"Could not save alarms: {str(e)}")
+
+    def record_add(self, alarms: List[AlarmRecord], alarm: AlarmRecord):
+        """Persist `alarm`, which was just appended to `alarms`"""
+        self.save(alarms)
+
+    def record_add_many(self, alarms: List[AlarmRecord], added: List[AlarmRecord]):
+        """Persist several alarms that were just appended to `alarms`, in one write"""
+        self.save(alarms)
+
+    def record_update(self, alarms: List[AlarmRecord], alarm: AlarmRecord):
+        """Persist the change to `alarm`, which was edited in place"""
+        self.save(alarms)
+
+    def record_update_many(self, alarms: List[AlarmRecord], updated: List[AlarmRecord]):
+        """Persist changes to several alarms, in one write"""
+        self.save(alarms)
+
+    def record_delete(self, alarms: List[AlarmRecord], alarm: AlarmRecord):
+        """Persist the removal of `alarm`, which was just taken out of `alarms`"""
+        self.save(alarms)
+
+    def record_delete_many(self, alarms: List[AlarmRecord], deleted: List[AlarmRecord]):
+        """Persist the removal of several alarms, in one write"""
+        self.save(alarms)
+
+    def close(self):
+        pass
+
+    def _note_ids(self, alarms):
+        # Raise the high-water mark past these alarms' ids (it never goes down)
+        self.next_id = max([self.next_id] + [alarm.id + 1 for alarm in alarms if isinstance(alarm.id, int)])
+
+    @staticmethod
+    def _write_atomic(path: str, data):
+        started = time.perf_counter()
+        JsonAlarmStore._replace(path, JsonAlarmStore._dumps(data).encode('utf-8'))
+        metrics.observe('store_write_seconds', time.perf_counter() - started, store='json')
+
+    @staticmethod
+    def _replace(path: str, content: bytes):
+        # Write a temporary file and rename it over the target, so a crash never leaves half a file;
+        # the name is unique, so concurrent writers never share one
+        fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp",
+                                        dir=os.path.dirname(os.path.abspath(path)))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @staticmethod
+    def _dumps(data) -> str:
+        # One alarm per line: still readable, but each line goes through the fast C encoder
+        # (json.dump with indent= encodes in pure Python, which is slow for big alarm lists)
+        if isinstance(data, dict):
+            fields = [f"{json.dumps(key)}: {JsonAlarmStore._dumps(value) if key == 'alarms' else json.dumps(value)}"
+                      for key, value in data.items()]
+            return "{\n" + ",\n".join(fields) + "\n}"
+        if not data:
+            return "[]"
+        return "[\n" + ",\n".join(json.dumps(item) for item in data) + "\n]"
+
+
+class JournalAlarmStore(JsonAlarmStore):
+    """Append-only alarm store: a JSON snapshot plus a log of small mutation records.
+
+    Each create/toggle/delete appends one JSON line (naming the alarm by its id) to `<path>.log` instead of rewriting
+    the whole alarm list. Once the log grows past `compact_every` records it is folded
+    into a new snapshot in a background thread (written to a temporary file and renamed
+    into place). Every record carries a sequence number and the snapshot stores the last
+    one it includes, so replaying snapshot + log after a crash never applies a record twice.
+
+    The compactor keeps its own image of the stored alarms (dicts by id) and brings it up to
+    date from the records appended since the last snapshot, so the thread making changes
+    only ever pays for its own record. Compactions and full saves never overlap.
+    """
+
+    def __init__(self, path: str = "alarms.json", compact_every: int = 500):
+        super().__init__(path)
+        self.log_path = f"{path}.log"
+        self.compact_every = compact_every
+        self._seq: Optional[int] = None  # sequence number of the last record written; read lazily
+        self._log_records = 0  # records in the log file since the last compaction
+        self._log = None
+        self._lock = threading.Lock()  # log file and counters
+        self._compact_lock = threading.Lock()  # held while writing a snapshot; taken before _lock
+        self._compacting = False
+        self._image: 'OrderedDict[int, Dict]' = OrderedDict()  # stored alarms as of the last compaction
+        self._pending: List[Dict] = []  # records appended since then, not yet in _image
+
+    def load(self) -> List[AlarmRecord]:
+        alarms, image, seq, log_records, repaired, next_id = self._read()
+        with self._compact_lock, self._lock:
+            self.next_id = max(self.next_id, next_id)
+            self._seq = seq
+            self._log_records = log_records
+            self._image = image
+            self._pending = []
+        if repaired:
+            self.save(alarms)  # later records name alarms by these new ids
+        return alarms
+
+    def save(self, alarms: List[AlarmRecord]):
+        """Write a full snapshot and empty the log"""
+        self._ensure_seq()
+        snapshot = self._copy(alarms)
+        try:
+            with self._compact_lock:
+                with self._lock:
+                    # Claim a sequence number past every logged record, so none is replayed on top
+                    self._seq += 1
+                    seq = self._seq
+                    offset = self._log_size()
+                    self._pending = []
+                    self._image = OrderedDict((entry['id'], entry) for entry in snapshot)
+                    self._note_ids(alarms)
+                    next_id = self.next_id
+                self._write_atomic(self.path, {'seq': seq, 'next_id': next_id, 'alarms': snapshot})
+                with self._lock:
+                    self._truncate_log(offset)
+        except Exception as e:
+            print(f"Could not save alarms: {str(e)}")
+
+    def record_add(self, alarms: List[AlarmRecord], alarm: AlarmRecord):
+        self._append(alarms, {'op': 'add', 'alarm': alarm.to_dict()})
+
+    def record_add_many(self, alarms: List[AlarmRecord], added: List[AlarmRecord]):
+        # One write and one fsync for the whole batch; a big batch just triggers compaction sooner
+        self._append(alarms, *[{'op': 'add', 'alarm': alarm.to_dict()} for alarm in added])
+
+    def record_update(self, alarms: List[AlarmRecord], alarm: AlarmRecord):
+        self._append(alarms, {'op': 'update', 'id': alarm.id, 'alarm': alarm.to_dict()})
+
+    def record_update_many(self, alarms: List[AlarmRecord], updated: List[AlarmRecord]):
+        self._append(alarms, *[{'op': 'update', 'id': alarm.id, 'alarm': alarm.to_dict()} for alarm in updated])
+
+    def record_delete(self, alarms: List[AlarmRecord], alarm: AlarmRecord):
+        self._append(alarms, {'op': 'delete', 'id': alarm.id})
+
+    def record_delete_many(self, alarms: List[AlarmRecord], deleted: List[AlarmRecord]):
+        self._append(alarms, *[{'op': 'delete', 'id': alarm.id} for alarm in deleted])
+
+    def close(self):
+        # Let a running compaction finish, so the snapshot on disk is the newest one
+        with self._compact_lock, self._lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+
+    @staticmethod
+    def _copy(alarms: List[AlarmRecord]) -> List[Dict]:
+        # Alarms are edited in place (e.g. toggling 'active'), so the snapshot needs its own dicts
+        return [alarm.to_dict() for alarm in alarms]
+
+    def _read(self):
+        """(alarms, image, last seq, log records, repaired, next id) from the snapshot and the log, changing nothing"""
+        alarms: List[AlarmRecord] = []
+        entries: List[Dict] = []
+        snapshot_seq = 0
+        next_id = 1
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, 'r') as f:
+                    data = json.load(f)
+                if isinstance(data, dict):
+                    entries, snapshot_seq, next_id = data['alarms'], data.get('seq', 0), data.get('next_id', 1)
+                else:
+                    entries = data  # plain list written before journaling was introduced
+                alarms = [AlarmRecord.from_dict(entry) for entry in entries]
+        except Exception as e:
+            print(f"Could not load alarms: {str(e)}")
+        image = OrderedDict((alarm.id, entry) for alarm, entry in zip(alarms, entries))
+
+        seq = snapshot_seq
+        log_records = 0
+        repaired = len(image) != len(alarms)  # repeated ids
+        if os.path.exists(self.log_path):
+            # Replay by id; ids repeated by old files are made unique first, in a fixed order
+            # so the same log always maps to the same alarms
+            keyed: 'OrderedDict[int, AlarmRecord]' = OrderedDict()
+            for alarm in alarms:
+                repaired |= self._insert(keyed, alarm)
+            with open(self.log_path, 'r') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Torn last line from a crash mid-append; rewrite, or new records would follow it
+                        repaired = True
+                        break
+                    log_records += 1
+                    if record['seq'] <= snapshot_seq:
+                        continue  # already folded into the snapshot
+                    repaired |= self._apply(keyed, record)
+                    self._apply_image(image, record)
+                    seq = record['seq']
+                    if record['op'] == 'add':
+                        next_id = max(next_id, self._record_id(record) + 1)  # also if deleted later on
+            alarms = list(keyed.values())
+        next_id = max([next_id] + [alarm.id + 1 for alarm in alarms if isinstance(alarm.id, int)])
+        return alarms, image, seq, log_records, repaired, next_id
+
+    @staticmethod
+    def _record_id(record: Dict) -> int:
+        alarm_id = record['alarm'].get('id')
+        return alarm_id if isinstance(alarm_id, int) else 0
+
+    @staticmethod
+    def _insert(alarms: 'OrderedDict[int, AlarmRecord]', alarm: AlarmRecord) -> bool:
+        """Add `alarm` under its id, first giving it a new one if that id is taken (returns True)"""
+        repaired = False
+        if not isinstance(alarm.id, int) or alarm.id <= 0 or alarm.id in alarms:
+            alarm.id = max(alarms, default=0) + 1
+            repaired = True
+        alarms[alarm.id] = alarm
+        return repaired
+
+    @classmethod
+    def _apply(cls, alarms: 'OrderedDict[int, AlarmRecord]', record: Dict) -> bool:
+        # `alarms` maps id -> alarm in list order while the log is replayed
+        op = record['op']
+        alarm_id = record.get('id')
+        if alarm_id is None and 'index' in record and 0 <= record['index'] < len(alarms):
+            alarm_id = list(alarms)[record['index']]  # record written before alarms had stable ids
+        if op == 'add':
+            return cls._insert(alarms, AlarmRecord.from_dict(record['alarm']))
+        elif op == 'update' and alarm_id in alarms:
+            alarm = AlarmRecord.from_dict(record['alarm'])
+            alarm.id = alarm_id
+            alarms[alarm_id] = alarm
+        elif op == 'delete' and alarm_id in alarms:
+            del alarms[alarm_id]
+        else:
+            print(f"Skipping invalid alarm log record: {record}")
+        return False
+
+    @staticmethod
+    def _apply_image(image: 'OrderedDict[int, Dict]', record: Dict):
+        # Same as _apply, on plain dicts; records that needed repairs are rewritten by load() anyway
+        op = record['op']
+        if op == 'add':
+            image[record['alarm'].get('id')] = record['alarm']
+        elif op == 'update' and record.get('id') in image:
+            image[record['id']] = dict(record['alarm'], id=record['id'])
+        elif op == 'delete':
+            image.pop(record.get('id'), None)
+
+    def _ensure_seq(self):
+        # Only needed when writing to a store that was never loaded: read its state without
+        # repairing anything (load() may itself write)
+        if self._seq is None:
+            _, image, seq, log_records, _, next_id = self._read()
+            with self._compact_lock, self._lock:
+                if self._seq is None:
+                    self._seq, self._log_records, self._image = seq, log_records, image
+                    self.next_id = max(self.next_id, next_id)
+
+    def _append(self, alarms: List[AlarmRecord], *records: Dict):
+        # Several records share one write and one fsync
+        try:
+            self._ensure_seq()
+            started = time.perf_counter()
+            with self._lock:
+                lines = []
+                for record in records:
+                    self._seq += 1
+                    record['seq'] = self._seq
+                    lines.append(json.dumps(record) + "\n")
+                    if record['op'] == 'add':
+                        self.next_id = max(self.next_id, self._record_id(record) + 1)
+                if self._log is None:
+                    self._log = open(self.log_path, 'a')
+                self._log.write("".join(lines))
+                self._log.flush()
+                os.fsync(self._log.fileno())
+                self._log_records += len(records)
+                self._pending.extend(records)
+                metrics.observe('store_write_seconds', time.perf_counter() - started, store='journal')
+
+                if self._log_records < self.compact_every or self._compacting:
+                    return
+                self._compacting = True
+            threading.Thread(target=self._compact, daemon=True).start()
+        except Exception as e:
+            print(f"Could not save alarms: {str(e)}")
+
+    def _compact(self):
+        try:
+            with self._compact_lock:
+                # Cut-off: everything logged so far goes into this snapshot
+                with self._lock:
+                    records, self._pending = self._pending, []
+                    seq, next_id = self._seq, self.next_id
+                    offset = self._log_size()
+                for record in records:
+                    self._apply_image(self._image, record)
+                self._write_atomic(self.path, {'seq': seq, 'next_id': next_id, 'alarms': list(self._image.values())})
+                with self._lock:
+                    self._truncate_log(offset)
+        except Exception as e:
+            print(f"Could not compact alarms: {str(e)}")
+        finally:
+            with self._lock:
+                self._compacting = False
+
+    def _log_size(self) -> int:
+        # Callers hold self._lock; every append is flushed, so the file size is where the next record goes
+        return os.path.getsize(self.log_path) if os.path.exists(self.log_path) else 0
+
+    def _truncate_log(self, offset: int):
+        """Drop the log up to byte `offset`; callers hold self._lock"""
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+        tail = b""
+        if os.path.exists(self.log_path):
+            # Only the records appended while the snapshot was being written
+            with open(self.log_path, 'rb') as f:
+                f.seek(offset)
+                tail = f.read()
+        self._replace(self.log_path, tail)
+        self._log_records = tail.count(b"\n")
+
+
+class SoundBackend:
+    """Interface the engine uses to play alarm sounds; the default implementation is silent"""
+
+    def __init__(self):
+        self.volume = 0.7
+
+    def init(self):
+        """Prepare the audio device (called once before the first sound)"""
+
+    def preload(self, sound_paths: List[str]):
+        """Decode sounds ahead of time so firing an alarm only has to start playback"""
+
+    def play(self, sound_path: str = "", loop: bool = True, owner=None, priority: int = 0):
+        """Play a sound file, falling back to a beep when the path is empty or missing.
+
+        `owner` identifies who the sound belongs to (e.g. one firing alarm) so it can be
+        stopped on its own; a new sound for the same owner replaces the old one.
+        """
+
+    def stop(self, owner=None):
+        """Stop the sound of one owner, or everything when no owner is given"""
+
+    def quit(self):
+        """Release the audio device"""
+
+
+class NullSoundBackend(SoundBackend):
+    """Prints instead of playing, for machines without an audio device"""
+
+    def play(self, sound_path: str = "", loop: bool = True, owner=None, priority: int = 0):
+        print(f"\a♪ {sound_path or 'Default Beep'}")
+
+
+class SoundCache:
+    """LRU cache of decoded pygame.mixer.Sound objects, bounded by their decoded size.
+
+    Loading an mp3 means disk I/O plus decoding; doing that once ahead of time means
+    firing an alarm only has to call play().
+    """
+
+    def __init__(self, pygame_module, max_bytes: int = 64 * 1024 * 1024):
+        self._pygame = pygame_module
+        self.max_bytes = max_bytes
+        self._sounds: 'OrderedDict[str, tuple]' = OrderedDict()  # path -> (Sound, size in bytes)
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, path: str):
+        """Return the decoded sound for `path`, loading it on a miss (None if it does not exist).
+
+        Paths like "tone:beep" name a synthesized pattern from alarm_tones instead of a file.
+        """
+        with self._lock:
+            entry = self._sounds.get(path)
+            if entry is not None:
+                self._sounds.move_to_end(path)
+                return entry[0]
+
+        # Decode or synthesize outside the lock
+        import alarm_tones
+        started = time.perf_counter()
+        if path.startswith(alarm_tones.TONE_PREFIX):
+            pattern = path[len(alarm_tones.TONE_PREFIX):]
+            if not alarm_tones.available() or pattern not in alarm_tones.PATTERNS:
+                return None
+            sound = alarm_tones.make_sound(self._pygame, pattern)
+        elif path and os.path.exists(path):
+            sound = self._pygame.mixer.Sound(path)
+        else:
+            return None
+        metrics.observe('sound_load_seconds', time.perf_counter() - started)
+        return self.put(path, sound)
+
+    def put(self, key: str, sound):
+        size = self._decoded_size(sound)
+        with self._lock:
+            if key in self._sounds:
+                self._total_bytes -= self._sounds.pop(key)[1]
+            self._sounds[key] = (sound, size)
+            self._total_bytes += size
+            # Evict least recently used sounds, but always keep the one just added
+            while self._total_bytes > self.max_bytes and len(self._sounds) > 1:
+                _, (_, evicted_size) = self._sounds.popitem(last=False)
+                self._total_bytes -= evicted_size
+        return sound
+
+    def warm(self, paths: List[str]):
+        for path in paths:
+            try:
+                self.get(path)
+            except Exception as e:
+                print(f"Could not preload sound {path}: {str(e)}")
+
+    def _decoded_size(self, sound) -> int:
+        frequency, size, channels = self._pygame.mixer.get_init()
+        return int(sound.get_length() * frequency) * channels * (abs(size) // 8)
+
+
+class ChannelManager:
+    """Hands out pygame mixer channels so simultaneous sounds don't cut each other off.
+
+    Every owner (a firing alarm, a finished timer, a sound test) plays on its own channel.
+    When the pool is exhausted, the lowest-priority, oldest sound is stopped to make room,
+    but never one with a higher priority than the newcomer.
+    """
+
+    def __init__(self, pygame_module, num_channels: int = 16):
+        pygame_module.mixer.set_num_channels(num_channels)
+        self._channels = [pygame_module.mixer.Channel(i) for i in range(num_channels)]
+        self._owners: Dict = {}  # owner -> (channel index, priority, start order)
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+
+    def play(self, owner, sound, loops: int = 0, volume: float = 1.0, priority: int = 0) -> bool:
+        """Play `sound` on a channel reserved for `owner`; False if no channel could be freed"""
+        with self._lock:
+            if owner in self._owners:
+                self._channels[self._owners.pop(owner)[0]].stop()
+
+            index = self._free_channel()
+            if index is None:
+                index = self._steal_channel(priority)
+            if index is None:
+                return False
+
+            channel = self._channels[index]
+            channel.set_volume(volume)
+            channel.play(sound, loops=loops)
+            self._owners[owner] = (index, priority, next(self._order))
+            return True
+
+    def stop(self, owner):
+        with self._lock:
+            entry = self._owners.pop(owner, None)
+            if entry is not None:
+                self._channels[entry[0]].stop()
+
+    def stop_all(self):
+        with self._lock:
+            for index, _, _ in self._owners.values():
+                self._channels[index].stop()
+            self._owners.clear()
+
+    def is_playing(self, owner) -> bool:
+        with self._lock:
+            entry = self._owners.get(owner)
+            return entry is not None and self._channels[entry[0]].get_busy()
+
+    def _free_channel(self) -> Optional[int]:
+        # Forget owners whose sound already ended, then pick any idle channel
+        for owner, (index, _, _) in list(self._owners.items()):
+            if not self._channels[index].get_busy():
+                del self._owners[owner]
+        used = {index for index, _, _ in self._owners.values()}
+        for index, channel in enumerate(self._channels):
+            if index not in used and not channel.get_busy():
+                return index
+        return None
+
+    def _steal_channel(self, priority: int) -> Optional[int]:
+        if not self._owners:
+            return None
+        victim = min(self._owners, key=lambda owner: self._owners[owner][1:])  # lowest priority, then oldest
+        index, victim_priority, _ = self._owners[victim]
+        if victim_priority > priority:
+            return None
+        del self._owners[victim]
+        self._channels[index].stop()
+        return index
+
+
+class PygameSoundBackend(SoundBackend):
+    """Plays preloaded pygame.mixer.Sound objects; pygame is imported on first use"""
+
+    def __init__(self, cache_bytes: int = 64 * 1024 * 1024, num_channels: int = 16):
+        super().__init__()
+        self.cache_bytes = cache_bytes
+        self.num_channels = num_channels
+        self.cache: Optional[SoundCache] = None
+        self.channels: Optional[ChannelManager] = None
+        self._pygame = None
+        self._init_lock = threading.Lock()
+
+    def init(self):
+        with self._init_lock:
+            if self._pygame is None:
+                import pygame
+                pygame.mixer.init()
+                self.cache = SoundCache(pygame, self.cache_bytes)
+                self.channels = ChannelManager(pygame, self.num_channels)
+                self._pygame = pygame
+
+    def preload(self, sound_paths: List[str]):
+        """Decode the given sounds (and the beep) in a background thread"""
+        def warm():
+            self.init()
+            self.cache.warm([path for path in sound_paths if path])
+            self.get_beep_sound()
+
+        threading.Thread(target=warm, daemon=True).start()
+
+    def play(self, sound_path: str = "", loop: bool = True, owner=None, priority: int = 0):
+        self.init()
+        sound = self.cache.get(sound_path) if sound_path else None
+        if sound is None:
+            sound = self.get_beep_sound()
+        if sound is None:
+            return
+
+        if owner is None:
+            owner = object()  # anonymous sound, only stopped by stop() without an owner
+        # -1 loops indefinitely
+        if not self.channels.play(owner, sound, loops=-1 if loop else 0, volume=self.volume, priority=priority):
+            print(f"No free sound channel for {sound_path or 'Default Beep'}")
+
+    def stop(self, owner=None):
+        if self.channels is None:
+            return
+        if owner is None:
+            self.channels.stop_all()
+        else:
+            self.channels.stop(owner)
+
+    def quit(self):
+        if self._pygame is not None:
+            self._pygame.mixer.quit()
+            self._pygame = None
+            self.cache = None
+            self.channels = None
+
+    def get_beep_sound(self):
+        """Return the default beep, synthesized in memory the first time it is needed"""
+        self.init()
+        sound = self.cache.get("tone:beep")
+        if sound is None:
+            print("numpy not available, no beep sound")
+        return sound
+
+
+def open_store(path: str = "alarms.json"):
+    """Pick the alarm store for a file: SQLite for .db/.sqlite paths, the JSON journal otherwise"""
+    if os.path.splitext(path)[1].lower() in ('.db', '.sqlite', '.sqlite3'):
+        from alarm_db import SqliteAlarmStore  # imported here: alarm_db itself imports this module
+        return SqliteAlarmStore(path)
+    return JournalAlarmStore(path)
+
+
+class AlarmEngine:
+    """Owns the alarm list and wires it to the store, the scheduler and the sound backend.
+
+    Front ends (the Tk window, the headless daemon) mutate alarms through this class and
+    register listeners that get an AlarmFiring whenever an alarm rings (see `snooze()`).
+    Alarms are addressed by their id, which is unique and never reused: the store keeps a
+    high-water mark (`store.next_id`), so ids of deleted alarms stay retired across restarts
+    and are not handed out again, not even to imported alarms that bring them. `alarms` keeps
+    display order.
+
+    Mutations hold `lock`, so other threads (e.g. the control API in alarm_api.py) may call
+    them too; `change_listeners` are then told what changed so a front end can refresh.
+    """
+
+    def __init__(self, store: Optional[JsonAlarmStore] = None, sound: Optional[SoundBackend] = None,
+                 grace: float = MISSED_GRACE, snooze_minutes: float = SNOOZE_MINUTES,
+                 max_snoozes: int = MAX_SNOOZES):
+        self.store = store or JournalAlarmStore()
+        self.sound = sound or SoundBackend()
+        self.alarms: List[AlarmRecord] = []
+        self.by_id: Dict[int, AlarmRecord] = {}  # alarm id -> alarm, kept in step with `alarms`
+        self._next_id = 1
+        self.scheduler = AlarmScheduler(self._fire, self._missed, grace)
+        # What each firing does; front ends register the 'popup' handler
+        self.actions = ActionRunner()
+        self.actions.register('sound', lambda firing, action: self.play_alarm_sound(firing.alarm))
+        self.actions.listeners.append(metrics.action_listener)
+        self.snooze_minutes = snooze_minutes
+        self.max_snoozes = max_snoozes
+        self.listeners: List[Callable[[AlarmFiring], None]] = []
+        # Told about alarms that were overdue by more than the grace window and did not ring
+        self.missed_listeners: List[Callable[[AlarmRecord, float], None]] = []
+        # Told ('add' | 'update' | 'delete', alarms) after every change, on the changing thread
+        self.change_listeners: List[Callable[[str, List[AlarmRecord]], None]] = []
+        self.lock = threading.RLock()
+
+    def load(self):
+        self.alarms = self.store.load()
+        if self._index_alarms():
+            self.save()  # persist repaired ids so the journal can refer to them
+        self.scheduler.reschedule_all(self.alarms)
+        self.sound.preload(self.sound_paths())
+
+    def _index_alarms(self) -> bool:
+        """Rebuild `by_id`, giving fresh ids to alarms with a missing or duplicate one"""
+        self.by_id = {}
+        self._next_id = max([alarm.id for alarm in self.alarms if isinstance(alarm.id, int)] + [0]) + 1
+        self._next_id = max(self._next_id, getattr(self.store, 'next_id', 1))
+        repaired = False
+        for alarm in self.alarms:
+            if not isinstance(alarm.id, int) or alarm.id <= 0 or alarm.id in self.by_id:
+                alarm.id = self._allocate_id()
+                repaired = True
+            self.by_id[alarm.id] = alarm
+        return repaired
+
+    def _unused_id(self, alarm_id) -> bool:
+        # An id brought by an alarm (e.g. from an import) is kept only if it was never handed out
+        return isinstance(alarm_id, int) and alarm_id >= self._next_id
+
+    def _allocate_id(self) -> int:
+        alarm_id = self._next_id
+        self._next_id += 1
+        return alarm_id
+
+    def get_alarm(self, alarm_id: int) -> Optional[AlarmRecord]:
+        return self.by_id.get(alarm_id)
+
+    def save(self):
+        self.store.save(self.alarms)
+
+    def start(self):
+        self.scheduler.start()
+
+    def stop(self):
+        self.scheduler.stop()
+        self.actions.close()
+        self.store.close()
+        self.sound.quit()
+
+    def add_alarm(self, alarm: AlarmRecord) -> AlarmRecord:
+        """Add a new alarm, assigning it an id unless it brings an unused one"""
+        with self.lock:
+            if not self._unused_id(alarm.id):
+                alarm.id = self._allocate_id()
+            self._next_id = max(self._next_id, alarm.id + 1)
+            self.alarms.append(alarm)
+            self.by_id[alarm.id] = alarm
+            self.scheduler.schedule(alarm)
+            self.sound.preload([alarm.sound_path])
+            self.store.record_add(self.alarms, alarm)
+        self._changed('add', [alarm])
+        return alarm
+
+    def add_many(self, alarms: List[AlarmRecord]) -> List[AlarmRecord]:
+        """Add a batch of alarms with one scheduler update and one store write"""
+        with self.lock:
+            for alarm in alarms:
+                if not self._unused_id(alarm.id):
+                    alarm.id = self._allocate_id()
+                self._next_id = max(self._next_id, alarm.id + 1)
+                self.by_id[alarm.id] = alarm
+            self.alarms.extend(alarms)
+            self.scheduler.schedule_many(alarms)
+            self.sound.preload(list(dict.fromkeys(alarm.sound_path for alarm in alarms if alarm.sound_path)))
+            self.store.record_add_many(self.alarms, alarms)
+        self._changed('add', alarms)
+        return alarms
+
+    def update_alarm(self, alarm_id: int, **fields) -> Optional[AlarmRecord]:
+        """Edit an alarm's fields (see AlarmRecord.update) and reschedule it"""
+        with self.lock:
+            alarm = self.by_id.get(alarm_id)
+            if alarm is None:
+                return None
+            fields.pop('id', None)  # ids never change
+            alarm.update(**fields)
+            self.scheduler.schedule(alarm)
+            if 'sound_path' in fields:
+                self.sound.preload([alarm.sound_path])
+            self.store.record_update(self.alarms, alarm)
+        self._changed('update', [alarm])
+        return alarm
+
+    def update_many(self, changes: Dict[int, Dict]) -> List[AlarmRecord]:
+        """Apply {alarm id: fields} in one store write; unknown ids are skipped"""
+        with self.lock:
+            updated = []
+            for alarm_id, fields in changes.items():
+                alarm = self.by_id.get(alarm_id)
+                if alarm is None:
+                    continue
+                fields = dict(fields)
+                fields.pop('id', None)
+                alarm.update(**fields)
+                updated.append(alarm)
+            self.scheduler.schedule_many(updated)
+            self.sound.preload(list(dict.fromkeys(alarm.sound_path for alarm in updated if alarm.sound_path)))
+            self.store.record_update_many(self.alarms, updated)
+        self._changed('update', updated)
+        return updated
+
+    def toggle_alarm(self, alarm_id: int) -> Optional[AlarmRecord]:
+        with self.lock:
+            alarm = self.by_id.get(alarm_id)
+            if alarm is None:
+                return None
+            alarm.active = not alarm.active
+            self.scheduler.schedule(alarm)
+            self.store.record_update(self.alarms, alarm)
+        self._changed('update', [alarm])
+        return alarm
+
+    def delete_alarm(self, alarm_id: int) -> Optional[AlarmRecord]:
+        with self.lock:
+            alarm = self.by_id.pop(alarm_id, None)
+            if alarm is None:
+                return None
+            self.scheduler.unschedule(alarm)
+            self.alarms.remove(alarm)  # only this keeps the display order; a memmove, no rebuild
+            self.store.record_delete(self.alarms, alarm)
+        self._changed('delete', [alarm])
+        return alarm
+
+    def delete_many(self, alarm_ids: List[int]) -> List[AlarmRecord]:
+        """Delete several alarms with one pass over the list and one store write"""
+        with self.lock:
+            deleted = [self.by_id.pop(alarm_id) for alarm_id in dict.fromkeys(alarm_ids) if alarm_id in self.by_id]
+            for alarm in deleted:
+                self.scheduler.unschedule(alarm)
+            if deleted:
+                self.alarms[:] = [alarm for alarm in self.alarms if alarm.id in self.by_id]
+                self.store.record_delete_many(self.alarms, deleted)
+        self._changed('delete', deleted)
+        return deleted
+
+    def _changed(self, kind: str, alarms: List[AlarmRecord]):
+        if not alarms:
+            return
+        for listener in self.change_listeners:
+            try:
+                listener(kind, alarms)
+            except Exception as e:
+                print(f"Alarm change listener failed: {str(e)}")
+
+    def sound_paths(self) -> List[str]:
+        """Distinct custom sound files referenced by active alarms"""
+        return list(dict.fromkeys(alarm.sound_path for alarm in self.alarms
+                                  if alarm.active and alarm.sound_path))
+
+    def active_count(self) -> int:
+        with self.lock:
+            return len([alarm for alarm in self.alarms if alarm.active])
+
+    # Firing alarms outrank finished timers, which outrank sound previews
+    ALARM_PRIORITY = 10
+    TIMER_PRIORITY = 5
+
+    def play_alarm_sound(self, alarm: AlarmRecord):
+        try:
+            self.sound.play(alarm.sound_path, owner=('alarm', alarm.id), priority=self.ALARM_PRIORITY)
+        except Exception as e:
+            print(f"Could not play alarm sound: {str(e)}")
+
+    def stop_alarm_sound(self, alarm: AlarmRecord):
+        """Stop the sound of one firing alarm, leaving other alarms and timers playing"""
+        self.sound.stop(('alarm', alarm.id))
+
+    def can_snooze(self, firing: AlarmFiring) -> bool:
+        return firing.snoozes < self.max_snoozes
+
+    def snooze(self, firing: AlarmFiring, minutes: Optional[float] = None) -> Optional[AlarmFiring]:
+        """Silence a ringing instance and ring it again after `minutes` (default: snooze_minutes).
+
+        Returns the re-armed instance, or None once it has been snoozed max_snoozes times.
+        """
+        self.stop_alarm_sound(firing.alarm)
+        if not self.can_snooze(firing):
+            return None
+        delay = (minutes if minutes is not None else self.snooze_minutes) * 60
+        return self.scheduler.snooze(firing, time.time() + delay)
+
+    def _fire(self, firing: AlarmFiring):
+        # One failing listener (or action pipeline) must not keep the others from hearing about the alarm
+        try:
+            self.actions.run(firing)
+        except Exception as e:
+            print(f"Could not run alarm actions: {str(e)}")
+        for listener in self.listeners:
+            try:
+                listener(firing)
+            except Exception as e:
+                print(f"Alarm listener failed: {str(e)}")
+
+    def _missed(self, alarm: AlarmRecord, when: float):
+        AlarmScheduler._log_missed(alarm, when)
+        for listener in self.missed_listeners:
+            try:
+                listener(alarm, when)
+            except Exception as e:
+                print(f"Missed alarm listener failed: {str(e)}")
+
+
+def run_headless(alarm_file: str = "alarms.json", sound: Optional[SoundBackend] = None,
+                 grace: float = MISSED_GRACE, api_port: Optional[int] = None, api_socket: Optional[str] = None,
+                 enable_metrics: bool = False, metrics_file: Optional[str] = None, metrics_interval: float = 60.0,
+                 snooze_minutes: float = SNOOZE_MINUTES, max_snoozes: int = MAX_SNOOZES,
+                 api_token_file: Optional[str] = None, api_allow_actions: List[str] = ()):
+    """Run the scheduler without a window until interrupted, optionally with the control API"""
+    if metrics_file:
+        metrics.start_dump(metrics_file, metrics_interval)
+    elif enable_metrics:
+        metrics.enable()
+    engine = AlarmEngine(open_store(alarm_file), sound or PygameSoundBackend(), grace, snooze_minutes, max_snoozes)
+    engine.actions.register('popup', lambda firing, action: print(
+        f"[{datetime.datetime.now():%H:%M:%S}] ALARM! {firing.alarm.label}", flush=True))
+    engine.load()
+    engine.start()
+    print(f"Running {engine.active_count()} active alarm(s) from {alarm_file} (Ctrl+C to quit)", flush=True)
+
+    api = None
+    timers = TimerRegistry(on_finish=lambda timer: print(
+        f"[{datetime.datetime.now():%H:%M:%S}] Timer {timer.name!r} finished", flush=True))
+    if api_port is not None or api_socket:
+        from alarm_api import AlarmApiServer  # imports this module, so only loaded when asked for
+        from alarm_api import API_ACTIONS
+        api = AlarmApiServer(engine, timers, port=api_port, socket_path=api_socket, token_file=api_token_file,
+                             allowed_actions=API_ACTIONS + tuple(api_allow_actions))
+        api.start()
+        print(f"Control API listening on {', '.join(api.addresses())} (token in {api.token_file})", flush=True)
+
+    stopped = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopped.set())
+    try:
+        while not stopped.wait(timeout=1):
+            pass
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if api is not None:
+            api.stop()
+        timers.close()
+        engine.stop()
+        metrics.stop_dump()
+
+
+def argument_parser(description: str = "Run the alarm clock without a GUI") -> argparse.ArgumentParser:
+    """Command line options shared by the daemon and the Tk app (which adds its own)"""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--alarm-file", default="alarms.json", help="alarm list to load (.json, or .db for SQLite)")
+    parser.add_argument("--no-sound", action="store_true", help="print alarms instead of playing sounds (headless)")
+    parser.add_argument("--grace", type=_non_negative, default=MISSED_GRACE,
+                        help="seconds an alarm missed during suspend may be late and still ring (default: %(default)s)")
+    parser.add_argument("--snooze-minutes", type=_positive, default=SNOOZE_MINUTES,
+                        help="length of one snooze (default: %(default)s)")
+    parser.add_argument("--max-snoozes", type=_count, default=MAX_SNOOZES,
+                        help="snoozes allowed per alarm instance (default: %(default)s)")
+    parser.add_argument("--api-port", type=_port, help="serve the control API on 127.0.0.1 at this port")
+    parser.add_argument("--api-socket", help="serve the control API on this Unix socket")
+    parser.add_argument("--api-token-file", help="file holding the control API token, created if missing "
+                                                 "(default: ~/.alarm_api_token)")
+    parser.add_argument("--api-allow-actions", type=_action_types, default=[], metavar="TYPES",
+                        help="let API clients set these action types too, e.g. shell,python (they run any code)")
+    parser.add_argument("--metrics", action="store_true", help="record latency metrics (served at /metrics)")
+    parser.add_argument("--metrics-file", help="record metrics and write them to this JSON file periodically")
+    parser.add_argument("--metrics-interval", type=_positive, default=60.0,
+                        help="seconds between metrics file writes (default: %(default)s)")
+    return parser
+
+
+def _non_negative(text: str) -> float:
+    value = _number(text, float)
+    if not value >= 0:
+        raise argparse.ArgumentTypeError(f"must be 0 or more: {text}")
+    return value
+
+
+def _positive(text: str) -> float:
+    value = _number(text, float)
+    if not value > 0:
+        raise argparse.ArgumentTypeError(f"must be more than 0: {text}")
+    return value
+
+
+def _count(text: str) -> int:
+    value = _number(text, int)
+    if value < 0:
+        raise argparse.ArgumentTypeError(f"must be 0 or more: {text}")
+    return value
+
+
+def _port(text: str) -> int:
+    value = _number(text, int)
+    if not 0 <= value <= 65535:
+        raise argparse.ArgumentTypeError(f"not a TCP port: {text}")
+    return value
+
+
+def _action_types(text: str) -> List[str]:
+    types = [kind.strip() for kind in text.split(',') if kind.strip()]
+    unknown = [kind for kind in types if kind not in ACTION_TYPES]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown action type(s): {', '.join(unknown)}")
+    return types
+
+
+def _number(text: str, kind):
+    try:
+        return kind(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not a {'whole ' if kind is int else ''}number: {text!r}")
+
+
+def headless_from_args(args: argparse.Namespace):
+    """Run the daemon with options parsed by `argument_parser()`"""
+    run_headless(args.alarm_file, NullSoundBackend() if args.no_sound else None, args.grace,
+                 args.api_port, args.api_socket, args.metrics, args.metrics_file, args.metrics_interval,
+                 args.snooze_minutes, args.max_snoozes, args.api_token_file, args.api_allow_actions)
+
+
+def main():
+    headless_from_args(argument_parser().parse_args())
+
+
+if __name__ == "__main__":
+    main()
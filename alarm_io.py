@@ -0,0 +1,357 @@
+# coding: utf-8
+"""Bulk alarm import and export: CSV, JSON Lines and iCalendar.
+
+Files are read and written one alarm at a time, so memory use does not grow with the
+file. Imported alarms are validated in batches and each batch is handed to
+`AlarmEngine.add_many`, which schedules and persists it in one go.
+
+CSV and JSON Lines use the alarms.json field names (`days` is a `;`-separated list in
+CSV), plus an optional `rule` (see alarm_recurrence.py), `timezone` and `actions` (see
+alarm_actions.py; a JSON list in CSV). iCalendar files hold one VEVENT
+per alarm; simple weekly and daily events become weekday alarms, anything else (one-shot
+events, intervals, monthly rules, EXDATEs) a rule-based alarm.
+"""
+
+import csv
+import datetime
+import json
+import os
+import re
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from alarm_actions import validate_actions
+from alarm_engine import DAY_NAMES, AlarmRecord, days_to_mask
+from alarm_recurrence import localize_utc, parse_rule
+from alarm_time import get_zone
+
+FORMATS = ('csv', 'jsonl', 'ics')
+CSV_FIELDS = ['id', 'hour', 'minute', 'label', 'days', 'active', 'sound', 'sound_path', 'rule', 'timezone',
+              'actions']
+
+# Spellings of booleans accepted in files (an empty CSV cell means the default, true)
+TRUE_WORDS = ('', '1', 'true', 'yes', 'on')
+FALSE_WORDS = ('0', 'false', 'no', 'off')
+
+# iCalendar two-letter weekday codes, in DAY_NAMES order
+ICAL_DAYS = ['MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU']
+
+
+def detect_format(path: str) -> str:
+    extension = os.path.splitext(path)[1].lower().lstrip('.')
+    extension = {'ndjson': 'jsonl', 'ical': 'ics', 'ifb': 'ics'}.get(extension, extension)
+    if extension not in FORMATS:
+        raise ValueError(f"Unsupported alarm file type: .{extension} (use .csv, .jsonl or .ics)")
+    return extension
+
+
+# --- Reading ----------------------------------------------------------------------------
+
+def read_entries(path: str, fmt: Optional[str] = None) -> Iterator[Tuple[int, object]]:
+    """Yield (line number, alarms.json-style dict) for every alarm in the file.
+
+    An entry that cannot be parsed is yielded as the ValueError describing the problem,
+    so one bad line does not stop the rest of the file from being read.
+    """
+    fmt = fmt or detect_format(path)
+    with open(path, 'r', newline='', encoding='utf-8-sig') as f:
+        if fmt == 'csv':
+            yield from _read_csv(f)
+        elif fmt == 'jsonl':
+            yield from _read_jsonl(f)
+        else:
+            yield from _read_ics(f)
+
+
+def _read_csv(f) -> Iterator[Tuple[int, Dict]]:
+    reader = csv.DictReader(f)
+    for row in reader:
+        entry = {key.strip().lower(): value or "" for key, value in row.items() if key}
+        if 'time' in entry and 'hour' not in entry:  # also accept a single HH:MM column
+            entry['hour'], _, entry['minute'] = entry.pop('time').partition(':')
+        entry['days'] = [day for day in entry.get('days', "").replace(',', ';').split(';') if day.strip()]
+        yield reader.line_num, entry
+
+
+def _read_jsonl(f) -> Iterator[Tuple[int, Dict]]:
+    for line_number, line in enumerate(f, 1):
+        if line.strip():
+            try:
+                yield line_number, json.loads(line)
+            except ValueError as e:
+                yield line_number, ValueError(f"invalid JSON: {str(e)}")
+
+
+def _read_ics(f) -> Iterator[Tuple[int, Dict]]:
+    event = None
+    start_line = 0
+    for line_number, line in _unfold(f):
+        name, _, value = line.partition(':')
+        name, _, params = name.partition(';')
+        name = name.upper()
+        if name == 'BEGIN' and value.upper() == 'VEVENT':
+            event, start_line = {}, line_number
+        elif name == 'END' and value.upper() == 'VEVENT' and event is not None:
+            try:
+                yield start_line, _event_to_entry(event)
+            except (KeyError, ValueError) as e:
+                yield start_line, ValueError(f"invalid VEVENT: {str(e)}")
+            event = None
+        elif event is not None and name == 'EXDATE' and name in event:
+            event[name] = (params, event[name][1] + "," + value)  # EXDATE may be repeated
+        elif event is not None:
+            event[name] = (params, value)
+
+
+def _unfold(f) -> Iterator[Tuple[int, str]]:
+    # Long iCalendar lines continue on following lines that start with a space or tab
+    pending, pending_line = None, 0
+    for line_number, line in enumerate(f, 1):
+        line = line.rstrip('\r\n')
+        if line[:1] in (' ', '\t') and pending is not None:
+            pending += line[1:]
+            continue
+        if pending is not None:
+            yield pending_line, pending
+        pending, pending_line = line, line_number
+    if pending is not None:
+        yield pending_line, pending
+
+
+def _event_to_entry(event: Dict) -> Dict:
+    if 'DTSTART' not in event:
+        raise ValueError("VEVENT without DTSTART")
+    params, value = event['DTSTART']
+    if 'T' not in value:
+        raise ValueError("all-day events have no alarm time")
+    start = datetime.datetime.strptime(value.rstrip('Z')[:15], "%Y%m%dT%H%M%S")
+    timezone = None
+    for param in params.split(';'):
+        if param.upper().startswith('TZID='):
+            timezone = param[5:].strip('"')  # the alarm keeps ringing at this wall time in that zone
+    if value.endswith('Z'):  # UTC: convert to local wall-clock time
+        start = start.replace(tzinfo=datetime.timezone.utc).astimezone().replace(tzinfo=None)
+
+    rrule = event.get('RRULE', ('', ''))[1]
+    parts = [part for part in rrule.upper().split(';') if part]
+    rule = dict(part.split('=', 1) for part in parts if '=' in part)
+    entry = {
+        'id': _ical_id(event.get('UID', ('', ''))[1]),
+        'hour': start.hour,
+        'minute': start.minute,
+        'label': _ical_unescape(event.get('SUMMARY', ('', "Alarm"))[1]),
+        'days': [],
+        'active': event.get('X-ALARM-ACTIVE', ('', 'TRUE'))[1],
+        'sound': _ical_unescape(event.get('X-ALARM-SOUND', ('', "Default Beep"))[1]),
+        'sound_path': _ical_unescape(event.get('X-ALARM-SOUND-PATH', ('', ""))[1]),
+        'timezone': timezone,
+    }
+    if 'X-ALARM-ACTIONS' in event:
+        entry['actions'] = _ical_unescape(event['X-ALARM-ACTIONS'][1])  # JSON text, checked by validate()
+
+    frequency = rule.get('FREQ')
+    plain = set(rule) <= {'FREQ', 'BYDAY', 'WKST'} and len(rule) == len(parts) and 'EXDATE' not in event
+    if plain and frequency == 'DAILY' and 'BYDAY' not in rule:
+        entry['days'] = list(DAY_NAMES)
+    elif plain and frequency == 'WEEKLY':
+        codes = rule['BYDAY'].split(',') if 'BYDAY' in rule else [ICAL_DAYS[start.weekday()]]
+        if any(code not in ICAL_DAYS for code in codes):
+            raise ValueError(f"invalid BYDAY in RRULE: {rule['BYDAY']}")
+        entry['days'] = [DAY_NAMES[ICAL_DAYS.index(code)] for code in codes]
+    else:
+        lines = [f"DTSTART:{start:%Y%m%dT%H%M%S}"]
+        if rrule:
+            lines.append(f"RRULE:{rrule}")
+        if 'EXDATE' in event:
+            lines.append(f"EXDATE:{event['EXDATE'][1]}")
+        # UNTIL and EXDATE are often in UTC (required with a TZID); store them as the event zone's wall time
+        entry['rule'] = localize_utc("\n".join(lines), get_zone(timezone))
+    return entry
+
+
+def _ical_id(uid: str) -> int:
+    # UIDs written by export_alarms look like "alarm-12@multi-alarm-clock"; anything else gets a new id
+    name = uid.split('@', 1)[0]
+    return int(name[6:]) if name.startswith('alarm-') and name[6:].isdigit() else 0
+
+
+def _ical_unescape(text: str) -> str:
+    # One pass, so an escaped backslash followed by 'n' stays a backslash and an 'n'
+    return re.sub(r'\\(.)', lambda match: '\n' if match.group(1) in 'nN' else match.group(1), text)
+
+
+def validate(entry: Dict) -> AlarmRecord:
+    """Turn one parsed entry into an AlarmRecord, raising ValueError if it is not a valid alarm"""
+    if not isinstance(entry, dict):
+        raise ValueError("expected an object")
+    try:
+        if entry.get('rule') and 'hour' not in entry:
+            entry = dict(entry, hour=0, minute=0)  # rule-based alarms take their time from the rule
+        hour, minute = int(entry['hour']), int(entry['minute'])
+    except KeyError as e:
+        raise ValueError(f"missing field {e}")
+    except (TypeError, ValueError):
+        raise ValueError("hour and minute must be whole numbers")
+    if not (0 <= hour <= 23 and 0 <= minute <= 59):
+        raise ValueError(f"invalid time {hour}:{minute}")
+
+    rule = None
+    if entry.get('rule'):
+        rule = parse_rule(str(entry['rule']).replace('\\n', '\n'))  # CSV cells may hold a literal \n
+
+    days = entry.get('days') or []
+    if isinstance(days, str):
+        days = days.replace(',', ';').split(';')
+    names = []
+    for day in days:
+        name = _day_name(str(day))
+        if name is None:
+            raise ValueError(f"unknown day {day!r}")
+        names.append(name)
+    if not names and rule is None:
+        raise ValueError("no days selected")
+
+    label = str(entry.get('label') or "")
+    if not label.strip():
+        raise ValueError("empty label")
+    timezone = str(entry.get('timezone') or "").strip() or None
+    get_zone(timezone)  # raises ValueError for unknown zones
+    try:
+        alarm_id = int(str(entry.get('id') or 0).strip())
+    except (TypeError, ValueError):
+        alarm_id = 0  # the engine assigns a new one
+
+    return AlarmRecord(alarm_id, hour, minute, label, days_to_mask(names), parse_bool(entry.get('active', True)),
+                       str(entry.get('sound') or "Default Beep"), str(entry.get('sound_path') or ""), rule,
+                       timezone, validate_actions(entry.get('actions')))
+
+
+def parse_bool(value, field: str = 'active') -> bool:
+    """A boolean from JSON, or from text as written in CSV and iCalendar files; raises ValueError otherwise"""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str):
+        text = value.strip().lower()
+        if text in TRUE_WORDS:
+            return True
+        if text in FALSE_WORDS:
+            return False
+    raise ValueError(f"{field} must be true or false, not {value!r}")
+
+
+# Full names, three-letter abbreviations and iCalendar codes, lowercased -> day name
+DAY_ALIASES = {alias.lower(): name for name, code in zip(DAY_NAMES, ICAL_DAYS) for alias in (name, name[:3], code)}
+
+
+def _day_name(day: str) -> Optional[str]:
+    return DAY_ALIASES.get(day.strip().lower())
+
+
+def import_alarms(engine, path: str, fmt: Optional[str] = None, batch_size: int = 5000,
+                  add_batch: Optional[Callable[[List[AlarmRecord]], None]] = None) -> Tuple[int, List[str]]:
+    """Import every valid alarm in `path`; returns (number imported, error messages).
+
+    Alarms are collected into batches of `batch_size` and each batch is added with a single
+    call to `add_batch` (default: `engine.add_many`). Invalid entries are skipped and reported.
+    """
+    add_batch = add_batch or engine.add_many
+    imported, errors, batch = 0, [], []
+    for line_number, entry in read_entries(path, fmt):
+        try:
+            if isinstance(entry, ValueError):
+                raise entry
+            batch.append(validate(entry))
+        except ValueError as e:
+            errors.append(f"line {line_number}: {str(e)}")
+            continue
+        if len(batch) >= batch_size:
+            add_batch(batch)
+            imported += len(batch)
+            batch = []
+    if batch:
+        add_batch(batch)
+        imported += len(batch)
+    return imported, errors
+
+
+# --- Writing ----------------------------------------------------------------------------
+
+def export_alarms(alarms: Iterable[AlarmRecord], path: str, fmt: Optional[str] = None) -> int:
+    """Write `alarms` to `path` in the format given by `fmt` or the file extension; returns the count"""
+    fmt = fmt or detect_format(path)
+    count = 0
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+            if fmt == 'csv':
+                writer = csv.writer(f)
+                writer.writerow(CSV_FIELDS)
+                for alarm in alarms:
+                    writer.writerow([alarm.id, alarm.hour, alarm.minute, alarm.label, ";".join(alarm.days),
+                                     "true" if alarm.active else "false", alarm.sound, alarm.sound_path,
+                                     alarm.rule.text if alarm.rule is not None else "", alarm.timezone or "",
+                                     json.dumps(alarm.actions) if alarm.actions else ""])
+                    count += 1
+            elif fmt == 'jsonl':
+                for alarm in alarms:
+                    f.write(json.dumps(alarm.to_dict()) + "\n")
+                    count += 1
+            else:
+                f.write("BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//Multi-Alarm Clock//EN\r\n")
+                stamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+                for alarm in alarms:
+                    f.writelines(_fold(line) for line in _alarm_to_event(alarm, stamp))
+                    count += 1
+                f.write("END:VCALENDAR\r\n")
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):  # e.g. disk full or an unwritable alarm: leave nothing behind
+            os.remove(tmp_path)
+        raise
+    return count
+
+
+def _alarm_to_event(alarm: AlarmRecord, stamp: str) -> List[str]:
+    if alarm.rule is not None:
+        schedule = [line.strip() for line in alarm.rule.text.split('\n') if line.strip()]
+    else:
+        # DTSTART is the first selected weekday in the week of 2024-01-01 (a Monday), in floating local time
+        first_day = next((day for day in range(7) if alarm.runs_on(day)), 0)
+        start = datetime.datetime(2024, 1, 1 + first_day, alarm.hour, alarm.minute)
+        byday = ",".join(code for day, code in enumerate(ICAL_DAYS) if alarm.runs_on(day))
+        schedule = [f"DTSTART:{start:%Y%m%dT%H%M%S}", f"RRULE:FREQ=WEEKLY;BYDAY={byday}"]
+    if alarm.timezone:
+        schedule = [f"DTSTART;TZID={alarm.timezone}:{line.split(':', 1)[1]}" if line.upper().startswith('DTSTART')
+                    else line for line in schedule]
+    return [
+        "BEGIN:VEVENT",
+        f"UID:alarm-{alarm.id}@multi-alarm-clock",
+        f"DTSTAMP:{stamp}",
+        *schedule,
+        f"SUMMARY:{_ical_escape(alarm.label)}",
+        f"X-ALARM-ACTIVE:{'TRUE' if alarm.active else 'FALSE'}",
+        f"X-ALARM-SOUND:{_ical_escape(alarm.sound)}",
+        f"X-ALARM-SOUND-PATH:{_ical_escape(alarm.sound_path)}",
+        *([f"X-ALARM-ACTIONS:{_ical_escape(json.dumps(alarm.actions))}"] if alarm.actions else []),
+        "END:VEVENT",
+    ]
+
+
+def _ical_escape(text: str) -> str:
+    return text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+
+def _fold(line: str) -> str:
+    # iCalendar lines are limited to 75 octets; longer ones continue on lines starting with a space
+    data = line.encode('utf-8')
+    if len(data) <= 75:
+        return line + "\r\n"
+    parts, start, limit = [], 0, 75
+    while start < len(data):
+        end = min(start + limit, len(data))
+        while end < len(data) and (data[end] & 0xC0) == 0x80:  # never split a UTF-8 character
+            end -= 1
+        parts.append(data[start:end].decode('utf-8'))
+        start, limit = end, 74  # continuation lines spend one octet on the leading space
+    return "\r\n ".join(parts) + "\r\n"
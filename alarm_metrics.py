@@ -0,0 +1,199 @@
+# coding: utf-8
+"""Built-in instrumentation: latency histograms and counters for the scheduler, stores, UI and sound.
+
+Instrumented code reports to the module-level `metrics` registry:
+
+    started = time.perf_counter()
+    ...
+    metrics.observe('store_write_seconds', time.perf_counter() - started, store='journal')
+
+Metrics are off by default; then `observe()` and `inc()` return after one attribute check,
+so leaving the calls in hot paths costs next to nothing. Call `metrics.enable()` (the
+--metrics flag) to start recording. The numbers can be read as Prometheus text
+(`prometheus()`, served at /metrics by the control API), as a dict (`to_dict()`) or written
+to a JSON file every few seconds (`start_dump()`).
+"""
+
+import bisect
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+# Upper bounds (seconds) for latency histograms: 100 µs up to a minute
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Metrics reported by this package: name -> (kind, help text)
+DEFINITIONS = {
+    'alarm_fire_lateness_seconds': ('histogram', "How long after its scheduled instant an alarm was handed to its actions"),
+    'scheduler_loop_seconds': ('histogram', "Time the scheduler thread spent per wake-up handling due alarms"),
+    'store_write_seconds': ('histogram', "Time to persist one change or snapshot, by store"),
+    'ui_refresh_seconds': ('histogram', "Time spent updating widgets on the Tk main thread, by what was refreshed"),
+    'sound_load_seconds': ('histogram', "Time to decode or synthesize one alarm sound"),
+    'action_seconds': ('histogram', "Run time of one alarm action, by action type"),
+    'alarms_fired_total': ('counter', "Alarm firings, including snoozed instances"),
+    'alarms_missed_total': ('counter', "Alarms that were overdue by more than the grace window"),
+    'action_failures_total': ('counter', "Alarm actions that failed or timed out, by action type"),
+}
+
+
+class Histogram:
+    """Cumulative bucket counts plus sum and count, as Prometheus expects"""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th quantile (an estimate, like Prometheus)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+
+class Metrics:
+    """Registry of every metric, keyed by name and label values"""
+
+    def __init__(self):
+        self.enabled = False
+        self._histograms: Dict[Tuple[str, tuple], Histogram] = {}
+        self._counters: Dict[Tuple[str, tuple], float] = {}
+        self._lock = threading.Lock()
+        self._dump_thread: Optional[threading.Thread] = None
+        self._dump_stop = threading.Event()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def observe(self, name: str, value: float, **labels):
+        """Add one sample to histogram `name` (no-op while disabled)"""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        """Increase counter `name` (no-op while disabled)"""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def action_listener(self, kind: str, seconds: float, error: Optional[Exception]):
+        """For ActionRunner.listeners: time every action and count its failures"""
+        if not self.enabled:
+            return
+        self.observe('action_seconds', seconds, type=kind)
+        if error is not None:
+            self.inc('action_failures_total', type=kind)
+
+    def prometheus(self) -> str:
+        """Everything recorded so far in the Prometheus text exposition format"""
+        with self._lock:
+            histograms = {key: (list(h.counts), h.sum, h.count, h.buckets) for key, h in self._histograms.items()}
+            counters = dict(self._counters)
+        lines: List[str] = []
+        described = set()
+
+        def describe(name):
+            if name not in described:
+                described.add(name)
+                kind, text = DEFINITIONS.get(name, ('untyped', name))
+                lines.append(f"# HELP {name} {text}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), (counts, total, count, buckets) in sorted(histograms.items()):
+            describe(name)
+            cumulative = 0
+            for bound, bucket_count in zip(buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float('inf') else repr(bound)
+                lines.append(f"{name}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {total!r}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+        for (name, labels), value in sorted(counters.items()):
+            describe(name)
+            lines.append(f"{name}{_labels(labels)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self) -> Dict:
+        """Summary per metric: count, sum, mean and p50/p95/p99 for histograms, value for counters"""
+        with self._lock:
+            result = {'time': time.time(), 'histograms': {}, 'counters': {}}
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                summary = {'count': histogram.count, 'sum': histogram.sum,
+                           'mean': histogram.sum / histogram.count if histogram.count else 0.0}
+                for q in (0.5, 0.95, 0.99):
+                    bound = histogram.quantile(q)
+                    summary[f"p{round(q * 100)}"] = bound if bound != float('inf') else None  # beyond the last bucket
+                result['histograms'][name + _labels(labels)] = summary
+            for (name, labels), value in sorted(self._counters.items()):
+                result['counters'][name + _labels(labels)] = value
+        return result
+
+    def start_dump(self, path: str, interval: float = 60.0):
+        """Enable metrics and write `to_dict()` to `path` every `interval` seconds (and on stop)"""
+        self.enable()
+        self._dump_stop.clear()
+
+        def run():
+            while not self._dump_stop.wait(interval):
+                self.dump(path)
+            self.dump(path)
+
+        self._dump_thread = threading.Thread(target=run, name="metrics-dump", daemon=True)
+        self._dump_thread.start()
+
+    def stop_dump(self):
+        if self._dump_thread is not None:
+            self._dump_stop.set()
+            self._dump_thread.join(timeout=5)
+            self._dump_thread = None
+
+    def dump(self, path: str):
+        try:
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(self.to_dict(), f, indent=2)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"Could not write metrics: {str(e)}")
+
+
+def _labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels) + "}"
+
+
+# The registry every module reports to
+metrics = Metrics()
@@ -0,0 +1,364 @@
+# coding: utf-8
+"""Recurrence rules for alarms that do not simply repeat on a set of weekdays.
+
+Rules are written in the iCalendar (RFC 5545) text form, e.g.
+
+    DTSTART:20261020T073000
+    RRULE:FREQ=MONTHLY;BYMONTHDAY=1,-1
+    EXDATE:20261231
+
+Supported: one-shot alarms (DTSTART without RRULE), FREQ=MINUTELY/HOURLY/DAILY with
+INTERVAL, COUNT and UNTIL, FREQ=WEEKLY with BYDAY and INTERVAL, FREQ=MONTHLY with
+BYMONTHDAY (negative days count from the end of the month) and INTERVAL, and EXDATE
+exclusions (a date excludes the whole day, a date-time one occurrence). Any other RRULE
+part (BYHOUR, BYSETPOS, ordinal BYDAY such as 1MO, ...) is rejected rather than ignored,
+so a rule never quietly rings on a different schedule than it says.
+
+Times are floating wall-clock times in the alarm's zone. A UTC time (ending in Z) is
+converted to the system time zone; imports first convert them to the event's own zone
+with `localize_utc()`.
+
+Every rule computes its next occurrence arithmetically from the previous one, without
+expanding the series. Rules are immutable and parsed rules are shared, so thousands of
+alarms with the same rule cost one parse.
+"""
+
+import bisect
+import datetime
+import functools
+import re
+from typing import FrozenSet, Optional, Tuple
+
+# iCalendar weekday codes in datetime.weekday() order
+DAY_CODES = ['MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU']
+DAY_ABBREVIATIONS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+# Give up looking for a non-excluded occurrence after this many candidates
+MAX_SKIPS = 10000
+
+# RRULE parts understood for each FREQ (besides FREQ itself); anything else raises ValueError
+RULE_PARTS = {
+    'MINUTELY': {'INTERVAL', 'COUNT', 'UNTIL', 'WKST'},
+    'HOURLY': {'INTERVAL', 'COUNT', 'UNTIL', 'WKST'},
+    'DAILY': {'INTERVAL', 'COUNT', 'UNTIL', 'WKST', 'BYDAY'},  # BYDAY only with INTERVAL=1 (i.e. weekly)
+    'WEEKLY': {'INTERVAL', 'UNTIL', 'WKST', 'BYDAY'},
+    'MONTHLY': {'INTERVAL', 'UNTIL', 'WKST', 'BYMONTHDAY'},
+}
+
+
+class Recurrence:
+    """Base class: a rule starting at `start`, ending after `until`, minus the `exclude` set"""
+
+    def __init__(self, text: str, start: datetime.datetime, until: Optional[datetime.datetime] = None,
+                 exclude_dates: FrozenSet[datetime.date] = frozenset(),
+                 exclude_times: FrozenSet[datetime.datetime] = frozenset()):
+        self.text = text  # the source text, written back to alarms.json as is
+        self.start = start
+        self.until = until
+        self.exclude_dates = exclude_dates
+        self.exclude_times = exclude_times
+
+    @property
+    def hour(self) -> int:
+        return self.start.hour
+
+    @property
+    def minute(self) -> int:
+        return self.start.minute
+
+    @property
+    def days_mask(self) -> int:
+        """Weekdays the rule is tied to (bit 0 = Monday); 0 if it is not a weekday rule"""
+        return 0
+
+    def next_after(self, after: datetime.datetime) -> Optional[datetime.datetime]:
+        """First occurrence strictly after `after`, or None when the rule has ended"""
+        when = self._next(after)
+        skipped = 0
+        while when is not None and (when.date() in self.exclude_dates or when in self.exclude_times):
+            skipped += 1
+            if skipped > MAX_SKIPS:
+                return None
+            when = self._next(when)
+        if when is not None and self.until is not None and when > self.until:
+            return None
+        return when
+
+    def describe(self) -> str:
+        """Short human-readable summary, for alarm cards"""
+        text = self._describe()
+        excluded = len(self.exclude_dates) + len(self.exclude_times)
+        if excluded:
+            text += f" (except {excluded} date{'s' if excluded != 1 else ''})"
+        if self.until is not None:
+            text += f", until {self.until:%Y-%m-%d}"
+        return text
+
+    def _next(self, after: datetime.datetime) -> Optional[datetime.datetime]:
+        raise NotImplementedError
+
+    def _describe(self) -> str:
+        raise NotImplementedError
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.text!r})"
+
+
+class Once(Recurrence):
+    """A single occurrence at `start`"""
+
+    def _next(self, after):
+        return self.start if self.start > after else None
+
+    def _describe(self):
+        return f"Once on {self.start:%a %d %b %Y}"
+
+
+class Every(Recurrence):
+    """Every `step` from `start` (FREQ=MINUTELY, HOURLY or DAILY), at most `count` times"""
+
+    def __init__(self, text, start, step: datetime.timedelta, count: Optional[int] = None, **kwargs):
+        super().__init__(text, start, **kwargs)
+        self.step = step
+        self.count = count
+
+    def _next(self, after):
+        if after < self.start:
+            index = 0
+        else:
+            index = (after - self.start) // self.step + 1  # occurrences are start + index * step
+        if self.count is not None and index >= self.count:
+            return None
+        return self.start + index * self.step
+
+    def _describe(self):
+        minutes = int(self.step.total_seconds() // 60)
+        if minutes % MINUTES_PER_DAY == 0:
+            amount, unit = minutes // MINUTES_PER_DAY, "day"
+        elif minutes % 60 == 0:
+            amount, unit = minutes // 60, "hour"
+        else:
+            amount, unit = minutes, "minute"
+        return f"Every {unit}" if amount == 1 else f"Every {amount} {unit}s"
+
+
+class Weekly(Recurrence):
+    """On the weekdays in `weekdays_mask`, every `interval` weeks counted from the week of `start`"""
+
+    def __init__(self, text, start, weekdays_mask: int, interval: int = 1, **kwargs):
+        super().__init__(text, start, **kwargs)
+        self.weekdays_mask = weekdays_mask
+        self.interval = interval
+        minute_of_day = start.hour * 60 + start.minute
+        self.week_minutes = tuple(day * MINUTES_PER_DAY + minute_of_day for day in range(7) if weekdays_mask >> day & 1)
+        self.first_monday = start.date() - datetime.timedelta(days=start.weekday())
+
+    @property
+    def days_mask(self):
+        return self.weekdays_mask
+
+    def _next(self, after):
+        if after < self.start:
+            after = self.start - datetime.timedelta(microseconds=1)
+        now_minute = after.weekday() * MINUTES_PER_DAY + after.hour * 60 + after.minute
+        position = bisect.bisect_right(self.week_minutes, now_minute)
+        if position < len(self.week_minutes):
+            delta = self.week_minutes[position] - now_minute
+        else:
+            delta = self.week_minutes[0] + MINUTES_PER_WEEK - now_minute
+        when = after.replace(second=0, microsecond=0) + datetime.timedelta(minutes=delta)
+
+        # With INTERVAL > 1, move to the first occurrence of the next week that is in the series
+        week = (when.date() - self.first_monday).days // 7
+        if week % self.interval:
+            week += self.interval - week % self.interval
+            monday = self.first_monday + datetime.timedelta(weeks=week)
+            first_day = self.week_minutes[0] // MINUTES_PER_DAY
+            when = datetime.datetime.combine(monday + datetime.timedelta(days=first_day), self.start.time())
+        return when
+
+    def _describe(self):
+        days = ", ".join(DAY_ABBREVIATIONS[day] for day in range(7) if self.weekdays_mask >> day & 1)
+        return f"Weekly on {days}" if self.interval == 1 else f"Every {self.interval} weeks on {days}"
+
+
+class Monthly(Recurrence):
+    """On the given days of the month (negative: from the end), every `interval` months"""
+
+    def __init__(self, text, start, month_days: Tuple[int, ...], interval: int = 1, **kwargs):
+        super().__init__(text, start, **kwargs)
+        self.month_days = month_days
+        self.interval = interval
+
+    def _next(self, after):
+        if after < self.start:
+            after = self.start - datetime.timedelta(microseconds=1)
+        # Months since the start month; step to the first one of the series not before `after`
+        month = (after.year - self.start.year) * 12 + after.month - self.start.month
+        month += -month % self.interval
+        for _ in range(400):  # e.g. BYMONTHDAY=31 is skipped in short months
+            year, month_index = divmod(self.start.month - 1 + month, 12)
+            year += self.start.year
+            days_in_month = _days_in_month(year, month_index + 1)
+            days = sorted({day if day > 0 else days_in_month + day + 1 for day in self.month_days
+                           if 1 <= (day if day > 0 else days_in_month + day + 1) <= days_in_month})
+            for day in days:
+                when = datetime.datetime(year, month_index + 1, day, self.start.hour, self.start.minute)
+                if when > after:
+                    return when
+            month += self.interval
+        return None
+
+    def _describe(self):
+        days = ", ".join(str(day) if day > 0 else ("last day" if day == -1 else f"{_ordinal(-day)} last day")
+                         for day in self.month_days)
+        every = "Monthly" if self.interval == 1 else f"Every {self.interval} months"
+        return f"{every} on day {days}"
+
+
+def _ordinal(number: int) -> str:
+    suffix = 'th' if 10 <= number % 100 <= 20 else {1: 'st', 2: 'nd', 3: 'rd'}.get(number % 10, 'th')
+    return f"{number}{suffix}"
+
+
+def _days_in_month(year: int, month: int) -> int:
+    following = datetime.date(year + month // 12, month % 12 + 1, 1)
+    return (following - datetime.timedelta(days=1)).day
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_rule(text: str) -> Recurrence:
+    """Parse DTSTART/RRULE/EXDATE lines into a rule; raises ValueError for anything unsupported"""
+    start = None
+    rrule = {}
+    exclude_dates, exclude_times = set(), set()
+    for line in text.replace('\r', '').split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+        name, _, value = line.partition(':')
+        name = name.split(';', 1)[0].upper()  # parameters such as TZID are not used here
+        if name == 'DTSTART':
+            start = _parse_time(value)
+            if not isinstance(start, datetime.datetime):
+                raise ValueError("DTSTART needs a time of day")
+        elif name == 'RRULE':
+            rrule = _rule_parts(value)
+        elif name == 'EXDATE':
+            for item in value.split(','):
+                excluded = _parse_time(item)
+                if isinstance(excluded, datetime.datetime):
+                    exclude_times.add(excluded)
+                else:
+                    exclude_dates.add(excluded)
+        else:
+            raise ValueError(f"unsupported rule line: {line}")
+    if start is None:
+        raise ValueError("rule has no DTSTART")
+
+    start = start.replace(second=0, microsecond=0)
+    kwargs = {'exclude_dates': frozenset(exclude_dates), 'exclude_times': frozenset(exclude_times)}
+    if 'UNTIL' in rrule:
+        until = _parse_time(rrule['UNTIL'])
+        if not isinstance(until, datetime.datetime):
+            until = datetime.datetime.combine(until, datetime.time(23, 59, 59))
+        kwargs['until'] = until
+    if not rrule:
+        return Once(text, start, **kwargs)
+
+    frequency = rrule.get('FREQ')
+    if frequency not in RULE_PARTS:
+        raise ValueError(f"unsupported FREQ: {frequency}")
+    unsupported = sorted(set(rrule) - RULE_PARTS[frequency] - {'FREQ'})
+    if unsupported:
+        raise ValueError(f"unsupported in a FREQ={frequency} rule: {', '.join(unsupported)}")
+    interval = _positive_int(rrule.get('INTERVAL', '1'), 'INTERVAL')
+    count = _positive_int(rrule['COUNT'], 'COUNT') if 'COUNT' in rrule else None
+    if count is not None and 'UNTIL' in rrule:
+        raise ValueError("a rule may have COUNT or UNTIL, not both")
+    if rrule.get('WKST', 'MO') not in DAY_CODES:
+        raise ValueError(f"invalid WKST: {rrule['WKST']}")
+    if frequency == 'WEEKLY' and interval > 1 and rrule.get('WKST', 'MO') != 'MO':
+        raise ValueError("weeks start on Monday here (WKST=MO) when INTERVAL is more than 1")
+    byday = rrule.get('BYDAY')
+    if frequency == 'DAILY' and byday:
+        if interval != 1:
+            raise ValueError("FREQ=DAILY with BYDAY needs INTERVAL=1 (use FREQ=WEEKLY)")
+        frequency = 'WEEKLY'  # daily on some weekdays is the same as weekly on them
+    if count is not None and frequency not in ('MINUTELY', 'HOURLY', 'DAILY'):
+        raise ValueError("COUNT is only supported with FREQ=MINUTELY, HOURLY or DAILY")
+
+    if frequency in ('MINUTELY', 'HOURLY', 'DAILY'):
+        unit = {'MINUTELY': datetime.timedelta(minutes=1), 'HOURLY': datetime.timedelta(hours=1),
+                'DAILY': datetime.timedelta(days=1)}[frequency]
+        return Every(text, start, unit * interval, count, **kwargs)
+    if frequency == 'WEEKLY':
+        mask = 0
+        for code in (byday.split(',') if byday else [DAY_CODES[start.weekday()]]):
+            if code not in DAY_CODES:  # also refuses ordinals like 1MO, which only mean something monthly
+                raise ValueError(f"invalid BYDAY: {byday}")
+            mask |= 1 << DAY_CODES.index(code)
+        return Weekly(text, start, mask, interval, **kwargs)
+    if frequency == 'MONTHLY':
+        days = rrule.get('BYMONTHDAY', str(start.day)).split(',')
+        try:
+            month_days = tuple(int(day) for day in days)
+        except ValueError:
+            raise ValueError(f"invalid BYMONTHDAY: {rrule['BYMONTHDAY']}")
+        if any(day == 0 or not -31 <= day <= 31 for day in month_days):
+            raise ValueError(f"invalid BYMONTHDAY: {rrule['BYMONTHDAY']}")
+        return Monthly(text, start, month_days, interval, **kwargs)
+    raise ValueError(f"unsupported FREQ: {frequency}")
+
+
+def localize_utc(text: str, zone: Optional[datetime.tzinfo]) -> str:
+    """`text` with its UTC times (UNTIL, EXDATE, DTSTART ending in Z) as wall times in `zone` (None: system)"""
+    def convert(match):
+        return f"{_parse_time(match.group(0), zone):%Y%m%dT%H%M%S}"
+    return _UTC_TIME.sub(convert, text)
+
+
+def _rule_parts(value: str):
+    parts = {}
+    for part in value.upper().split(';'):
+        if not part.strip():
+            continue
+        name, equals, setting = part.partition('=')
+        name = name.strip()
+        if not equals or not setting.strip():
+            raise ValueError(f"invalid RRULE part: {part}")
+        if name in parts:
+            raise ValueError(f"RRULE has {name} twice")
+        parts[name] = setting.strip()
+    return parts
+
+
+_UTC_TIME = re.compile(r'\b\d{8}T\d{6}Z', re.IGNORECASE)
+
+
+def _parse_time(value: str, zone: Optional[datetime.tzinfo] = None):
+    # 20261020T073000 -> datetime, 20261020 -> date; a UTC time (20261020T063000Z) becomes the wall
+    # time at that instant in `zone` (None: the system time zone)
+    value = value.strip()
+    utc = value[-1:] in ('Z', 'z')
+    value = value.rstrip('Zz')
+    try:
+        if 'T' in value:
+            wall = datetime.datetime.strptime(value[:15].ljust(15, '0'), "%Y%m%dT%H%M%S")
+            if utc:
+                wall = wall.replace(tzinfo=datetime.timezone.utc).astimezone(zone).replace(tzinfo=None)
+            return wall
+        if utc:
+            raise ValueError
+        return datetime.datetime.strptime(value, "%Y%m%d").date()
+    except ValueError:
+        raise ValueError(f"invalid date: {value}")
+
+
+def _positive_int(value: str, name: str) -> int:
+    if not value.isdigit() or int(value) < 1:
+        raise ValueError(f"{name} must be a positive number")
+    return int(value)
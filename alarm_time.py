@@ -0,0 +1,204 @@
+# coding: utf-8
+"""Time zone handling: turning an alarm's wall-clock occurrences into absolute instants.
+
+Alarms ring at a local wall-clock time, either in the system time zone or in the IANA
+zone named by the alarm (`AlarmRecord.timezone`, e.g. "Africa/Accra"). The scheduler works
+with instants (epoch seconds, i.e. UTC), so a DST change or a zone difference never makes
+an alarm ring twice or not at all, and nothing has to be re-checked every second.
+
+Two local times need a policy:
+
+* Nonexistent times (the clock jumps from 02:00 to 03:00, so 02:30 never happens):
+  'shift' rings 02:30 + the gap length, i.e. at 03:30; 'skip' drops that occurrence.
+* Ambiguous times (the clock goes back from 03:00 to 02:00, so 02:30 happens twice):
+  'first' rings at the first 02:30, 'last' at the second. Never both.
+
+The next UTC offset change of every zone in use is found once and cached, so computing
+fire times in bulk is plain arithmetic until that change; only occurrences beyond it go
+through the slower, policy-aware conversion.
+"""
+
+import datetime
+import functools
+import math
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    import zoneinfo
+except ImportError:  # Python < 3.9: only the system time zone is available
+    zoneinfo = None
+
+NONEXISTENT_POLICIES = ('shift', 'skip')
+AMBIGUOUS_POLICIES = ('first', 'last')
+
+# Defaults used by the scheduler and the stores
+NONEXISTENT_POLICY = 'shift'
+AMBIGUOUS_POLICY = 'first'
+
+# Give up looking for an occurrence the policies accept after this many candidates
+MAX_CANDIDATES = 1000
+
+# How far ahead to look for a zone's next offset change, and how finely
+TRANSITION_HORIZON = 400 * 86400
+TRANSITION_PROBE = 86400
+
+EPOCH = datetime.datetime(1970, 1, 1)
+
+# zone name -> (searched from, transition instant or None, offset before, offset after)
+_transitions: Dict[Optional[str], Tuple[float, Optional[float], float, float]] = {}
+
+
+@functools.lru_cache(maxsize=None)
+def get_zone(name: Optional[str]) -> Optional[datetime.tzinfo]:
+    """The tzinfo for an IANA zone name, or None for the system time zone.
+
+    Raises ValueError for unknown names. ZoneInfo objects carry the zone's transition table,
+    so caching them here means each zone file is read and parsed only once.
+    """
+    if not name:
+        return None
+    if zoneinfo is None:
+        raise ValueError("time zones need Python 3.9+ (zoneinfo)")
+    try:
+        return zoneinfo.ZoneInfo(name)
+    except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"unknown time zone: {name}")
+
+
+def local_wall_time(instant: float, zone: Optional[datetime.tzinfo]) -> datetime.datetime:
+    """The naive wall-clock time at `instant` in `zone` (None: system zone); `fold` is kept"""
+    if zone is None:
+        return datetime.datetime.fromtimestamp(instant)
+    return datetime.datetime.fromtimestamp(instant, zone).replace(tzinfo=None)
+
+
+def to_instant(wall: datetime.datetime, zone: Optional[datetime.tzinfo],
+               nonexistent: str = NONEXISTENT_POLICY, ambiguous: str = AMBIGUOUS_POLICY) -> Optional[float]:
+    """The instant of naive wall-clock time `wall` in `zone`, or None if the policy skips it"""
+    first = _timestamp(wall.replace(fold=0), zone)
+    second = _timestamp(wall.replace(fold=1), zone)
+    if first == second:
+        return first  # the usual case: the local time exists exactly once
+
+    if local_wall_time(first, zone).replace(fold=0) == wall.replace(fold=0):
+        # Both instants show this wall time: it happens twice
+        return min(first, second) if ambiguous == 'first' else max(first, second)
+
+    # Neither instant shows this wall time: it falls in a gap. fold=0 reads it with the offset
+    # from before the jump, which lands the gap length later
+    return first if nonexistent == 'shift' else None
+
+
+def utc_offset(instant: float, zone: Optional[datetime.tzinfo]) -> float:
+    """The zone's UTC offset in seconds at `instant`"""
+    if zone is None:
+        return datetime.datetime.fromtimestamp(instant).astimezone().utcoffset().total_seconds()
+    return datetime.datetime.fromtimestamp(instant, zone).utcoffset().total_seconds()
+
+
+def next_transition(zone_name: Optional[str], after: float) -> Tuple[Optional[float], float, float]:
+    """(instant, offset before, offset after) of the zone's first offset change after `after`.
+
+    The instant is None when there is no change within TRANSITION_HORIZON. Results are
+    cached per zone and reused for every `after` before the transition.
+    """
+    cached = _transitions.get(zone_name)
+    if cached is not None:
+        searched_from, transition, before, following = cached
+        limit = transition if transition is not None else searched_from + TRANSITION_HORIZON
+        if searched_from <= after < limit:
+            return transition, before, following
+
+    zone = get_zone(zone_name)
+    before = utc_offset(after, zone)
+    transition, following = None, before
+    low = after
+    while low < after + TRANSITION_HORIZON:
+        high = low + TRANSITION_PROBE
+        if utc_offset(high, zone) != before:
+            while high - low > 1:  # bisect to the second
+                middle = (low + high) / 2
+                if utc_offset(middle, zone) == before:
+                    low = middle
+                else:
+                    high = middle
+            if utc_offset(math.floor(high), zone) != before:
+                high = math.floor(high)  # offsets change on whole seconds
+            transition, following = high, utc_offset(high, zone)
+            break
+        low = high
+    _transitions[zone_name] = (after, transition, before, following)
+    return transition, before, following
+
+
+def _timestamp(wall: datetime.datetime, zone: Optional[datetime.tzinfo]) -> float:
+    # Naive datetimes are read in the system zone (honouring fold), aware ones in their own
+    return wall.timestamp() if zone is None else wall.replace(tzinfo=zone).timestamp()
+
+
+def next_instant(next_wall: Callable[[datetime.datetime], Optional[datetime.datetime]],
+                 zone: Optional[datetime.tzinfo], after: float,
+                 nonexistent: str = NONEXISTENT_POLICY, ambiguous: str = AMBIGUOUS_POLICY,
+                 after_wall: Optional[datetime.datetime] = None) -> Optional[float]:
+    """First instant strictly after `after` at which a wall-clock schedule rings.
+
+    `next_wall(t)` must return the schedule's first naive wall time strictly after `t`.
+    `after_wall` may pass in `local_wall_time(after, zone)` when it is already known.
+    """
+    wall = next_wall(after_wall if after_wall is not None else local_wall_time(after, zone))
+    for _ in range(MAX_CANDIDATES):
+        if wall is None:
+            return None
+        instant = to_instant(wall, zone, nonexistent, ambiguous)
+        # An ambiguous time whose chosen instant already passed (we are in the repeated hour)
+        # was handled the first time round; so was a skipped nonexistent one
+        if instant is not None and instant > after:
+            return instant
+        wall = next_wall(wall)
+    return None
+
+
+class ZoneClock:
+    """One instant seen from every zone, for bulk recomputation.
+
+    Rescheduling thousands of alarms converts the same `now` into each zone's local time;
+    this does that once per zone instead of once per alarm. Until the zone's next offset
+    change the offset is fixed, so `to_instant` is a subtraction for wall times before it.
+    """
+
+    def __init__(self, instant: float):
+        self.instant = instant
+        self._walls: Dict[Optional[str], tuple] = {}
+
+    def wall(self, zone_name: Optional[str]) -> Tuple[Optional[datetime.tzinfo], datetime.datetime]:
+        """(tzinfo, naive local time at this clock's instant) for a zone name"""
+        return self._zone(zone_name)[:2]
+
+    def to_instant(self, zone_name: Optional[str], wall: datetime.datetime) -> Optional[float]:
+        """Instant of a wall time after this clock's, or None if it is past the next offset change"""
+        _, now_wall, limit, offset = self._zone(zone_name)
+        if wall <= now_wall or (limit is not None and wall >= limit):
+            return None
+        return (wall - EPOCH).total_seconds() - offset
+
+    def _zone(self, zone_name):
+        cached = self._walls.get(zone_name)
+        if cached is None:
+            zone = get_zone(zone_name)
+            now_wall = local_wall_time(self.instant, zone)
+            transition, before, following = next_transition(zone_name, self.instant)
+            limit = None
+            if transition is not None:
+                # Wall times from here on may be skipped or repeated: the first of the gap or the repeat
+                offset = min(before, following)
+                limit = now_wall + datetime.timedelta(seconds=transition + offset - self.instant - before)
+            cached = self._walls[zone_name] = (zone, now_wall.replace(fold=0), limit, before)
+        return cached
+
+
+def zone_names() -> List[str]:
+    """Sorted IANA zone names available on this system (empty without zoneinfo)"""
+    if zoneinfo is None:
+        return []
+    return sorted(zoneinfo.available_timezones())
+
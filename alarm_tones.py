@@ -0,0 +1,114 @@
+# coding: utf-8
+"""In-memory tone synthesis for alarm sounds.
+
+Tones are generated as NumPy arrays and handed to `pygame.mixer.Sound(buffer=...)`
+directly, so nothing is written to (or read back from) disk when an alarm fires.
+Results are memoized, so each distinct tone is only ever synthesized once.
+"""
+
+import functools
+from typing import Tuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; without it there are no synthesized tones
+    np = None
+
+# Sound paths starting with this prefix name a pattern below instead of a file
+TONE_PREFIX = "tone:"
+
+WAVEFORMS = ('sine', 'square', 'triangle', 'sawtooth')
+
+# A pattern is a tuple of (frequency, duration, volume, waveform) steps; frequency 0 is a pause
+Step = Tuple[float, float, float, str]
+
+
+def _escalating_beeps(rounds: int = 4, beeps: int = 3) -> Tuple[Step, ...]:
+    """Short beep bursts that get louder each round"""
+    steps = []
+    for round_number in range(rounds):
+        volume = (round_number + 1) / rounds
+        for _ in range(beeps):
+            steps.append((880.0, 0.12, volume, 'square'))
+            steps.append((0.0, 0.08, 0.0, 'sine'))
+        steps.append((0.0, 0.4, 0.0, 'sine'))
+    return tuple(steps)
+
+
+PATTERNS = {
+    'beep': ((440.0, 2.0, 1.0, 'sine'),),  # the classic default alarm beep
+    'escalating': _escalating_beeps(),
+    'chime': ((660.0, 0.3, 0.8, 'triangle'), (880.0, 0.3, 0.8, 'triangle'), (990.0, 0.6, 0.8, 'triangle'),
+              (0.0, 0.5, 0.0, 'sine')),
+}
+
+
+def available() -> bool:
+    return np is not None
+
+
+@functools.lru_cache(maxsize=128)
+def tone(frequency: float, duration: float, volume: float = 1.0, waveform: str = 'sine',
+         sample_rate: int = 44100):
+    """Return mono samples in [-1, 1] for one tone (read-only, shared between callers)"""
+    count = int(sample_rate * duration)
+    if frequency <= 0 or volume <= 0:
+        samples = np.zeros(count, dtype=np.float32)
+    else:
+        phase = frequency * np.arange(count, dtype=np.float64) / sample_rate
+        if waveform == 'sine':
+            samples = np.sin(2 * np.pi * phase)
+        elif waveform == 'square':
+            samples = np.where((phase % 1.0) < 0.5, 1.0, -1.0)
+        elif waveform == 'triangle':
+            samples = 2 * np.abs(2 * (phase % 1.0) - 1) - 1
+        elif waveform == 'sawtooth':
+            samples = 2 * (phase % 1.0) - 1
+        else:
+            raise ValueError(f"Unknown waveform: {waveform}")
+
+        # 5 ms fade in/out so the tone does not click when it starts and stops
+        fade = min(count // 2, int(sample_rate * 0.005))
+        if fade:
+            ramp = np.linspace(0.0, 1.0, fade)
+            samples[:fade] *= ramp
+            samples[-fade:] *= ramp[::-1]
+        samples = (samples * volume).astype(np.float32)
+
+    samples.flags.writeable = False
+    return samples
+
+
+@functools.lru_cache(maxsize=32)
+def render(steps: Tuple[Step, ...], sample_rate: int = 44100):
+    """Concatenate the tones of a pattern into one mono sample array"""
+    samples = np.concatenate([tone(*step, sample_rate=sample_rate) for step in steps])
+    samples.flags.writeable = False
+    return samples
+
+
+def to_buffer(samples, size: int = -16, channels: int = 2) -> bytes:
+    """Convert [-1, 1] float samples to raw bytes in the mixer's sample format"""
+    if size == -16:
+        data = (samples * 32767).astype(np.int16)
+    elif size == 16:
+        data = ((samples + 1) * 32767.5).astype(np.uint16)
+    elif size == -8:
+        data = (samples * 127).astype(np.int8)
+    elif size == 8:
+        data = ((samples + 1) * 127.5).astype(np.uint8)
+    elif size == 32:
+        data = samples.astype(np.float32)
+    else:
+        raise ValueError(f"Unsupported mixer sample size: {size}")
+
+    if channels > 1:
+        data = np.repeat(data, channels)  # interleave the same sample on every channel
+    return data.tobytes()
+
+
+def make_sound(pygame_module, pattern: str = 'beep'):
+    """Build a pygame Sound for a named pattern, matching the initialized mixer's format"""
+    frequency, size, channels = pygame_module.mixer.get_init()
+    samples = render(PATTERNS[pattern], frequency)
+    return pygame_module.mixer.Sound(buffer=to_buffer(samples, size, channels))
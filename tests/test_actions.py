@@ -0,0 +1,116 @@
+# coding: utf-8
+"""Alarm actions: shell timeouts and local-only webhooks"""
+
+import http.server
+import os
+import threading
+import time
+
+import pytest
+
+from alarm_actions import ActionRunner, validate_actions
+from alarm_engine import AlarmFiring, AlarmRecord
+
+
+@pytest.fixture
+def runner():
+    runner = ActionRunner()
+    yield runner
+    runner.close()
+
+
+def firing():
+    return AlarmFiring(1, AlarmRecord(1, 7, 0, "Lights", 0b1111111), time.time())
+
+
+def run(runner, action):
+    """Run one action on this thread; (stats of its type, how long it took)"""
+    started = time.monotonic()
+    runner._run_one(firing(), action, started, pooled=False)
+    return runner.stats()[action['type']], time.monotonic() - started
+
+
+def alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+def test_shell_action_gets_the_alarm_in_its_environment(runner, tmp_path):
+    out = tmp_path / "out"
+    stats, _ = run(runner, {'type': "shell", 'command': f'echo "$ALARM_LABEL $ALARM_TIME" > {out}'})
+    assert stats['failures'] == 0 and out.read_text() == "Lights 07:00\n"
+
+
+def test_failing_shell_action_is_counted(runner):
+    stats, _ = run(runner, {'type': "shell", 'command': "echo broken >&2; exit 3"})
+    assert stats['failures'] == 1 and stats['timeouts'] == 0
+
+
+@pytest.mark.skipif(not hasattr(os, 'killpg'), reason="process groups are POSIX only")
+def test_shell_timeout_kills_everything_the_command_started(runner, tmp_path):
+    pid_file = tmp_path / "pid"
+    stats, seconds = run(runner, {'type': "shell", 'command': f"sleep 30 & echo $! > {pid_file}; wait",
+                                  'timeout': 0.5})
+    assert stats['timeouts'] == 1 and seconds < 5
+    pid = int(pid_file.read_text())
+    deadline = time.monotonic() + 5
+    while alive(pid) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not alive(pid)
+
+
+class Recorder(http.server.BaseHTTPRequestHandler):
+    """POST handler that records the path, and redirects when the server has a `redirect_to`"""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        self.server.hits.append(self.path)
+        if self.server.redirect_to:
+            self.send_response(307)
+            self.send_header('Location', self.server.redirect_to)
+        else:
+            self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    servers = []
+
+    def start(redirect_to=None):
+        server = http.server.HTTPServer(('127.0.0.1', 0), Recorder)
+        server.hits, server.redirect_to = [], redirect_to
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_webhook_posts_to_a_local_endpoint(runner, server):
+    target = server()
+    stats, _ = run(runner, {'type': "webhook", 'url': f"http://127.0.0.1:{target.server_port}/hook"})
+    assert stats['failures'] == 0 and target.hits == ["/hook"]
+
+
+def test_webhook_does_not_follow_redirects(runner, server):
+    elsewhere = server()
+    local = server(redirect_to=f"http://127.0.0.1:{elsewhere.server_port}/stolen")
+    stats, _ = run(runner, {'type': "webhook", 'url': f"http://127.0.0.1:{local.server_port}/hook"})
+    assert stats['failures'] == 1
+    assert local.hits == ["/hook"] and elsewhere.hits == []
+
+
+@pytest.mark.parametrize('url', ["http://example.com/hook", "ftp://127.0.0.1/hook", "http://127.0.0.1.example.com/"])
+def test_webhooks_to_other_hosts_are_invalid(url):
+    with pytest.raises(ValueError, match="webhook url"):
+        validate_actions([{'type': "webhook", 'url': url}])
@@ -0,0 +1,175 @@
+# coding: utf-8
+"""Control API: access checks and input validation"""
+
+import http.client
+import json
+import os
+import stat
+
+import pytest
+
+from alarm_api import API_ACTIONS, AlarmApiServer
+from alarm_engine import AlarmEngine, AlarmRecord, JournalAlarmStore, NullSoundBackend, TimerRegistry
+
+SHELL = [{'type': "shell", 'command': "touch /tmp/pwned"}]
+ALARM = {'hour': 6, 'minute': 30, 'label': "Gym", 'days': ["Mon", "Wed"]}
+
+
+@pytest.fixture
+def api(tmp_path, request):
+    engine = AlarmEngine(JournalAlarmStore(str(tmp_path / "alarms.json")), NullSoundBackend())
+    engine.load()
+    timers = TimerRegistry()
+    allowed = getattr(request, 'param', API_ACTIONS)
+    server = AlarmApiServer(engine, timers, port=0, token_file=str(tmp_path / "token"), allowed_actions=allowed)
+    server.start()
+    yield server
+    server.stop()
+    timers.close()
+    engine.stop()
+
+
+def request(api, method, path, body=None, headers=None, raw=None):
+    """(status, decoded JSON body); `headers` replace the valid defaults, None values drop a header"""
+    sent = {'Host': f"localhost:{api.port}", 'Authorization': f"Bearer {api.token}",
+            'Content-Type': "application/json"}
+    sent.update(headers or {})
+    payload = raw if raw is not None else (json.dumps(body).encode('utf-8') if body is not None else None)
+    connection = http.client.HTTPConnection("127.0.0.1", api.port, timeout=10)
+    try:
+        connection.putrequest(method, path, skip_host=True, skip_accept_encoding=True)
+        for name, value in sent.items():
+            if value is not None:
+                connection.putheader(name, value)
+        if payload is not None and 'Content-Length' not in sent:
+            connection.putheader('Content-Length', str(len(payload)))
+        connection.endheaders(payload)
+        response = connection.getresponse()
+        data = response.read()
+        return response.status, json.loads(data) if data else None
+    finally:
+        connection.close()
+
+
+def test_token_file_is_private(api):
+    assert stat.S_IMODE(os.stat(api.token_file).st_mode) == 0o600
+    with open(api.token_file) as f:
+        assert f.read().strip() == api.token
+
+
+def test_valid_request_is_served(api):
+    status, alarm = request(api, 'POST', "/alarms", ALARM)
+    assert status == 201
+    assert request(api, 'GET', f"/alarms/{alarm['id']}") == (200, alarm)
+
+
+@pytest.mark.parametrize('headers, status', [
+    ({'Authorization': None}, 401),
+    ({'Authorization': "Bearer wrong"}, 401),
+    ({'Authorization': "Basic abc"}, 401),
+    ({'Host': "evil.example"}, 403),
+    ({'Host': None}, 403),
+    ({'Origin': "http://evil.example"}, 403),
+    ({'Origin': "null"}, 403),
+    ({'Content-Type': "text/plain"}, 415),
+    ({'Content-Type': None}, 415),
+])
+def test_requests_failing_access_checks_are_refused(api, headers, status):
+    assert request(api, 'POST', "/alarms", ALARM, headers)[0] == status
+    assert request(api, 'GET', "/alarms")[1] == []  # nothing was created
+
+
+def test_local_origin_is_allowed(api):
+    assert request(api, 'POST', "/alarms", ALARM, {'Origin': f"http://127.0.0.1:{api.port}"})[0] == 201
+
+
+@pytest.mark.parametrize('length, status', [("abc", 400), ("-5", 400), (str(10 ** 12), 413)])
+def test_bad_content_length_gets_an_answer(api, length, status):
+    assert request(api, 'POST', "/alarms", headers={'Content-Length': length}, raw=b"{}")[0] == status
+
+
+def test_invalid_json_body(api):
+    assert request(api, 'POST', "/alarms", raw=b"{nope")[0] == 400
+
+
+@pytest.mark.parametrize('changes', [{'hour': 25}, {'days': ["Caturday"]}, {'active': "maybe"}, ["hour"]])
+def test_invalid_changes_are_rejected(api, changes):
+    _, alarm = request(api, 'POST', "/alarms", ALARM)
+    assert request(api, 'PATCH', f"/alarms/{alarm['id']}", changes)[0] == 400
+    assert request(api, 'GET', f"/alarms/{alarm['id']}")[1] == alarm
+
+
+def test_unknown_fields_are_listed(api):
+    _, alarm = request(api, 'POST', "/alarms", ALARM)
+    status, error = request(api, 'PATCH', f"/alarms/{alarm['id']}", {'foo': "bar", 'label': "x"})
+    assert status == 400
+    assert error['unknown'] == ["foo"]
+    assert request(api, 'POST', "/alarms", dict(ALARM, colour="red"))[0] == 400
+
+
+def test_patch_changes_only_the_given_fields(api):
+    _, alarm = request(api, 'POST', "/alarms", ALARM)
+    status, updated = request(api, 'PATCH', f"/alarms/{alarm['id']}", {'active': False, 'minute': 45})
+    assert status == 200
+    assert updated == dict(alarm, active=False, minute=45)
+
+
+def test_missing_alarms_are_404(api):
+    assert request(api, 'PATCH', "/alarms/99", {'label': "x"})[0] == 404
+    assert request(api, 'DELETE', "/alarms/99")[0] == 404
+    assert request(api, 'GET', "/nowhere")[0] == 404
+    assert request(api, 'PUT', "/alarms")[0] == 405
+
+
+def test_update_of_an_alarm_deleted_meanwhile_is_404(api, monkeypatch):
+    _, alarm = request(api, 'POST', "/alarms", ALARM)
+    monkeypatch.setattr(api.engine, 'update_alarm', lambda alarm_id, **fields: None)
+    assert request(api, 'PATCH', f"/alarms/{alarm['id']}", {'label': "x"})[0] == 404
+
+
+def test_bulk_request_is_all_or_nothing(api):
+    _, alarm = request(api, 'POST', "/alarms", ALARM)
+    status, error = request(api, 'POST', "/alarms/bulk", {
+        'add': [ALARM, dict(ALARM, hour=99)],
+        'update': [{'id': alarm['id'], 'label': "changed"}, {'label': "no id"}],
+        'delete': [alarm['id']],
+    })
+    assert status == 400
+    assert len(error['errors']) == 2
+    assert request(api, 'GET', "/alarms")[1] == [alarm]
+
+    status, result = request(api, 'POST', "/alarms/bulk", {
+        'add': [ALARM], 'update': [{'id': alarm['id'], 'label': "changed"}], 'delete': [12345]})
+    assert status == 200
+    assert result['updated'] == [alarm['id']] and result['missing'] == [12345] and len(result['added']) == 1
+
+
+def test_timer_start_needs_positive_seconds(api):
+    assert request(api, 'POST', "/timers/tea/start", {'seconds': -1})[0] == 400
+    assert request(api, 'POST', "/timers/tea/start", {})[0] == 400
+    status, timer = request(api, 'POST', "/timers/tea/start", {'seconds': 60})
+    assert status == 200 and timer['state'] == 'running'
+
+
+@pytest.mark.parametrize('actions', [SHELL, [{'type': "python", 'callable': "os:system"}], ["sound"] + SHELL])
+def test_code_running_actions_are_refused(api, actions):
+    status, error = request(api, 'POST', "/alarms", dict(ALARM, actions=actions))
+    assert status == 403 and "--api-allow-actions" in error['error']
+    assert request(api, 'GET', "/alarms")[1] == []
+
+    _, alarm = request(api, 'POST', "/alarms", dict(ALARM, actions=[{'type': "notify"}]))
+    assert request(api, 'PATCH', f"/alarms/{alarm['id']}", {'actions': actions})[0] == 403
+    assert request(api, 'POST', "/alarms/bulk", {'add': [dict(ALARM, actions=actions)]})[0] == 400
+    assert request(api, 'GET', "/alarms")[1] == [alarm]
+
+
+def test_alarms_with_trusted_actions_can_still_be_changed(api):
+    alarm = api.engine.add_alarm(AlarmRecord(0, 7, 0, "Lights", 0b1111111, actions=SHELL))  # e.g. from alarms.json
+    status, updated = request(api, 'PATCH', f"/alarms/{alarm.id}", {'minute': 15})
+    assert status == 200 and updated['actions'] == SHELL and updated['minute'] == 15
+
+
+@pytest.mark.parametrize('api', [API_ACTIONS + ("shell",)], indirect=True)
+def test_allowed_actions_can_be_opted_into(api):
+    assert request(api, 'POST', "/alarms", dict(ALARM, actions=SHELL))[0] == 201
+    assert request(api, 'POST', "/alarms", dict(ALARM, actions=[{'type': "python", 'callable': "os:system"}]))[0] == 403
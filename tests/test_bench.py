@@ -0,0 +1,33 @@
+# coding: utf-8
+"""Benchmark baselines"""
+
+import json
+
+import pytest
+
+import alarm_bench
+
+
+def test_missing_baseline_says_how_to_record_one(tmp_path):
+    path = str(tmp_path / "baseline.json")
+    with pytest.raises(ValueError, match="--output"):
+        alarm_bench.load_baseline(path)
+
+
+@pytest.mark.parametrize('content', ["{not json", "[1, 2]", '{"meta": {}}', '{"results": {"a": "slow"}}'])
+def test_malformed_baseline_is_refused(tmp_path, content):
+    path = tmp_path / "baseline.json"
+    path.write_text(content)
+    with pytest.raises(ValueError):
+        alarm_bench.load_baseline(str(path))
+
+
+def test_baseline_results_are_loaded(tmp_path):
+    path = tmp_path / "baseline.json"
+    path.write_text(json.dumps({'meta': {}, 'results': {'scheduler.add_x1000[n=10]': 0.002}}))
+    assert alarm_bench.load_baseline(str(path)) == {'scheduler.add_x1000[n=10]': 0.002}
+
+
+def test_compare_flags_only_real_slowdowns(capsys):
+    baseline = {'a': 1.0, 'b': 1.0, 'c': 0.00001}
+    assert alarm_bench.compare({'a': 1.1, 'b': 2.0, 'c': 0.00005}, baseline, 0.25, 0.0001) == ['b']
@@ -0,0 +1,57 @@
+# coding: utf-8
+"""SQLite store: due-alarm queries"""
+
+import datetime
+import sqlite3
+
+import pytest
+
+from alarm_db import SqliteAlarmStore
+from alarm_engine import AlarmRecord
+
+EVERY_DAY = 0b1111111
+
+
+def utc(*args) -> datetime.datetime:
+    return datetime.datetime(*args, tzinfo=datetime.timezone.utc)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SqliteAlarmStore(str(tmp_path / "alarms.db"))
+    yield store
+    store.close()
+
+
+def zoned(alarm_id, hour, minute=0, active=True):
+    return AlarmRecord(alarm_id, hour, minute, f"Alarm {alarm_id}", EVERY_DAY, active=active, timezone="Africa/Accra")
+
+
+def test_due_between_uses_the_next_fire_index(store):
+    store.save([zoned(1, 7)])
+    plan = store._connect().execute("EXPLAIN QUERY PLAN SELECT id FROM alarms WHERE next_fire >= 0 AND next_fire < 1")
+    assert "alarms_next_fire" in " ".join(str(row) for row in plan)
+    assert [row[1] for row in store._connect().execute("PRAGMA index_list(alarms)")] == ["alarms_next_fire"]
+
+
+def test_due_between_is_a_plain_read_when_nothing_has_passed(store, tmp_path):
+    store.save([zoned(1, 7), zoned(2, 9), zoned(3, 8, active=False)])
+    start = datetime.datetime.now(datetime.timezone.utc)
+    other = sqlite3.connect(str(tmp_path / "alarms.db"), isolation_level=None, timeout=0.1)
+    other.execute("BEGIN IMMEDIATE")  # another writer holds the write lock
+    try:
+        due = store.due_between(start, start + datetime.timedelta(days=1))
+    finally:
+        other.execute("ROLLBACK")
+        other.close()
+    assert sorted(alarm.id for alarm in due) == [1, 2]
+
+
+def test_passed_occurrences_are_moved_on(store):
+    store.save([zoned(1, 7), zoned(2, 9)])
+    store._connect().execute("UPDATE alarms SET next_fire = ?", (utc(2000, 1, 1, 7).timestamp(),))
+    start = datetime.datetime.now(datetime.timezone.utc)
+    due = store.due_between(start, start + datetime.timedelta(days=1))
+    assert sorted(alarm.id for alarm in due) == [1, 2]
+    assert store._connect().execute("SELECT COUNT(*) FROM alarms WHERE next_fire < ?",
+                                     (start.timestamp(),)).fetchone()[0] == 0
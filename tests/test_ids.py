@@ -0,0 +1,36 @@
+# coding: utf-8
+"""AlarmEngine ids: unique, and never handed out again once used, in every store"""
+
+import pytest
+
+from alarm_engine import AlarmEngine, AlarmRecord, JsonAlarmStore, NullSoundBackend, open_store
+
+
+@pytest.mark.parametrize('name', ["alarms.json", "alarms.db"])
+@pytest.mark.parametrize('compact', [False, True])
+def test_ids_of_deleted_alarms_are_not_reused_after_a_restart(tmp_path, name, compact):
+    path = str(tmp_path / name)
+    engine = AlarmEngine(open_store(path), NullSoundBackend())
+    engine.load()
+    first, newest = engine.add_alarm(AlarmRecord(0, 6, 0, "Keep", 1)), engine.add_alarm(AlarmRecord(0, 7, 0, "Gone", 1))
+    engine.delete_alarm(newest.id)
+    if compact:
+        engine.save()  # snapshot written; the log with the 'add' record is gone
+    engine.stop()
+
+    engine = AlarmEngine(open_store(path), NullSoundBackend())
+    engine.load()
+    assert [alarm.id for alarm in engine.alarms] == [first.id]
+    assert engine.add_alarm(AlarmRecord(0, 8, 0, "New", 1)).id == newest.id + 1
+    # Nor does an import that brings the retired id get it back
+    assert engine.add_many([AlarmRecord(newest.id, 9, 0, "Restored", 1)])[0].id == newest.id + 2
+    engine.stop()
+
+
+def test_plain_json_store_keeps_the_high_water_mark(tmp_path):
+    path = str(tmp_path / "alarms.json")
+    store = JsonAlarmStore(path)
+    store.save([AlarmRecord(1, 6, 0, "a", 1), AlarmRecord(5, 6, 0, "b", 1)])
+    store.save([AlarmRecord(1, 6, 0, "a", 1)])
+    reloaded = JsonAlarmStore(path)
+    assert len(reloaded.load()) == 1 and reloaded.next_id == 6
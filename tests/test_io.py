@@ -0,0 +1,98 @@
+# coding: utf-8
+"""alarm_io: validation of imported entries and round-trips through every file format"""
+
+import datetime
+
+import pytest
+
+import alarm_io
+from alarm_engine import AlarmRecord
+from alarm_recurrence import parse_rule
+
+
+def entry(**fields):
+    return dict({'hour': 7, 'minute': 30, 'label': "Wake up", 'days': ["Mon", "Fri"]}, **fields)
+
+
+@pytest.mark.parametrize('value, expected', [
+    (True, True), (False, False), (1, True), (0, False),
+    ("true", True), ("FALSE", False), ("yes", True), ("off", False), ("0", False), ("", True),
+])
+def test_active_accepts_booleans_and_their_spellings(value, expected):
+    assert alarm_io.validate(entry(active=value)).active is expected
+
+
+@pytest.mark.parametrize('value', ["maybe", 2, [], None, 0.5])
+def test_active_rejects_anything_else(value):
+    with pytest.raises(ValueError):
+        alarm_io.validate(entry(active=value))
+
+
+def test_active_defaults_to_true():
+    assert alarm_io.validate(entry()).active is True
+
+
+@pytest.mark.parametrize('fields, message', [
+    ({'hour': 24}, "invalid time"),
+    ({'minute': "x"}, "whole numbers"),
+    ({'days': ["Someday"]}, "unknown day"),
+    ({'days': []}, "no days"),
+    ({'label': " "}, "empty label"),
+    ({'timezone': "Mars/Olympus"}, "unknown time zone"),
+    ({'actions': [{'type': "teleport"}]}, "unknown action"),
+])
+def test_invalid_entries_are_rejected(fields, message):
+    with pytest.raises(ValueError, match=message):
+        alarm_io.validate(entry(**fields))
+
+
+@pytest.mark.parametrize('fmt', alarm_io.FORMATS)
+def test_export_and_import_round_trip(tmp_path, fmt):
+    alarms = [
+        AlarmRecord(1, 6, 45, "Gym, early; really", 0b0010101, active=False, sound="Chime"),
+        AlarmRecord(2, 0, 0, "Rule", 0, rule=parse_rule("DTSTART:20261020T073000\nRRULE:FREQ=MONTHLY;BYMONTHDAY=1,-1")),
+        AlarmRecord(3, 22, 5, "Zoned", 0b1111111, timezone="Africa/Accra",
+                    actions=[{'type': "sound"}, {'type': "shell", 'command': "echo a\\nb, c; d", 'timeout': 5}]),
+    ]
+    path = str(tmp_path / f"alarms.{fmt}")
+    assert alarm_io.export_alarms(alarms, path) == len(alarms)
+
+    imported = []
+    count, errors = alarm_io.import_alarms(None, path, add_batch=imported.extend)
+    assert (count, errors) == (len(alarms), [])
+    assert [alarm.to_dict() for alarm in imported] == [alarm.to_dict() for alarm in alarms]
+
+
+def import_ics(tmp_path, *lines):
+    path = tmp_path / "calendar.ics"
+    path.write_text("\r\n".join(["BEGIN:VCALENDAR", "BEGIN:VEVENT", *lines, "END:VEVENT", "END:VCALENDAR", ""]))
+    imported = []
+    count, errors = alarm_io.import_alarms(None, str(path), add_batch=imported.extend)
+    return imported, errors
+
+
+def test_ics_utc_until_is_read_in_the_event_zone(tmp_path):
+    imported, errors = import_ics(tmp_path, "UID:x", "DTSTART;TZID=America/New_York:20261020T073000",
+                                  "RRULE:FREQ=DAILY;UNTIL=20261023T113000Z", "SUMMARY:Walk")
+    assert errors == []
+    assert imported[0].timezone == "America/New_York"
+    assert imported[0].rule.until == datetime.datetime(2026, 10, 23, 7, 30)  # 11:30 UTC is 07:30 EDT
+
+
+@pytest.mark.parametrize('rrule', ["FREQ=DAILY;BYHOUR=9,17", "FREQ=MONTHLY;BYDAY=1MO", "FREQ=WEEKLY;BYDAY=1MO",
+                                   "FREQ=YEARLY", "FREQ=WEEKLY;BYDAY"])
+def test_ics_rules_that_cannot_be_followed_are_errors(tmp_path, rrule):
+    imported, errors = import_ics(tmp_path, "UID:x", "DTSTART:20261020T073000", f"RRULE:{rrule}", "SUMMARY:x")
+    assert imported == [] and len(errors) == 1
+
+
+@pytest.mark.parametrize('fmt', alarm_io.FORMATS)
+def test_failed_export_leaves_no_files(tmp_path, fmt):
+    def alarms():
+        yield AlarmRecord(1, 6, 45, "First", 0b0010101)
+        raise OSError("disk full")
+
+    path = tmp_path / f"alarms.{fmt}"
+    with pytest.raises(OSError, match="disk full"):
+        alarm_io.export_alarms(alarms(), str(path))
+    assert list(tmp_path.iterdir()) == []
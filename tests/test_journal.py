@@ -0,0 +1,166 @@
+# coding: utf-8
+"""JournalAlarmStore: replay, crash recovery and compaction"""
+
+import json
+import os
+import threading
+import time
+
+from alarm_engine import AlarmRecord, JournalAlarmStore
+
+
+def make_alarm(alarm_id, hour=7, minute=0, active=True):
+    return AlarmRecord(alarm_id, hour, minute, f"Alarm {alarm_id}", 0b0011111, active)
+
+
+def snapshot(alarms):
+    return [alarm.to_dict() for alarm in alarms]
+
+
+def wait_for_compaction(store, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while store._compacting and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not store._compacting
+
+
+def test_changes_are_replayed_after_reopening(tmp_path):
+    path = str(tmp_path / "alarms.json")
+    store = JournalAlarmStore(path)
+    alarms = store.load()
+    for alarm_id in (1, 2, 3):
+        alarms.append(make_alarm(alarm_id, hour=alarm_id))
+        store.record_add(alarms, alarms[-1])
+    alarms[1].update(active=False)
+    store.record_update(alarms, alarms[1])
+    deleted = alarms.pop(0)
+    store.record_delete(alarms, deleted)
+    store.close()
+
+    assert not os.path.exists(path)  # nothing but the log was written
+    reopened = JournalAlarmStore(path).load()
+    assert snapshot(reopened) == snapshot(alarms)
+
+
+def test_torn_last_line_is_dropped_and_rewritten(tmp_path):
+    path = str(tmp_path / "alarms.json")
+    store = JournalAlarmStore(path)
+    alarms = [make_alarm(1)]
+    store.load()
+    store.record_add(alarms, alarms[0])
+    store.close()
+    with open(f"{path}.log", 'a') as f:
+        f.write('{"op": "add", "alarm": {"id": 2')  # crash in the middle of an append
+
+    store = JournalAlarmStore(path)
+    assert snapshot(store.load()) == snapshot(alarms)
+    # The log was rewritten, so records written from now on are not hidden behind the torn line
+    alarms.append(make_alarm(2))
+    store.record_add(alarms, alarms[1])
+    store.close()
+    assert snapshot(JournalAlarmStore(path).load()) == snapshot(alarms)
+
+
+def test_records_already_in_the_snapshot_are_not_replayed(tmp_path):
+    path = str(tmp_path / "alarms.json")
+    alarms = [make_alarm(1), make_alarm(2)]
+    store = JournalAlarmStore(path)
+    store.load()
+    store.save(alarms)
+    with open(f"{path}.log", 'w') as f:
+        f.write(json.dumps({'op': 'delete', 'id': 1, 'seq': 1}) + "\n")  # older than the snapshot
+    assert snapshot(JournalAlarmStore(path).load()) == snapshot(alarms)
+
+
+def test_compaction_folds_the_log_into_the_snapshot(tmp_path):
+    path = str(tmp_path / "alarms.json")
+    store = JournalAlarmStore(path, compact_every=10)
+    alarms = store.load()
+    for alarm_id in range(1, 26):
+        alarms.append(make_alarm(alarm_id))
+        store.record_add(alarms, alarms[-1])
+        wait_for_compaction(store)
+    store.close()
+
+    with open(path) as f:
+        data = json.load(f)
+    with open(f"{path}.log") as f:
+        logged = [json.loads(line) for line in f]
+    assert len(logged) < 10
+    assert all(record['seq'] > data['seq'] for record in logged)
+    assert snapshot(JournalAlarmStore(path).load()) == snapshot(alarms)
+
+
+def test_compaction_does_not_touch_the_callers_alarms(tmp_path):
+    path = str(tmp_path / "alarms.json")
+    store = JournalAlarmStore(path, compact_every=1)
+    alarms = store.load()
+    alarms.append(make_alarm(1))
+    store.record_add(alarms, alarms[0])
+    # The snapshot is built from the log records, not from the (since edited) live list
+    alarms[0].label = "edited without a record"
+    wait_for_compaction(store)
+    store.close()
+    assert JournalAlarmStore(path).load()[0].label == "Alarm 1"
+
+
+def test_writes_during_compaction_survive(tmp_path):
+    path = str(tmp_path / "alarms.json")
+    store = JournalAlarmStore(path, compact_every=50)
+    alarms = store.load()
+    for alarm_id in range(1, 501):
+        alarms.append(make_alarm(alarm_id))
+        store.record_add(alarms, alarms[-1])  # compactions start in the background meanwhile
+    for alarm in alarms[::7]:
+        alarm.update(active=False)
+        store.record_update(alarms, alarm)
+    wait_for_compaction(store)
+    store.close()
+    assert snapshot(JournalAlarmStore(path).load()) == snapshot(alarms)
+
+
+def test_save_and_compaction_never_interleave(tmp_path):
+    path = str(tmp_path / "alarms.json")
+    store = JournalAlarmStore(path, compact_every=5)
+    alarms = store.load()
+    errors = []
+
+    def add_alarms(first):
+        try:
+            for alarm_id in range(first, first + 200):
+                alarm = make_alarm(alarm_id)
+                with lock:
+                    alarms.append(alarm)
+                    store.record_add(alarms, alarm)
+        except Exception as e:
+            errors.append(e)
+
+    lock = threading.Lock()  # the engine lock: one change at a time, as in AlarmEngine
+    writer = threading.Thread(target=add_alarms, args=(1,))
+    writer.start()
+    for _ in range(20):
+        with lock:
+            store.save(alarms)
+    writer.join()
+    wait_for_compaction(store)
+    store.close()
+
+    assert not errors
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+    assert snapshot(JournalAlarmStore(path).load()) == snapshot(alarms)
+
+
+def test_store_that_was_never_loaded_can_be_written(tmp_path):
+    path = str(tmp_path / "alarms.json")
+    store = JournalAlarmStore(path)
+    store.load()
+    store.save([make_alarm(1), make_alarm(1)])  # repeated ids: loading has to repair them
+    store.close()
+
+    fresh = JournalAlarmStore(path)
+    alarms = [make_alarm(1), make_alarm(2)]
+    fresh.record_add(alarms, alarms[1])  # must not deadlock reading the existing state
+    fresh.close()
+    loaded = JournalAlarmStore(path).load()
+    assert [alarm.label for alarm in loaded] == ["Alarm 1", "Alarm 1", "Alarm 2"]
+    assert [alarm.id for alarm in loaded] == [1, 2, 3]
@@ -0,0 +1,158 @@
+# coding: utf-8
+"""Recurrence rules (the RRULE subset of alarm_recurrence.py)"""
+
+import datetime
+
+import pytest
+
+from alarm_recurrence import Every, Monthly, Once, Weekly, localize_utc, parse_rule
+
+
+def occurrences(text, after, count=10):
+    rule = parse_rule(text)
+    found = []
+    when = after
+    while len(found) < count:
+        when = rule.next_after(when)
+        if when is None:
+            break
+        found.append(when)
+    return found
+
+
+def dt(*args):
+    return datetime.datetime(*args)
+
+
+def test_rule_types():
+    assert isinstance(parse_rule("DTSTART:20261020T073000"), Once)
+    assert isinstance(parse_rule("DTSTART:20261020T073000\nRRULE:FREQ=HOURLY;INTERVAL=2"), Every)
+    assert isinstance(parse_rule("DTSTART:20261020T073000\nRRULE:FREQ=DAILY;BYDAY=MO,FR"), Weekly)
+    assert isinstance(parse_rule("DTSTART:20261020T073000\nRRULE:FREQ=MONTHLY"), Monthly)
+
+
+def test_once_rings_only_at_its_start():
+    assert occurrences("DTSTART:20261020T073000", dt(2026, 1, 1)) == [dt(2026, 10, 20, 7, 30)]
+    assert occurrences("DTSTART:20261020T073000", dt(2026, 10, 20, 7, 30)) == []
+
+
+def test_occurrences_are_strictly_after():
+    rule = parse_rule("DTSTART:20261020T073000\nRRULE:FREQ=DAILY")
+    assert rule.next_after(dt(2026, 10, 21, 7, 30)) == dt(2026, 10, 22, 7, 30)
+    assert rule.next_after(dt(2026, 10, 21, 7, 29, 59)) == dt(2026, 10, 21, 7, 30)
+
+
+def test_count_limits_the_series():
+    found = occurrences("DTSTART:20261020T073000\nRRULE:FREQ=DAILY;INTERVAL=2;COUNT=3", dt(2026, 1, 1))
+    assert found == [dt(2026, 10, 20, 7, 30), dt(2026, 10, 22, 7, 30), dt(2026, 10, 24, 7, 30)]
+    # Counted from DTSTART, not from the query time
+    assert occurrences("DTSTART:20261020T073000\nRRULE:FREQ=DAILY;COUNT=3", dt(2026, 10, 21, 8)) == \
+        [dt(2026, 10, 22, 7, 30)]
+
+
+@pytest.mark.parametrize('until', ["20261022", "20261022T073000", "20261022T120000Z"])
+def test_until_is_inclusive(until):
+    found = occurrences(f"DTSTART:20261020T073000\nRRULE:FREQ=DAILY;UNTIL={until}", dt(2026, 1, 1))
+    assert found[-1] == dt(2026, 10, 22, 7, 30) and len(found) == 3
+
+
+def test_weekly_interval_counts_weeks_from_the_start():
+    found = occurrences("DTSTART:20261019T060000\nRRULE:FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,TH", dt(2026, 10, 1), 4)
+    assert found == [dt(2026, 10, 19, 6), dt(2026, 10, 22, 6), dt(2026, 11, 2, 6), dt(2026, 11, 5, 6)]
+
+
+def test_weekly_without_byday_uses_the_start_weekday():
+    rule = parse_rule("DTSTART:20261021T060000\nRRULE:FREQ=WEEKLY")
+    assert rule.days_mask == 0b0000100
+    assert rule.next_after(dt(2026, 10, 21, 7)) == dt(2026, 10, 28, 6)
+
+
+def test_last_day_of_month_follows_month_lengths():
+    found = occurrences("DTSTART:20271115T080000\nRRULE:FREQ=MONTHLY;BYMONTHDAY=-1", dt(2027, 11, 1), 5)
+    assert [when.date() for when in found] == [datetime.date(2027, 11, 30), datetime.date(2027, 12, 31),
+                                                datetime.date(2028, 1, 31), datetime.date(2028, 2, 29),
+                                                datetime.date(2028, 3, 31)]
+
+
+def test_first_and_last_day_together():
+    found = occurrences("DTSTART:20261020T073000\nRRULE:FREQ=MONTHLY;BYMONTHDAY=1,-1", dt(2026, 10, 20), 4)
+    assert [when.day for when in found] == [31, 1, 30, 1]
+
+
+def test_day_31_skips_short_months():
+    found = occurrences("DTSTART:20260101T090000\nRRULE:FREQ=MONTHLY;BYMONTHDAY=31", dt(2026, 1, 1), 4)
+    assert [(when.month, when.day) for when in found] == [(1, 31), (3, 31), (5, 31), (7, 31)]
+
+
+def test_monthly_interval():
+    found = occurrences("DTSTART:20261115T090000\nRRULE:FREQ=MONTHLY;INTERVAL=3", dt(2026, 12, 1), 3)
+    assert [(when.year, when.month) for when in found] == [(2027, 2), (2027, 5), (2027, 8)]
+
+
+def test_exdate_excludes_days_and_single_occurrences():
+    text = "DTSTART:20261020T073000\nRRULE:FREQ=DAILY\nEXDATE:20261021,20261023T073000\nEXDATE:20261024"
+    assert occurrences(text, dt(2026, 10, 20, 8), 3) == [dt(2026, 10, 22, 7, 30), dt(2026, 10, 25, 7, 30),
+                                                         dt(2026, 10, 26, 7, 30)]
+    assert parse_rule(text).describe() == "Every day (except 3 dates)"
+
+
+def test_fully_excluded_series_ends():
+    assert occurrences("DTSTART:20261020T073000\nRRULE:FREQ=DAILY;COUNT=2\nEXDATE:20261020,20261021",
+                       dt(2026, 1, 1)) == []
+
+
+def test_parsed_rules_are_shared():
+    assert parse_rule("DTSTART:20261020T073000\nRRULE:FREQ=DAILY") is \
+        parse_rule("DTSTART:20261020T073000\nRRULE:FREQ=DAILY")
+
+
+@pytest.mark.parametrize('text', [
+    "RRULE:FREQ=DAILY",
+    "DTSTART:20261020",
+    "DTSTART:2026-10-20T07:30",
+    "DTSTART:20261020T073000\nRRULE:FREQ=YEARLY",
+    "DTSTART:20261020T073000\nRRULE:FREQ=DAILY;INTERVAL=0",
+    "DTSTART:20261020T073000\nRRULE:FREQ=DAILY;COUNT=-1",
+    "DTSTART:20261020T073000\nRRULE:FREQ=WEEKLY;COUNT=3",
+    "DTSTART:20261020T073000\nRRULE:FREQ=WEEKLY;BYDAY=XX",
+    "DTSTART:20261020T073000\nRRULE:FREQ=MONTHLY;BYMONTHDAY=0",
+    "DTSTART:20261020T073000\nRRULE:FREQ=MONTHLY;BYMONTHDAY=32",
+    "DTSTART:20261020T073000\nRRULE:FREQ=MONTHLY;BYMONTHDAY=last",
+    "DTSTART:20261020T073000\nEXDATE:tomorrow",
+    "DTSTART:20261020T073000\nRDATE:20261101",
+    "DTSTART:20261020T073000\nRRULE:FREQ=DAILY;BYHOUR=9,17",
+    "DTSTART:20261020T073000\nRRULE:FREQ=MONTHLY;BYDAY=1MO",
+    "DTSTART:20261020T073000\nRRULE:FREQ=WEEKLY;BYDAY=1MO",
+    "DTSTART:20261020T073000\nRRULE:FREQ=DAILY;INTERVAL=2;BYDAY=MO",
+    "DTSTART:20261020T073000\nRRULE:FREQ=HOURLY;BYDAY=SA,SU",
+    "DTSTART:20261020T073000\nRRULE:FREQ=MONTHLY;BYMONTHDAY=1,-1;BYSETPOS=-1",
+    "DTSTART:20261020T073000\nRRULE:FREQ=MONTHLY;BYMONTH=3",
+    "DTSTART:20261020T073000\nRRULE:FREQ=MONTHLY;BYMONTHDAY=1;BYMONTHDAY=2",
+    "DTSTART:20261020T073000\nRRULE:FREQ=DAILY;COUNT=3;UNTIL=20261101",
+    "DTSTART:20261020T073000\nRRULE:FREQ=WEEKLY;INTERVAL=2;WKST=SU",
+    "DTSTART:20261020T073000\nRRULE:FREQ=DAILY;BYMINUTE",
+    "DTSTART:20261020T073000\nRRULE:INTERVAL=2",
+    "DTSTART:20261020T073000\nRRULE:FREQ=DAILY;UNTIL=20261101Z",
+])
+def test_invalid_rules_are_rejected(text):
+    with pytest.raises(ValueError):
+        parse_rule(text)
+
+
+def test_week_start_is_accepted_where_it_changes_nothing():
+    rule = parse_rule("DTSTART:20261020T073000\nRRULE:FREQ=WEEKLY;BYDAY=MO,WE;WKST=SU")
+    assert rule.days_mask == 0b0000101
+
+
+def test_utc_times_are_read_in_the_given_zone():
+    zone = datetime.timezone(datetime.timedelta(hours=-5))
+    text = "DTSTART:20261020T073000\nRRULE:FREQ=DAILY;UNTIL=20261023T120000Z\nEXDATE:20261021T123000Z"
+    localized = localize_utc(text, zone)
+    assert localized == "DTSTART:20261020T073000\nRRULE:FREQ=DAILY;UNTIL=20261023T070000\nEXDATE:20261021T073000"
+    assert occurrences(localized, dt(2026, 10, 20)) == [dt(2026, 10, 20, 7, 30), dt(2026, 10, 22, 7, 30)]
+
+
+def test_utc_times_in_rules_are_converted_not_ignored():
+    rule = parse_rule("DTSTART:20261020T073000\nRRULE:FREQ=DAILY;UNTIL=20261023T120000Z")
+    expected = datetime.datetime(2026, 10, 23, 12, tzinfo=datetime.timezone.utc).astimezone().replace(tzinfo=None)
+    assert rule.until == expected
@@ -0,0 +1,155 @@
+# coding: utf-8
+"""Alarm scheduler: heap order, cancellation, snoozes and catching up after a suspend"""
+
+import datetime
+import queue
+import time
+
+import pytest
+
+import alarm_engine
+from alarm_engine import AlarmFiring, AlarmRecord, AlarmScheduler, next_fire_instant
+
+ACCRA = "Africa/Accra"  # UTC all year, so instants are easy to write down
+EVERY_DAY = 0b1111111
+
+
+def utc(*args) -> float:
+    return datetime.datetime(*args, tzinfo=datetime.timezone.utc).timestamp()
+
+
+class FakeClock:
+    """Stands in for time.time(); monotonic time keeps running normally"""
+
+    def __init__(self, now: float):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock(utc(2026, 10, 20, 4))
+    monkeypatch.setattr(alarm_engine.time, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def scheduler():
+    events = queue.Queue()
+    scheduler = AlarmScheduler(lambda firing: events.put(('fired', firing)),
+                               lambda alarm, when: events.put(('missed', alarm, when)), max_wait=0.02)
+    scheduler.events = events
+    yield scheduler
+    scheduler.stop()
+
+
+def alarm(alarm_id, hour, minute=0, active=True):
+    return AlarmRecord(alarm_id, hour, minute, f"Alarm {alarm_id}", EVERY_DAY, active=active, timezone=ACCRA)
+
+
+def next_event(scheduler, timeout=5):
+    return scheduler.events.get(timeout=timeout)
+
+
+def test_next_deadline_is_the_earliest_active_alarm(clock, scheduler):
+    alarms = [alarm(1, 9), alarm(2, 6, 30), alarm(3, 5, active=False), alarm(4, 23, 59)]
+    scheduler.reschedule_all(alarms)
+    assert scheduler.next_deadline() == utc(2026, 10, 20, 6, 30)
+
+    scheduler.unschedule(alarms[1])
+    assert scheduler.next_deadline() == utc(2026, 10, 20, 9)
+    alarms[2].active = True
+    scheduler.schedule(alarms[2])
+    assert scheduler.next_deadline() == utc(2026, 10, 20, 5)
+    alarms[2].active = False
+    scheduler.schedule(alarms[2])
+    scheduler.schedule_many([alarm(5, 4, 30)])
+    assert scheduler.next_deadline() == utc(2026, 10, 20, 4, 30)
+
+
+def test_heap_matches_next_fire_instant_for_many_alarms(clock, scheduler):
+    alarms = [alarm(number, number % 24, number * 7 % 60) for number in range(1, 500)]
+    scheduler.reschedule_all(alarms)
+    assert scheduler.next_deadline() == min(next_fire_instant(each, clock.now) for each in alarms)
+
+
+def test_due_alarm_fires_once_and_moves_to_the_next_day(clock, scheduler):
+    morning = alarm(1, 4, 1)
+    scheduler.reschedule_all([morning])
+    scheduler.start()
+    clock.now = utc(2026, 10, 20, 4, 1) + 0.5
+    kind, firing = next_event(scheduler)
+    assert kind == 'fired' and firing.alarm is morning and firing.due == utc(2026, 10, 20, 4, 1)
+    assert scheduler.next_deadline() == utc(2026, 10, 21, 4, 1)
+    with pytest.raises(queue.Empty):
+        next_event(scheduler, timeout=0.2)
+
+
+def test_suspend_rings_recent_alarms_and_reports_old_ones(clock, scheduler):
+    recent, old = alarm(1, 7), alarm(2, 5)
+    scheduler.reschedule_all([recent, old])
+    scheduler.start()
+    time.sleep(0.05)
+    clock.now = utc(2026, 10, 20, 7, 2)  # woke up two hours later: 05:00 is long gone, 07:00 is 2 minutes old
+    events = sorted([next_event(scheduler), next_event(scheduler)], key=lambda event: event[0])
+    assert events[0][0] == 'fired' and events[0][1].alarm is recent
+    assert events[1] == ('missed', old, utc(2026, 10, 20, 5))
+    assert scheduler.next_deadline() == utc(2026, 10, 21, 5)
+
+
+def test_backward_clock_step_reschedules(clock, scheduler):
+    scheduler.reschedule_all([alarm(1, 5)])
+    scheduler.start()
+    clock.now = utc(2026, 10, 21, 4)  # the deadline of the 20th is overdue (and missed)...
+    next_event(scheduler)
+    clock.now = utc(2026, 10, 20, 4)  # ...then the clock is set back a day
+    deadline = time.monotonic() + 5
+    while scheduler.next_deadline() != utc(2026, 10, 20, 5) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert scheduler.next_deadline() == utc(2026, 10, 20, 5)
+
+
+def test_snooze_rings_the_same_instance_again(clock, scheduler):
+    morning = alarm(1, 9)
+    scheduler.reschedule_all([morning])
+    firing = AlarmFiring(7, morning, utc(2026, 10, 20, 3, 59))
+    snoozed = scheduler.snooze(firing, utc(2026, 10, 20, 4, 5))
+    assert (snoozed.id, snoozed.snoozes) == (7, 1)
+    assert scheduler.snoozed() == [snoozed]
+    assert scheduler.next_deadline() == utc(2026, 10, 20, 4, 5)
+
+    scheduler.start()
+    clock.now = utc(2026, 10, 20, 4, 5)
+    kind, fired = next_event(scheduler)
+    assert kind == 'fired' and fired is snoozed
+    assert scheduler.snoozed() == [] and scheduler.next_deadline() == utc(2026, 10, 20, 9)
+
+
+def test_switching_an_alarm_off_cancels_its_snoozes(clock, scheduler):
+    morning = alarm(1, 9)
+    scheduler.reschedule_all([morning])
+    scheduler.snooze(AlarmFiring(1, morning, clock.now), clock.now + 300)
+    morning.active = False
+    scheduler.schedule(morning)
+    assert scheduler.snoozed() == [] and scheduler.next_deadline() is None
+
+
+def test_a_failing_listener_does_not_silence_the_others(tmp_path):
+    engine = alarm_engine.AlarmEngine(alarm_engine.JournalAlarmStore(str(tmp_path / "alarms.json")),
+                                      alarm_engine.NullSoundBackend())
+    heard, missed, ran = [], [], []
+    engine.actions.register('popup', lambda firing, action: ran.append(firing))
+
+    def broken(*args):
+        raise RuntimeError("subscriber went away")
+
+    engine.listeners += [broken, heard.append]
+    engine.missed_listeners += [broken, lambda alarm, when: missed.append(alarm)]
+    morning = alarm(1, 7)
+    firing = AlarmFiring(1, morning, time.time())
+    engine._fire(firing)
+    engine._missed(morning, time.time())
+    assert heard == [firing] and ran == [firing] and missed == [morning]
+    engine.stop()
@@ -0,0 +1,112 @@
+# coding: utf-8
+"""Time zones and DST: wall-clock alarms around offset changes"""
+
+import datetime
+
+import pytest
+
+import alarm_time
+from alarm_engine import AlarmRecord, next_fire_instant
+from alarm_recurrence import parse_rule
+from alarm_time import ZoneClock, get_zone, next_instant, next_transition, to_instant
+
+pytest.importorskip('zoneinfo')
+
+LONDON = "Europe/London"  # 2026: 01:00 -> 02:00 on 29 March, 02:00 -> 01:00 on 25 October
+UTC = datetime.timezone.utc
+EVERY_DAY = 0b1111111
+
+
+def utc(*args) -> float:
+    return datetime.datetime(*args, tzinfo=UTC).timestamp()
+
+
+def daily(hour, minute):
+    """next_wall for an alarm every day at hour:minute"""
+    return lambda wall: (wall.replace(hour=hour, minute=minute, second=0, microsecond=0, fold=0)
+                         + datetime.timedelta(days=1 if (wall.hour, wall.minute) >= (hour, minute) else 0))
+
+
+def test_unknown_zone():
+    with pytest.raises(ValueError, match="unknown time zone"):
+        get_zone("Mars/Olympus_Mons")
+    assert get_zone(None) is None and get_zone("") is None
+
+
+def test_ordinary_times_exist_once():
+    zone = get_zone(LONDON)
+    wall = datetime.datetime(2026, 7, 1, 7, 30)
+    for nonexistent in alarm_time.NONEXISTENT_POLICIES:
+        for ambiguous in alarm_time.AMBIGUOUS_POLICIES:
+            assert to_instant(wall, zone, nonexistent, ambiguous) == utc(2026, 7, 1, 6, 30)
+
+
+def test_nonexistent_time_is_shifted_by_the_gap_or_skipped():
+    zone = get_zone(LONDON)
+    wall = datetime.datetime(2026, 3, 29, 1, 30)  # the clock jumps from 01:00 to 02:00
+    assert to_instant(wall, zone, 'shift') == utc(2026, 3, 29, 1, 30)  # 02:30 BST
+    assert to_instant(wall, zone, 'skip') is None
+
+
+def test_ambiguous_time_takes_the_chosen_instant():
+    zone = get_zone(LONDON)
+    wall = datetime.datetime(2026, 10, 25, 1, 30)  # happens at 00:30 and at 01:30 UTC
+    assert to_instant(wall, zone, ambiguous='first') == utc(2026, 10, 25, 0, 30)
+    assert to_instant(wall, zone, ambiguous='last') == utc(2026, 10, 25, 1, 30)
+
+
+@pytest.mark.parametrize('nonexistent, expected', [('shift', utc(2026, 3, 29, 1, 30)),
+                                                   ('skip', utc(2026, 3, 30, 0, 30))])
+def test_daily_alarm_in_the_spring_gap(nonexistent, expected):
+    assert next_instant(daily(1, 30), get_zone(LONDON), utc(2026, 3, 28, 12), nonexistent) == expected
+
+
+@pytest.mark.parametrize('ambiguous', alarm_time.AMBIGUOUS_POLICIES)
+def test_daily_alarm_in_the_repeated_hour_rings_once(ambiguous):
+    zone = get_zone(LONDON)
+    first = next_instant(daily(1, 30), zone, utc(2026, 10, 24, 12), ambiguous=ambiguous)
+    assert first == (utc(2026, 10, 25, 0, 30) if ambiguous == 'first' else utc(2026, 10, 25, 1, 30))
+    # Asked again after ringing (and from inside the repeated hour), the next is the following day
+    assert next_instant(daily(1, 30), zone, first, ambiguous=ambiguous) == utc(2026, 10, 26, 1, 30)
+    assert next_instant(daily(1, 30), zone, utc(2026, 10, 25, 1, 0), ambiguous='first') == utc(2026, 10, 26, 1, 30)
+
+
+def test_alarm_keeps_its_wall_time_across_the_change():
+    alarm = AlarmRecord(1, 7, 0, "Zoned", EVERY_DAY, timezone=LONDON)
+    assert next_fire_instant(alarm, utc(2026, 3, 28, 12)) == utc(2026, 3, 29, 6)    # 07:00 BST
+    assert next_fire_instant(alarm, utc(2026, 3, 27, 12)) == utc(2026, 3, 28, 7)    # 07:00 GMT
+    assert next_fire_instant(alarm, utc(2026, 10, 25, 12)) == utc(2026, 10, 26, 7)
+
+
+def test_zones_far_apart():
+    alarm = AlarmRecord(1, 7, 0, "Accra", EVERY_DAY, timezone="Africa/Accra")
+    assert next_fire_instant(alarm, utc(2026, 10, 20, 12)) == utc(2026, 10, 21, 7)
+    alarm = AlarmRecord(2, 7, 0, "Tokyo", EVERY_DAY, timezone="Asia/Tokyo")
+    assert next_fire_instant(alarm, utc(2026, 10, 20, 12)) == utc(2026, 10, 20, 22)
+
+
+def test_rule_alarm_follows_its_zone():
+    rule = parse_rule("DTSTART:20261101T013000\nRRULE:FREQ=DAILY")
+    alarm = AlarmRecord(1, 0, 0, "Rule", 0, rule=rule, timezone="America/New_York")  # back on 1 November
+    assert next_fire_instant(alarm, utc(2026, 10, 31, 12)) == utc(2026, 11, 1, 5, 30)  # first 01:30 (EDT)
+    assert next_fire_instant(alarm, utc(2026, 11, 1, 5, 30)) == utc(2026, 11, 2, 6, 30)
+
+
+def test_next_transition():
+    transition, before, after = next_transition(LONDON, utc(2026, 10, 1))
+    assert (transition, before, after) == (utc(2026, 10, 25, 1), 3600, 0)
+    assert next_transition("Africa/Accra", utc(2026, 10, 1))[0] is None
+
+
+@pytest.mark.parametrize('zone', [LONDON, "America/New_York", "Australia/Lord_Howe", "Africa/Accra"])
+def test_zone_clock_agrees_with_the_slow_path(zone):
+    alarms = [AlarmRecord(number, hour, minute, "", EVERY_DAY, timezone=zone)
+              for number, (hour, minute) in enumerate([(0, 0), (1, 30), (2, 15), (7, 0), (23, 59)])]
+    for start in (utc(2026, 3, 27), utc(2026, 3, 28, 23), utc(2026, 4, 4, 14), utc(2026, 10, 24, 23),
+                  utc(2026, 10, 31, 13), utc(2026, 11, 1, 5, 45)):
+        clock = ZoneClock(start)
+        for alarm in alarms:
+            alarm.next_cache = None
+            fast = next_fire_instant(alarm, start, clock)
+            alarm.next_cache = None
+            assert fast == next_fire_instant(alarm, start), (zone, start, alarm.hour, alarm.minute)